@@ -0,0 +1,51 @@
+"""Reminder progress on consultations
+
+Revision ID: add_consultation_reminders
+Revises: add_email_outbox
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_consultation_reminders'
+down_revision = 'add_email_outbox'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_consultations_reminders_due'
+
+
+def upgrade():
+    # A constant default: no table rewrite on PostgreSQL 11+
+    op.add_column(
+        'consultations',
+        sa.Column('reminders_sent', sa.Integer(), nullable=False, server_default='0'),
+    )
+    if op.get_bind().dialect.name != 'postgresql':
+        op.create_index(INDEX, 'consultations', ['reminders_sent', 'scheduled_at'])
+        return
+
+    # Built without blocking bookings; see add_hot_path_indexes
+    with op.get_context().autocommit_block():
+        if not context.is_offline_mode():
+            invalid = op.get_bind().execute(
+                sa.text(
+                    'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+                    'WHERE c.relname = :name AND NOT i.indisvalid'
+                ),
+                {'name': INDEX},
+            ).first()
+            if invalid:
+                op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX}')
+        op.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX} '
+            'ON consultations (reminders_sent, scheduled_at)'
+        )
+
+
+def downgrade():
+    op.drop_index(INDEX, table_name='consultations')
+    op.drop_column('consultations', 'reminders_sent')
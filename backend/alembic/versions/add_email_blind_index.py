@@ -0,0 +1,49 @@
+"""Blind index columns for exact email lookups on users and patients
+
+Revision ID: add_email_blind_index
+Revises: add_key_rotation_checkpoints
+Create Date: 2026-10-17 16:00:00.000000
+
+The digests are HMACs under BLIND_INDEX_KEY, so run this migration with the
+same environment as the application. Rows the previous release inserts
+between this migration and the restart are filled by
+``python -m app.cli backfill-blind-indexes``.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+from app.db.blind_index import backfill
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_email_blind_index'
+down_revision = 'add_key_rotation_checkpoints'
+branch_labels = None
+depends_on = None
+
+TABLES = ('users', 'patients')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('email_bidx', sa.String(length=32), nullable=True))
+
+    concurrently = 'CONCURRENTLY ' if op.get_bind().dialect.name == 'postgresql' else ''
+    # One short transaction per batch instead of one across the whole table
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            if not context.is_offline_mode():
+                rows = sa.table(table, sa.column('id'), sa.column('email'), sa.column('email_bidx'))
+                backfill(op.get_bind(), rows, 'email', 'email_bidx')
+            op.execute(
+                f'CREATE INDEX {concurrently}IF NOT EXISTS ix_{table}_email_bidx ON {table} (email_bidx)'
+            )
+
+
+def downgrade():
+    concurrently = 'CONCURRENTLY ' if op.get_bind().dialect.name == 'postgresql' else ''
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(f'DROP INDEX {concurrently}IF EXISTS ix_{table}_email_bidx')
+    for table in TABLES:
+        op.drop_column(table, 'email_bidx')
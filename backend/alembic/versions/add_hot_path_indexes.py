@@ -0,0 +1,76 @@
+"""Composite and partial indexes for the hot query paths
+
+Revision ID: add_hot_path_indexes
+Revises: add_patient_search_indexes
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_hot_path_indexes'
+down_revision = 'add_patient_search_indexes'
+branch_labels = None
+depends_on = None
+
+# name -> definition; mirrored in the models' index declarations
+INDEXES = {
+    # Doctor agenda / dashboard: WHERE doctor_id = ? ORDER BY scheduled_at, id
+    'ix_consultations_doctor_scheduled': 'ON consultations (doctor_id, scheduled_at, id)',
+    # Admin agenda: day range, keyset on (scheduled_at, id)
+    'ix_consultations_scheduled_at': 'ON consultations (scheduled_at, id)',
+    'ix_consultations_status_scheduled': 'ON consultations (status, scheduled_at)',
+    'ix_consultations_patient_id': 'ON consultations (patient_id)',
+    'ix_payments_consultation_id': 'ON payments (consultation_id)',
+    # Replaces ix_clinical_records_patient_id (its leading column covers those lookups)
+    'ix_clinical_records_patient_created': 'ON clinical_records (patient_id, created_at DESC, id DESC)',
+    'ix_patients_created_at': 'ON patients (created_at, id)',
+    'ix_users_password_reset_token': (
+        'ON users (password_reset_token) WHERE password_reset_token IS NOT NULL'
+    ),
+}
+
+
+def _drop_if_invalid(name):
+    # An interrupted CREATE INDEX CONCURRENTLY leaves an INVALID index behind,
+    # which IF NOT EXISTS would otherwise keep forever.
+    if context.is_offline_mode():
+        return
+    invalid = op.get_bind().execute(
+        sa.text(
+            'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+            'WHERE c.relname = :name AND NOT i.indisvalid'
+        ),
+        {'name': name},
+    ).first()
+    if invalid:
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        for name, definition in INDEXES.items():
+            op.execute(f'CREATE INDEX IF NOT EXISTS {name} {definition}')
+        op.execute('DROP INDEX IF EXISTS ix_clinical_records_patient_id')
+        return
+
+    # CONCURRENTLY cannot run inside a transaction, and keeps the tables
+    # writable while each index builds.
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            _drop_if_invalid(name)
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}')
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_clinical_records_patient_id')
+
+
+def downgrade():
+    concurrently = 'CONCURRENTLY ' if op.get_bind().dialect.name == 'postgresql' else ''
+    with op.get_context().autocommit_block():
+        op.execute(
+            f'CREATE INDEX {concurrently}IF NOT EXISTS ix_clinical_records_patient_id '
+            'ON clinical_records (patient_id)'
+        )
+        for name in reversed(list(INDEXES)):
+            op.execute(f'DROP INDEX {concurrently}IF EXISTS {name}')
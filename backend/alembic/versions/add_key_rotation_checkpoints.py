@@ -0,0 +1,35 @@
+"""Checkpoint table for the encryption key rotation job
+
+Revision ID: add_key_rotation_checkpoints
+Revises: add_hot_path_indexes
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_key_rotation_checkpoints'
+down_revision = 'add_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'key_rotation_checkpoints',
+        sa.Column('table_name', sa.String(), nullable=False),
+        sa.Column('key_fingerprint', sa.String(), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.Column('rows_scanned', sa.BigInteger(), nullable=False),
+        sa.Column('rows_rewritten', sa.BigInteger(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('table_name', 'key_fingerprint'),
+    )
+
+
+def downgrade():
+    op.drop_table('key_rotation_checkpoints')
@@ -0,0 +1,51 @@
+"""Trigram + unaccent indexes for the patient search box
+
+Revision ID: add_patient_search_indexes
+Revises: add_medical_professional_fields
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_patient_search_indexes'
+down_revision = 'add_medical_professional_fields'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite dev databases search through Python functions (app.db.search)
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+    # unaccent() is STABLE; an expression index needs an IMMUTABLE wrapper
+    op.execute(
+        "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$"
+    )
+
+    # CONCURRENTLY keeps the patients table writable while the indexes build
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_full_name_trgm '
+            'ON patients USING gin (f_unaccent(lower(full_name)) gin_trgm_ops)'
+        )
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_email_trgm '
+            'ON patients USING gin (lower(email) gin_trgm_ops)'
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_patients_email_trgm')
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_patients_full_name_trgm')
+    op.execute('DROP FUNCTION IF EXISTS f_unaccent(text)')
@@ -0,0 +1,50 @@
+"""Background PDF export jobs
+
+Revision ID: add_pdf_export_jobs
+Revises: add_record_updated_at
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_pdf_export_jobs'
+down_revision = 'add_record_updated_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'pdf_export_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('patient_id', sa.Integer(), nullable=False),
+        sa.Column('complaint', sa.Text(), nullable=True),
+        sa.Column('requested_by_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('progress', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('filename', sa.Text(), nullable=True),
+        sa.Column('size_bytes', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['requested_by_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_pdf_export_jobs_status_next_attempt', 'pdf_export_jobs', ['status', 'next_attempt_at']
+    )
+    op.create_index('ix_pdf_export_jobs_status_expires', 'pdf_export_jobs', ['status', 'expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_pdf_export_jobs_status_expires', table_name='pdf_export_jobs')
+    op.drop_index('ix_pdf_export_jobs_status_next_attempt', table_name='pdf_export_jobs')
+    op.drop_table('pdf_export_jobs')
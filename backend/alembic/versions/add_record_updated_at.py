@@ -0,0 +1,28 @@
+"""updated_at on patients and clinical records (PDF cache keys)
+
+Revision ID: add_record_updated_at
+Revises: add_consultation_reminders
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_record_updated_at'
+down_revision = 'add_consultation_reminders'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable without a default: no table rewrite. Existing rows stay NULL
+    # until edited, which keeps their cache keys stable meanwhile.
+    op.add_column('patients', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('clinical_records', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('clinical_records', 'updated_at')
+    op.drop_column('patients', 'updated_at')
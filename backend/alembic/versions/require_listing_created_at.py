@@ -0,0 +1,33 @@
+"""NOT NULL created_at on patients and payments (keyset pagination sort keys)
+
+Revision ID: require_listing_created_at
+Revises: add_pdf_export_jobs
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'require_listing_created_at'
+down_revision = 'add_pdf_export_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows that predate the ORM default: a NULL sort key would drop out of
+    # cursor pages (NULL compares neither before nor after the cursor)
+    op.execute(
+        "UPDATE payments SET created_at = COALESCE(completed_at, updated_at, CURRENT_TIMESTAMP) "
+        "WHERE created_at IS NULL"
+    )
+    op.execute("UPDATE patients SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    op.alter_column('payments', 'created_at', existing_type=sa.DateTime(), nullable=False)
+    op.alter_column('patients', 'created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    op.alter_column('patients', 'created_at', existing_type=sa.DateTime(), nullable=True)
+    op.alter_column('payments', 'created_at', existing_type=sa.DateTime(), nullable=True)
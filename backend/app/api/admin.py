@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from app.api.auth import get_current_user
-from app.db.session import get_db
+from app.core.principal_cache import principal_cache
+from app.db.encrypted import decrypt_loaded
+from app.db.pagination import CursorParams
+from app.db.search import fuzzy_search
+from app.db.session import get_db, get_read_db
 from app.models.consultation import Consultation, ConsultationStatus
 from app.models.user import Patient, User
 
@@ -49,30 +54,30 @@ def _require_admin_clinic(current_user: User):
 
 
 @router.get("/medical-professionals", response_model=list[MedicalProfessionalOut])
-def list_medical_professionals(
+async def list_medical_professionals(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     _require_it_admin(current_user)
 
-    return (
-        db.query(User)
-        .filter(User.is_medical_professional.is_(True))
+    result = await db.scalars(
+        select(User)
+        .where(User.is_medical_professional.is_(True))
         .order_by(User.full_name.asc())
-        .all()
     )
+    return result.all()
 
 
 @router.patch("/medical-professionals/{user_id}", response_model=MedicalProfessionalOut)
-def update_medical_professional(
+async def update_medical_professional(
     user_id: int,
     payload: MedicalProfessionalUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     _require_it_admin(current_user)
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user or not user.is_medical_professional:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
@@ -80,8 +85,10 @@ def update_medical_professional(
     for k, v in data.items():
         setattr(user, k, v)
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    # Role, specialty and is_active (deactivation) all feed authorization
+    principal_cache.invalidate(user.id)
+    await db.refresh(user)
     return user
 
 
@@ -96,22 +103,35 @@ class PatientOut(BaseModel):
 
 
 @router.get("/patients", response_model=list[PatientOut])
-def list_patients(
+async def list_patients(
+    request: Request,
+    response: Response,
     q: str | None = None,
-    limit: int = 200,
+    cursor: str | None = None,
+    limit: int = Query(200, ge=1, le=500),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
+    """Newest patients first, cursor-paginated; with ``q``, the best ``limit`` search matches"""
     _require_admin_clinic(current_user)
 
-    query = db.query(Patient)
-    if q:
-        term = f"%{q.strip()}%"
-        query = query.filter((Patient.email.ilike(term)) | (Patient.full_name.ilike(term)))
-    query = query.order_by(Patient.created_at.desc())
-    if limit and limit > 0:
-        query = query.limit(min(limit, 500))
-    return query.all()
+    if q and q.strip():
+        # Ranked results for a search box: a single page, best match first
+        match, rank = fuzzy_search(q, Patient.full_name, Patient.email)
+        result = await db.scalars(
+            select(Patient).where(match).order_by(rank.desc(), Patient.id).limit(limit)
+        )
+        patients = result.all()
+        decrypt_loaded(patients)
+        return patients
+
+    query = select(Patient)
+    page = CursorParams(cursor, limit)
+    query = page.apply(query, Patient.created_at, Patient.id, descending=True)
+    result = await db.scalars(query)
+    patients = page.finish(result.all(), request, response)
+    decrypt_loaded(patients)
+    return patients
 
 
 class AdminDoctorOut(BaseModel):
@@ -140,20 +160,22 @@ class AdminConsultationOut(BaseModel):
 
 
 @router.get("/consultations", response_model=list[AdminConsultationOut])
-def list_consultations(
+async def list_consultations(
+    request: Request,
+    response: Response,
     day: str | None = None,
     doctor_id: int | None = None,
     patient_id: int | None = None,
     status_filter: str | None = None,
-    limit: int = 500,
+    cursor: str | None = None,
+    limit: int = Query(500, ge=1, le=1000),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     _require_admin_clinic(current_user)
 
-    query = (
-        db.query(Consultation)
-        .options(joinedload(Consultation.patient), joinedload(Consultation.doctor))
+    query = select(Consultation).options(
+        joinedload(Consultation.patient), joinedload(Consultation.doctor)
     )
 
     if day:
@@ -164,21 +186,20 @@ def list_consultations(
         except ValueError:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid day")
         end = start + timedelta(days=1)
-        query = query.filter(Consultation.scheduled_at >= start).filter(Consultation.scheduled_at < end)
+        query = query.where(Consultation.scheduled_at >= start).where(Consultation.scheduled_at < end)
 
     if doctor_id is not None:
-        query = query.filter(Consultation.doctor_id == doctor_id)
+        query = query.where(Consultation.doctor_id == doctor_id)
     if patient_id is not None:
-        query = query.filter(Consultation.patient_id == patient_id)
+        query = query.where(Consultation.patient_id == patient_id)
 
     if status_filter:
-        query = query.filter(Consultation.status == status_filter)
+        query = query.where(Consultation.status == status_filter)
 
-    query = query.order_by(Consultation.scheduled_at.asc())
-    if limit and limit > 0:
-        query = query.limit(min(limit, 1000))
-
-    rows = query.all()
+    page = CursorParams(cursor, limit)
+    query = page.apply(query, Consultation.scheduled_at, Consultation.id)
+    rows = page.finish((await db.scalars(query)).all(), request, response)
+    decrypt_loaded(c.patient for c in rows)
 
     def _iso(dt):
         try:
@@ -216,19 +237,18 @@ class ConsultationUpdate(BaseModel):
 
 
 @router.patch("/consultations/{consultation_id}", response_model=AdminConsultationOut)
-def update_consultation(
+async def update_consultation(
     consultation_id: int,
     payload: ConsultationUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     _require_admin_clinic(current_user)
 
-    consultation = (
-        db.query(Consultation)
+    consultation = await db.scalar(
+        select(Consultation)
         .options(joinedload(Consultation.patient), joinedload(Consultation.doctor))
-        .filter(Consultation.id == consultation_id)
-        .first()
+        .where(Consultation.id == consultation_id)
     )
     if not consultation:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Consultation not found")
@@ -249,15 +269,21 @@ def update_consultation(
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid status")
 
     if "doctor_id" in data and data["doctor_id"] is not None:
-        doctor = db.query(User).filter(User.id == data["doctor_id"]).first()
+        doctor = await db.get(User, data["doctor_id"])
         if not doctor or not doctor.is_medical_professional:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Doctor not found")
 
     for k, v in data.items():
         setattr(consultation, k, v)
 
-    db.commit()
-    db.refresh(consultation)
+    await db.commit()
+    # Reload with relationships: a reassigned doctor must not be lazy-loaded
+    consultation = await db.scalar(
+        select(Consultation)
+        .options(joinedload(Consultation.patient), joinedload(Consultation.doctor))
+        .where(Consultation.id == consultation_id)
+        .execution_options(populate_existing=True)
+    )
 
     def _iso(dt):
         try:
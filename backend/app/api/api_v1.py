@@ -8,6 +8,7 @@ from app.api.payments import router as payments_router
 from app.api.video import router as video_router
 from app.api.templates import router as templates_router
 from app.api.pdf_clinica import router as pdf_router
+from app.api.pdf_exports import router as pdf_exports_router
 
 api_router = APIRouter()
 
@@ -19,3 +20,4 @@ api_router.include_router(payments_router, prefix="/payments", tags=["payments"]
 api_router.include_router(video_router, prefix="/video", tags=["video"])
 api_router.include_router(templates_router, prefix="/templates", tags=["templates"])
 api_router.include_router(pdf_router, prefix="/pdf", tags=["pdf"])
+api_router.include_router(pdf_exports_router, prefix="/pdf", tags=["pdf"])
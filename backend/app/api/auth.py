@@ -4,9 +4,15 @@ from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-
-from app.core.security import create_access_token, get_password_hash, verify_password
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.hashing import ahash, averify, averify_and_update
+from app.core.principal_cache import principal_cache
+from app.core.rate_limit import RateLimit
+from app.core.security import create_access_token
+from app.db.blind_index import blind_index
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.user import (
@@ -21,7 +27,7 @@ from app.schemas.user import (
     UserLogin,
     UserLoginResponse,
 )
-from app.services.email import get_email_service
+from app.services import outbox
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -30,6 +36,11 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 TEMPORARY_PASSWORD_LENGTH = 12
 RESET_TOKEN_EXPIRE_HOURS = 1
 
+# Credential endpoints: slow down guessing per client and per targeted account
+login_rate_limit = RateLimit("login", per_ip="20/minute", per_account="10/minute")
+temporary_login_rate_limit = RateLimit("login_temporary", per_ip="10/minute", per_account="5/minute")
+reset_password_rate_limit = RateLimit("reset_password", per_ip="5/minute", per_account="3/hour")
+
 
 def generate_temporary_password(length=12):
     """Generate a secure temporary password"""
@@ -43,8 +54,8 @@ def generate_reset_token():
     return secrets.token_urlsafe(32)
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
 ):
     """Get current authenticated user"""
     from jose import JWTError, jwt
@@ -59,25 +70,53 @@ def get_current_user(
 
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
+        sub = payload.get("sub")
+        if sub is None:
             raise credentials_exception
-    except JWTError:
+        # asyncpg binds parameters strictly, so the "sub" claim must be an int
+        user_id = int(sub)
+    except (JWTError, ValueError):
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
+    issued_at = payload.get("iat")
+    snapshot = principal_cache.get(user_id, issued_at)
+    if snapshot is not None:
+        # Attach a copy to this request's session without a round trip, so
+        # handlers can still modify and commit it like a loaded row.
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        user = await db.merge(user, load=False)
+    else:
+        user = await db.get(User, user_id)
+        if user is None:
+            raise credentials_exception
+        principal_cache.put(user_id, issued_at, _user_snapshot(user))
+
+    if not user.is_active:
         raise credentials_exception
 
     return user
 
 
-@router.post("/login", response_model=UserLoginResponse)
-def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+def _user_snapshot(user: User) -> dict:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+@router.post(
+    "/login", response_model=UserLoginResponse, dependencies=[Depends(login_rate_limit)]
+)
+async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """Login with email and password"""
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+    user = await db.scalar(
+        select(User).where(User.email_bidx == blind_index(user_credentials.email))
+    )
 
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    verified, new_hash = (
+        await averify_and_update(user_credentials.password, user.hashed_password)
+        if user
+        else (False, None)
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -89,9 +128,11 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user"
         )
 
-    # Update last login
+    # Update last login, and upgrade the hash if PASSWORD_HASH_ROUNDS changed
     user.last_login = datetime.utcnow()
-    db.commit()
+    if new_hash:
+        user.hashed_password = new_hash
+    await db.commit()
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -119,12 +160,18 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     }
 
 
-@router.post("/login-temporary", response_model=UserLoginResponse)
-def login_with_temporary_password(
-    credentials: TemporaryPasswordLogin, db: Session = Depends(get_db)
+@router.post(
+    "/login-temporary",
+    response_model=UserLoginResponse,
+    dependencies=[Depends(temporary_login_rate_limit)],
+)
+async def login_with_temporary_password(
+    credentials: TemporaryPasswordLogin, db: AsyncSession = Depends(get_db)
 ):
     """Login with temporary password (first login)"""
-    user = db.query(User).filter(User.email == credentials.email).first()
+    user = await db.scalar(
+        select(User).where(User.email_bidx == blind_index(credentials.email))
+    )
 
     if not user:
         raise HTTPException(
@@ -142,7 +189,7 @@ def login_with_temporary_password(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Temporary password expired"
         )
 
-    if not verify_password(credentials.temporary_password, user.temporary_password):
+    if not await averify(credentials.temporary_password, user.temporary_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid temporary password",
@@ -162,24 +209,25 @@ def login_with_temporary_password(
 
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     password_data: PasswordChange,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Change password (for first login or regular password change)"""
+    # current_user may come from the principal cache: verify against the stored hash
+    await db.refresh(current_user)
+
     # Verify current password (unless it's first login with temporary password)
     if not current_user.is_first_login:
-        if not verify_password(
-            password_data.current_password, current_user.hashed_password
-        ):
+        if not await averify(password_data.current_password, current_user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Current password is incorrect",
             )
 
     # Hash new password
-    new_hashed_password = get_password_hash(password_data.new_password)
+    new_hashed_password = await ahash(password_data.new_password)
 
     # Update user
     current_user.hashed_password = new_hashed_password
@@ -188,15 +236,18 @@ def change_password(
     current_user.temporary_password_expires = None
     current_user.updated_at = datetime.utcnow()
 
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate(current_user.id)
 
     return {"message": "Password changed successfully"}
 
 
-@router.post("/reset-password")
-def reset_password(request: PasswordReset, db: Session = Depends(get_db)):
+@router.post("/reset-password", dependencies=[Depends(reset_password_rate_limit)])
+async def reset_password(request: PasswordReset, db: AsyncSession = Depends(get_db)):
     """Request password reset"""
-    user = db.query(User).filter(User.email == request.email).first()
+    user = await db.scalar(
+        select(User).where(User.email_bidx == blind_index(request.email))
+    )
 
     if not user:
         # Don't reveal that email doesn't exist
@@ -209,26 +260,24 @@ def reset_password(request: PasswordReset, db: Session = Depends(get_db)):
     user.password_reset_token = reset_token
     user.password_reset_expires = expires
     user.updated_at = datetime.utcnow()
+    outbox.enqueue_email(
+        db, "password_reset", user.email, full_name=user.full_name, reset_token=reset_token
+    )
 
-    db.commit()
-
-    # Send email with reset link
-    email_service = get_email_service()
-    if hasattr(email_service, "send_password_reset_email"):
-        email_service.send_password_reset_email(user.email, user.full_name, reset_token)
-    else:
-        # Development mode - log the reset token
-        print(f"Password reset token for {user.email}: {reset_token}")
+    await db.commit()
+    outbox.notify()
 
     return {"message": "Password reset instructions sent"}
 
 
 @router.post("/reset-password-confirm")
-def reset_password_confirm(
-    reset_data: PasswordResetConfirm, db: Session = Depends(get_db)
+async def reset_password_confirm(
+    reset_data: PasswordResetConfirm, db: AsyncSession = Depends(get_db)
 ):
     """Confirm password reset with token"""
-    user = db.query(User).filter(User.password_reset_token == reset_data.token).first()
+    user = await db.scalar(
+        select(User).where(User.password_reset_token == reset_data.token)
+    )
 
     if not user or not user.password_reset_expires:
         raise HTTPException(
@@ -241,22 +290,23 @@ def reset_password_confirm(
         )
 
     # Update password
-    user.hashed_password = get_password_hash(reset_data.new_password)
+    user.hashed_password = await ahash(reset_data.new_password)
     user.password_reset_token = None
     user.password_reset_expires = None
     user.is_first_login = False  # Reset first login flag
     user.updated_at = datetime.utcnow()
 
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate(user.id)
 
     return {"message": "Password reset successfully"}
 
 
 @router.post("/register-medical-professional")
-def register_medical_professional(
+async def register_medical_professional(
     registration_data: MedicalProfessionalRegister,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Register a new medical professional (private registration)"""
     if not current_user.is_superuser and getattr(current_user, "role", None) != "it_admin":
@@ -268,17 +318,17 @@ def register_medical_professional(
     # TODO: Validate registration_token
 
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == registration_data.email).first()
+    existing_user = await db.scalar(
+        select(User).where(User.email_bidx == blind_index(registration_data.email))
+    )
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
         )
 
     # Check if license number already exists
-    existing_license = (
-        db.query(User)
-        .filter(User.license_number == registration_data.license_number)
-        .first()
+    existing_license = await db.scalar(
+        select(User).where(User.license_number == registration_data.license_number)
     )
     if existing_license:
         raise HTTPException(
@@ -288,7 +338,7 @@ def register_medical_professional(
 
     # Generate temporary password
     temp_password = generate_temporary_password()
-    temp_password_hash = get_password_hash(temp_password)
+    temp_password_hash = await ahash(temp_password)
     temp_password_expires = datetime.utcnow() + timedelta(hours=24)
 
     # Create user
@@ -305,18 +355,16 @@ def register_medical_professional(
     )
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
-
-    # Send email with temporary password
-    email_service = get_email_service()
-    if hasattr(email_service, "send_temporary_password_email"):
-        email_service.send_temporary_password_email(
-            user.email, user.full_name, temp_password
-        )
-    else:
-        # Development mode - print the temporary password
-        print(f"Temporary password for {user.email}: {temp_password}")
+    outbox.enqueue_email(
+        db,
+        "temporary_password",
+        user.email,
+        full_name=user.full_name,
+        temporary_password=temp_password,
+    )
+    await db.commit()
+    outbox.notify()
+    await db.refresh(user)
 
     # TODO: Send welcome email after password change
     return {
@@ -326,6 +374,6 @@ def register_medical_professional(
 
 
 @router.get("/me", response_model=UserSchema)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_user)):
     """Get current user information"""
     return current_user
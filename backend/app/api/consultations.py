@@ -1,13 +1,18 @@
 import os
 import secrets
-from datetime import datetime
+from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from app.api.auth import get_current_user
-from app.db.session import get_db
+from app.core.rate_limit import RateLimit
+from app.db.blind_index import blind_index
+from app.db.encrypted import decrypt_loaded
+from app.db.pagination import CursorParams
+from app.db.session import get_db, get_read_db
 from app.models.consultation import Consultation, ConsultationStatus
 from app.models.user import Patient, User
 from app.schemas.consultation import (
@@ -18,19 +23,23 @@ from app.schemas.consultation import (
     PublicBookingResponse,
     StaffConsultationCreate,
 )
-from app.services.email import get_email_service
+from app.services import outbox
 
 router = APIRouter()
 
+# Unauthenticated writes: each booking creates rows and sends an email
+public_book_rate_limit = RateLimit(
+    "public_book", per_ip="20/hour", per_account="5/hour", account_field="patient.email"
+)
+
 
 @router.get("/public/doctors", response_model=list[PublicDoctor])
-def list_public_doctors(db: Session = Depends(get_db)):
-    doctors = (
-        db.query(User)
-        .filter(User.is_active.is_(True))
-        .filter(User.is_medical_professional.is_(True))
+async def list_public_doctors(db: AsyncSession = Depends(get_read_db)):
+    doctors = await db.scalars(
+        select(User)
+        .where(User.is_active.is_(True))
+        .where(User.is_medical_professional.is_(True))
         .order_by(User.full_name.asc())
-        .all()
     )
 
     return [
@@ -50,9 +59,17 @@ def _generate_jitsi_room(consultation_id: int) -> tuple[str, str]:
     return room_name, jitsi_room_url
 
 
-@router.post("/public/book", response_model=PublicBookingResponse)
-def public_book_consultation(payload: PublicBookingCreate, db: Session = Depends(get_db)):
-    patient = db.query(Patient).filter(Patient.email == payload.patient.email).first()
+@router.post(
+    "/public/book",
+    response_model=PublicBookingResponse,
+    dependencies=[Depends(public_book_rate_limit)],
+)
+async def public_book_consultation(
+    payload: PublicBookingCreate, db: AsyncSession = Depends(get_db)
+):
+    patient = await db.scalar(
+        select(Patient).where(Patient.email_bidx == blind_index(payload.patient.email))
+    )
     if not patient:
         patient = Patient(
             full_name=payload.patient.full_name,
@@ -60,10 +77,10 @@ def public_book_consultation(payload: PublicBookingCreate, db: Session = Depends
             phone=payload.patient.phone,
         )
         db.add(patient)
-        db.commit()
-        db.refresh(patient)
+        await db.commit()
+        await db.refresh(patient)
 
-    doctor = db.query(User).filter(User.id == payload.doctor_id).first()
+    doctor = await db.get(User, payload.doctor_id)
     if not doctor:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Doctor not found"
@@ -80,26 +97,24 @@ def public_book_consultation(payload: PublicBookingCreate, db: Session = Depends
         status=ConsultationStatus.CONFIRMED,
     )
     db.add(consultation)
-    db.commit()
-    db.refresh(consultation)
+    await db.flush()
 
     room_name, room_url = _generate_jitsi_room(consultation.id)
     consultation.jitsi_room_name = room_name
     consultation.jitsi_room_url = room_url
     consultation.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(consultation)
 
-    email_service = get_email_service()
-    if hasattr(email_service, "send_consultation_confirmation"):
-        email_service.send_consultation_confirmation(
-            patient.email, patient.full_name, consultation
-        )
-    else:
-        print(f"Consultation confirmation email to {patient.email}: {room_url}")
-
-    if hasattr(email_service, "send_doctor_notification"):
-        email_service.send_doctor_notification(doctor.email, doctor.full_name, consultation)
+    # Committed with the booking, sent by the outbox workers
+    details = outbox.consultation_details(consultation)
+    outbox.enqueue_email(
+        db, "consultation_confirmation", patient.email, full_name=patient.full_name, consultation=details
+    )
+    outbox.enqueue_email(
+        db, "doctor_notification", doctor.email, full_name=doctor.full_name, consultation=details
+    )
+    await db.commit()
+    outbox.notify()
+    await db.refresh(consultation)
 
     return {
         "consultation": consultation,
@@ -108,10 +123,10 @@ def public_book_consultation(payload: PublicBookingCreate, db: Session = Depends
 
 
 @router.post("", response_model=PublicBookingResponse)
-def create_consultation_staff(
+async def create_consultation_staff(
     payload: StaffConsultationCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     role = getattr(current_user, "role", None)
     allowed_roles = {"specialist", "medical_admin", "it_admin", "administration", "reception"}
@@ -120,10 +135,12 @@ def create_consultation_staff(
 
     patient = None
     if payload.patient_id is not None:
-        patient = db.query(Patient).filter(Patient.id == payload.patient_id).first()
+        patient = await db.get(Patient, payload.patient_id)
 
     if not patient and payload.patient is not None:
-        patient = db.query(Patient).filter(Patient.email == payload.patient.email).first()
+        patient = await db.scalar(
+            select(Patient).where(Patient.email_bidx == blind_index(payload.patient.email))
+        )
         if not patient:
             patient = Patient(
                 full_name=payload.patient.full_name,
@@ -131,8 +148,8 @@ def create_consultation_staff(
                 phone=payload.patient.phone,
             )
             db.add(patient)
-            db.commit()
-            db.refresh(patient)
+            await db.commit()
+            await db.refresh(patient)
 
     if not patient:
         raise HTTPException(
@@ -147,7 +164,7 @@ def create_consultation_staff(
     if not doctor_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Doctor not provided")
 
-    doctor = db.query(User).filter(User.id == doctor_id).first()
+    doctor = await db.get(User, doctor_id)
     if not doctor:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Doctor not found")
 
@@ -162,16 +179,16 @@ def create_consultation_staff(
         status=ConsultationStatus.CONFIRMED,
     )
     db.add(consultation)
-    db.commit()
-    db.refresh(consultation)
+    await db.flush()
 
     if payload.consultation_type == ConsultationType.VIDEO:
         room_name, room_url = _generate_jitsi_room(consultation.id)
         consultation.jitsi_room_name = room_name
         consultation.jitsi_room_url = room_url
         consultation.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(consultation)
+
+    await db.commit()
+    await db.refresh(consultation)
 
     return {
         "consultation": consultation,
@@ -180,10 +197,16 @@ def create_consultation_staff(
 
 
 @router.get("/me", response_model=list[ConsultationWithPatient])
-def list_my_consultations(
+async def list_my_consultations(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(200, ge=1, le=1000),
+    since: datetime | None = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
+    """The doctor's consultations by time; ``since`` skips earlier ones (the agenda's upcoming list)"""
     role = getattr(current_user, "role", None)
     allowed_roles = {"specialist", "medical_admin", "it_admin"}
     if not current_user.is_superuser and role not in allowed_roles and not current_user.is_medical_professional:
@@ -192,10 +215,18 @@ def list_my_consultations(
             detail="Not authorized",
         )
 
-    return (
-        db.query(Consultation)
+    page = CursorParams(cursor, limit)
+    query = (
+        select(Consultation)
         .options(joinedload(Consultation.patient))
-        .filter(Consultation.doctor_id == current_user.id)
-        .order_by(Consultation.scheduled_at.asc())
-        .all()
+        .where(Consultation.doctor_id == current_user.id)
     )
+    if since is not None:
+        if since.tzinfo is not None:
+            # scheduled_at is naive UTC
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        query = query.where(Consultation.scheduled_at >= since)
+    result = await db.scalars(page.apply(query, Consultation.scheduled_at, Consultation.id))
+    rows = page.finish(result.all(), request, response)
+    decrypt_loaded(c.patient for c in rows)
+    return rows
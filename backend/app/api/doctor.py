@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from datetime import date, datetime, time, timedelta
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import and_, asc, desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload
 
 from app.api.auth import get_current_user
-from app.db.session import get_db
+from app.db.encrypted import decrypt_loaded
+from app.db.pagination import CursorParams
+from app.db.search import fuzzy_search
+from app.db.session import get_db, get_read_db
 from app.models.history import ClinicalRecord as ClinicalRecordModel
 from app.models.user import Patient, User
 from app.models.consultation import Consultation
@@ -20,76 +28,173 @@ def _require_medical_user(current_user: User):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
 
 
-@router.get("/patients", response_model=list[DoctorPatient])
-def list_patients_for_doctor(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+PATIENT_SORT_COLUMNS = {
+    "name": Patient.full_name,
+    "created_at": Patient.created_at,
+}
+
+
+def _doctor_patients_statement(
+    *,
+    q: str | None = None,
+    patient_id: int | None = None,
+    sort: str = "name",
+    order: str = "asc",
+    limit: int = 50,
+    offset: int = 0,
 ):
-    _require_medical_user(current_user)
+    """One statement returning a page of patients with latest record and record count
 
-    patients = db.query(Patient).order_by(Patient.full_name.asc()).all()
+    Patients are paged first (the ``page`` CTE, which also carries the total
+    via ``count(*) OVER ()``); window functions then rank only that page's
+    clinical records, so the work is bounded by the page size instead of the
+    table size.
+    """
+    direction = desc if order == "desc" else asc
 
-    result: list[DoctorPatient] = []
-    for p in patients:
+    page = select(Patient.id.label("id"), func.count().over().label("total"))
+    if sort == "latest_record":
         latest = (
-            db.query(ClinicalRecordModel)
-            .filter(ClinicalRecordModel.patient_id == p.id)
-            .order_by(ClinicalRecordModel.created_at.desc())
-            .first()
-        )
-        records_count = db.query(ClinicalRecordModel).filter(ClinicalRecordModel.patient_id == p.id).count()
-        latest_date = (
-            db.query(ClinicalRecordModel)
-            .filter(ClinicalRecordModel.patient_id == p.id)
-            .order_by(ClinicalRecordModel.created_at.desc())
-            .first()
+            select(
+                ClinicalRecordModel.patient_id,
+                func.max(ClinicalRecordModel.created_at).label("latest_record_date"),
+            )
+            .group_by(ClinicalRecordModel.patient_id)
+            .subquery("latest")
         )
-        result.append(
-            DoctorPatient(
-                id=p.id,
-                full_name=p.full_name,
-                email=p.email,
-                phone=p.phone,
-                created_at=p.created_at,
-                latest_record=latest,
-                records_count=records_count,
-                latest_record_date=latest_date.created_at if latest_date else None,
+        sort_column = latest.c.latest_record_date
+        page = page.outerjoin(latest, latest.c.patient_id == Patient.id)
+    else:
+        sort_column = PATIENT_SORT_COLUMNS[sort]
+    page = page.add_columns(sort_column.label("sort_key"))
+
+    if patient_id is not None:
+        page = page.where(Patient.id == patient_id)
+    if q and q.strip():
+        match, _ = fuzzy_search(q, Patient.full_name, Patient.email)
+        page = page.where(match)
+
+    page_order = (direction(sort_column).nulls_last(), direction(Patient.id))
+    page = page.order_by(*page_order).limit(limit).offset(offset).cte("page")
+
+    ranked = (
+        select(
+            ClinicalRecordModel,
+            func.row_number()
+            .over(
+                partition_by=ClinicalRecordModel.patient_id,
+                order_by=(ClinicalRecordModel.created_at.desc(), ClinicalRecordModel.id.desc()),
             )
+            .label("rn"),
+            func.count()
+            .over(partition_by=ClinicalRecordModel.patient_id)
+            .label("records_count"),
+        )
+        .where(ClinicalRecordModel.patient_id.in_(select(page.c.id)))
+        .subquery("ranked")
+    )
+    latest_record = aliased(ClinicalRecordModel, ranked)
+
+    return (
+        select(Patient, latest_record, ranked.c.records_count, page.c.total)
+        .join(page, page.c.id == Patient.id)
+        .outerjoin(ranked, and_(ranked.c.patient_id == Patient.id, ranked.c.rn == 1))
+        .order_by(direction(page.c.sort_key).nulls_last(), direction(page.c.id))
+    )
+
+
+def _doctor_patient_row(patient: Patient, latest: ClinicalRecordModel | None, records_count: int | None):
+    return DoctorPatient(
+        id=patient.id,
+        full_name=patient.full_name,
+        email=patient.email,
+        phone=patient.phone,
+        created_at=patient.created_at,
+        latest_record=latest,
+        records_count=records_count or 0,
+        latest_record_date=latest.created_at if latest else None,
+    )
+
+
+@router.get("/patients", response_model=list[DoctorPatient])
+async def list_patients_for_doctor(
+    request: Request,
+    response: Response,
+    q: str | None = None,
+    sort: Literal["name", "created_at", "latest_record"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Paginated patient list; total in X-Total-Count, next page in the Link header"""
+    _require_medical_user(current_user)
+
+    rows = (
+        await db.execute(
+            _doctor_patients_statement(q=q, sort=sort, order=order, limit=limit, offset=offset)
         )
+    ).all()
+
+    if rows:
+        total = rows[0].total
+        response.headers["X-Total-Count"] = str(total)
+        if offset + limit < total:
+            next_url = request.url.include_query_params(offset=offset + limit)
+            response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+    decrypt_loaded(obj for patient, latest, _, _ in rows for obj in (patient, latest))
+    return [_doctor_patient_row(p, latest, count) for p, latest, count, _ in rows]
+
+
+@router.get("/patients/{patient_id}", response_model=DoctorPatient)
+async def get_patient_for_doctor(
+    patient_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    _require_medical_user(current_user)
 
-    return result
+    row = (await db.execute(_doctor_patients_statement(patient_id=patient_id, limit=1))).first()
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Patient not found")
+    patient, latest, count, _ = row
+    return _doctor_patient_row(patient, latest, count)
 
 
 @router.get("/patients/{patient_id}/history", response_model=list[ClinicalRecordSchema])
-def get_patient_history(
+async def get_patient_history(
     patient_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     _require_medical_user(current_user)
 
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    patient = await db.get(Patient, patient_id)
     if not patient:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Patient not found")
 
-    return (
-        db.query(ClinicalRecordModel)
-        .filter(ClinicalRecordModel.patient_id == patient_id)
+    result = await db.scalars(
+        select(ClinicalRecordModel)
+        .where(ClinicalRecordModel.patient_id == patient_id)
         .order_by(ClinicalRecordModel.created_at.desc())
-        .all()
     )
+    records = result.all()
+    decrypt_loaded(records)
+    return records
 
 
 @router.post("/patients/{patient_id}/history", response_model=ClinicalRecordSchema)
-def create_patient_record(
+async def create_patient_record(
     patient_id: int,
     payload: ClinicalRecordCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     _require_medical_user(current_user)
 
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    patient = await db.get(Patient, patient_id)
     if not patient:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Patient not found")
 
@@ -103,25 +208,25 @@ def create_patient_record(
         medications=payload.medications,
     )
     db.add(record)
-    db.commit()
-    db.refresh(record)
+    await db.commit()
+    await db.refresh(record)
     return record
 
 
 @router.put("/patients/{patient_id}/history/{record_id}", response_model=ClinicalRecordSchema)
-def update_patient_record(
+async def update_patient_record(
     patient_id: int,
     record_id: int,
     payload: ClinicalRecordUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     _require_medical_user(current_user)
 
-    record = (
-        db.query(ClinicalRecordModel)
-        .filter(ClinicalRecordModel.id == record_id, ClinicalRecordModel.patient_id == patient_id)
-        .first()
+    record = await db.scalar(
+        select(ClinicalRecordModel).where(
+            ClinicalRecordModel.id == record_id, ClinicalRecordModel.patient_id == patient_id
+        )
     )
     if not record:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Record not found")
@@ -130,46 +235,81 @@ def update_patient_record(
     for field, value in update_data.items():
         setattr(record, field, value)
 
-    db.commit()
-    db.refresh(record)
+    await db.commit()
+    await db.refresh(record)
     return record
 
 
 @router.get("/consultations", response_model=list[ConsultationWithPatient])
-def get_doctor_consultations(
+async def get_doctor_consultations(
+    request: Request,
+    response: Response,
+    day: date | None = None,
+    cursor: str | None = None,
+    limit: int = Query(200, ge=1, le=1000),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     _require_medical_user(current_user)
 
     # Get consultations assigned to this doctor with patient info
-    consultations = (
-        db.query(Consultation)
-        .filter(Consultation.doctor_id == current_user.id)
-        .order_by(Consultation.scheduled_at.desc())
-        .all()
+    query = (
+        select(Consultation)
+        .options(joinedload(Consultation.patient))
+        .where(Consultation.doctor_id == current_user.id)
+    )
+    if day:
+        start = datetime.combine(day, time.min)
+        query = query.where(Consultation.scheduled_at >= start).where(
+            Consultation.scheduled_at < start + timedelta(days=1)
+        )
+
+    page = CursorParams(cursor, limit)
+    consultations = await db.scalars(
+        page.apply(query, Consultation.scheduled_at, Consultation.id, descending=True)
     )
 
-    return consultations
+    rows = page.finish(consultations.all(), request, response)
+    decrypt_loaded(c.patient for c in rows)
+    return rows
+
+
+@router.get("/consultations/{consultation_id}", response_model=ConsultationWithPatient)
+async def get_doctor_consultation(
+    consultation_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    _require_medical_user(current_user)
+
+    consultation = await db.scalar(
+        select(Consultation)
+        .options(joinedload(Consultation.patient))
+        .where(Consultation.id == consultation_id)
+        .where(Consultation.doctor_id == current_user.id)
+    )
+    if not consultation:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Consultation not found")
+    return consultation
 
 
 @router.delete("/patients/{patient_id}/history/{record_id}")
-def delete_patient_record(
+async def delete_patient_record(
     patient_id: int,
     record_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     _require_medical_user(current_user)
 
-    record = (
-        db.query(ClinicalRecordModel)
-        .filter(ClinicalRecordModel.id == record_id, ClinicalRecordModel.patient_id == patient_id)
-        .first()
+    record = await db.scalar(
+        select(ClinicalRecordModel).where(
+            ClinicalRecordModel.id == record_id, ClinicalRecordModel.patient_id == patient_id
+        )
     )
     if not record:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Record not found")
 
-    db.delete(record)
-    db.commit()
+    await db.delete(record)
+    await db.commit()
     return {"detail": "Record deleted"}
@@ -1,12 +1,15 @@
 import os
 from datetime import datetime
+from functools import lru_cache
 
-import stripe
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, contains_eager
 
 from app.api.auth import get_current_user
-from app.db.session import get_db
+from app.core.metrics import time_external_call
+from app.db.pagination import CursorParams
+from app.db.session import get_sync_db
 from app.models.consultation import (
     Consultation,
     ConsultationStatus,
@@ -24,21 +27,29 @@ from app.schemas.consultation import (
     ConsultationUpdate,
     ConsultationWithPayment,
 )
-from app.schemas.payment import PaymentWithPatient
-from app.services.email import get_email_service
+from app.schemas.payment import PaymentSummary, PaymentWithPatient
+from app.services import outbox
 
 router = APIRouter()
 
-# Initialize Stripe
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 
 
+@lru_cache(maxsize=1)
+def _stripe():
+    """The Stripe SDK, imported and configured on first use (slow to import)"""
+    import stripe
+
+    stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+    return stripe
+
+
 @router.post("/checkout-session", response_model=CheckoutSessionResponse)
 def create_checkout_session(
-    checkout_data: CheckoutSessionCreate, db: Session = Depends(get_db)
+    checkout_data: CheckoutSessionCreate, db: Session = Depends(get_sync_db)
 ):
     """Create Stripe Checkout Session for consultation payment"""
+    stripe = _stripe()
 
     # Get consultation
     consultation = (
@@ -68,34 +79,35 @@ def create_checkout_session(
 
     try:
         # Create Stripe Checkout Session
-        session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=[
-                {
-                    "price_data": {
-                        "currency": "eur",
-                        "product_data": {
-                            "name": f"Videoconsulta - {consultation.specialty}",
-                            "description": (
-                                f"Consulta con {consultation.doctor.full_name}"
-                            ),
+        with time_external_call("stripe", "checkout_session_create"):
+            session = stripe.checkout.Session.create(
+                payment_method_types=["card"],
+                line_items=[
+                    {
+                        "price_data": {
+                            "currency": "eur",
+                            "product_data": {
+                                "name": f"Videoconsulta - {consultation.specialty}",
+                                "description": (
+                                    f"Consulta con {consultation.doctor.full_name}"
+                                ),
+                            },
+                            "unit_amount": int(
+                                float(payment.amount) * 100
+                            ),  # Convert to cents
                         },
-                        "unit_amount": int(
-                            float(payment.amount) * 100
-                        ),  # Convert to cents
-                    },
-                    "quantity": 1,
-                }
-            ],
-            mode="payment",
-            success_url=checkout_data.success_url,
-            cancel_url=checkout_data.cancel_url,
-            customer_email=consultation.patient.email if consultation.patient else None,
-            metadata={
-                "consultation_id": str(consultation.id),
-                "payment_id": str(payment.id),
-            },
-        )
+                        "quantity": 1,
+                    }
+                ],
+                mode="payment",
+                success_url=checkout_data.success_url,
+                cancel_url=checkout_data.cancel_url,
+                customer_email=consultation.patient.email if consultation.patient else None,
+                metadata={
+                    "consultation_id": str(consultation.id),
+                    "payment_id": str(payment.id),
+                },
+            )
 
         # Update payment with Stripe session ID
         payment.stripe_session_id = session.id
@@ -110,8 +122,9 @@ def create_checkout_session(
 
 
 @router.post("/webhook")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+async def stripe_webhook(request: Request, db: Session = Depends(get_sync_db)):
     """Handle Stripe webhooks for payment events"""
+    stripe = _stripe()
 
     body = await request.body()
     signature = request.headers.get("stripe-signature")
@@ -156,27 +169,30 @@ async def handle_checkout_session_completed(session: dict, db: Session):
         payment.stripe_payment_intent_id = session.get("payment_intent")
         payment.stripe_customer_id = session.get("customer")
         payment.completed_at = datetime.utcnow()
-        db.commit()
 
-    # Update consultation status
+    # Update consultation status; the confirmation emails commit with it
     consultation = (
         db.query(Consultation).filter(Consultation.id == consultation_id).first()
     )
     if consultation:
         consultation.status = ConsultationStatus.CONFIRMED
-        db.commit()
-
-        # Send confirmation emails
-        email_service = get_email_service()
-        if hasattr(email_service, "send_consultation_confirmation"):
-            # Send to patient
-            email_service.send_consultation_confirmation(
-                consultation.patient.email, consultation.patient.full_name, consultation
-            )
-            # Send to doctor
-            email_service.send_doctor_notification(
-                consultation.doctor.email, consultation.doctor.full_name, consultation
-            )
+        details = outbox.consultation_details(consultation)
+        outbox.enqueue_email(
+            db,
+            "consultation_confirmation",
+            consultation.patient.email,
+            full_name=consultation.patient.full_name,
+            consultation=details,
+        )
+        outbox.enqueue_email(
+            db,
+            "doctor_notification",
+            consultation.doctor.email,
+            full_name=consultation.doctor.full_name,
+            consultation=details,
+        )
+    db.commit()
+    outbox.notify()
 
 
 async def handle_payment_intent_succeeded(payment_intent: dict, db: Session):
@@ -206,10 +222,12 @@ async def handle_payment_intent_failed(payment_intent: dict, db: Session):
 
 @router.get("/doctor/payments", response_model=list[PaymentWithPatient])
 def get_doctor_payments(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
+    db: Session = Depends(get_sync_db),
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=500),
 ):
     """Get payments for current doctor"""
 
@@ -221,23 +239,58 @@ def get_doctor_payments(
         )
 
     # Get payments for consultations assigned to this doctor with patient info
-    payments = (
+    # Eager-load consultation and patient: PaymentWithPatient nests both
+    page = CursorParams(cursor, limit)
+    query = (
         db.query(Payment)
-        .join(Consultation, Payment.consultation_id == Consultation.id)
+        .join(Payment.consultation)
+        .options(contains_eager(Payment.consultation).joinedload(Consultation.patient))
         .filter(Consultation.doctor_id == current_user.id)
-        .order_by(Payment.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
     )
+    payments = page.apply(query, Payment.created_at, Payment.id, descending=True).all()
+
+    return page.finish(payments, request, response)
 
-    return payments
+
+@router.get("/doctor/payments/summary", response_model=PaymentSummary)
+def get_doctor_payments_summary(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_sync_db),
+):
+    """Counts and amounts over every payment of the current doctor, in one aggregate query"""
+    if not current_user.is_medical_professional:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view payments"
+        )
+
+    completed = Payment.status == PaymentStatus.COMPLETED
+    row = db.execute(
+        select(
+            func.count(Payment.id),
+            func.coalesce(func.sum(Payment.amount), 0),
+            func.count(Payment.id).filter(completed),
+            func.coalesce(func.sum(Payment.amount).filter(completed), 0),
+            func.count(Payment.id).filter(Payment.status == PaymentStatus.PENDING),
+            func.count(Payment.id).filter(Payment.status == PaymentStatus.FAILED),
+        )
+        .join(Payment.consultation)
+        .where(Consultation.doctor_id == current_user.id)
+    ).one()
+    return PaymentSummary(
+        total_count=row[0],
+        total_amount=row[1],
+        completed_count=row[2],
+        completed_amount=row[3],
+        pending_count=row[4],
+        failed_count=row[5],
+    )
 
 
 @router.get("/consultations", response_model=list[ConsultationWithPayment])
 def get_consultations(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_sync_db),
     skip: int = 0,
     limit: int = 100,
 ):
@@ -263,7 +316,7 @@ def get_consultations(
 def create_consultation(
     consultation_data: ConsultationCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_sync_db),
 ):
     """Create a new consultation"""
 
@@ -293,7 +346,7 @@ def update_consultation(
     consultation_id: int,
     consultation_update: ConsultationUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_sync_db),
 ):
     """Update consultation status"""
 
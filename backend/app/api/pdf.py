@@ -12,7 +12,7 @@ from reportlab.pdfbase.ttfonts import TTFont
 
 from app.api.auth import get_current_user
 from app.api.doctor import _require_medical_user
-from app.db.session import get_db
+from app.db.session import get_sync_db
 from app.models.user import Patient, User
 from app.models.history import ClinicalRecord
 from app.models.consultation import Consultation
@@ -105,7 +105,7 @@ def _create_pdf_stream(content, title="Historia Clínica"):
 def export_patient_history_pdf(
     patient_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_sync_db),
 ):
     _require_medical_user(current_user)
     
@@ -190,7 +190,7 @@ def export_patient_history_pdf(
 def export_consultation_pdf(
     consultation_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_sync_db),
 ):
     _require_medical_user(current_user)
     
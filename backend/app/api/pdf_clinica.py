@@ -1,19 +1,77 @@
+import hashlib
+import importlib.util
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import Response
+from functools import lru_cache, wraps
+from pathlib import Path
+from typing import Callable
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from weasyprint import HTML
 
 from app.api.auth import get_current_user
 from app.api.doctor import _require_medical_user
-from app.db.session import get_db
+from app.core.metrics import PDF_CACHE_REQUESTS, PDF_RENDER_BYTES, PDF_RENDER_DURATION
+from app.db.encrypted import decrypt_loaded
+from app.db.session import get_sync_read_db
 from app.models.user import Patient, User
 from app.models.history import ClinicalRecord
 from app.models.consultation import Consultation
+from app.services.pdf_cache import cache_key, get_pdf_cache
+from app.services.pdf_render import concatenate_pdfs, render_pdf, render_pdf_to
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Histories with more note text than this (characters, about 40 pages) are
+# rendered in chunks of that size, so WeasyPrint never lays out more than a
+# chunk at once; 0 renders every history in one pass. Needs ``pypdf``.
+PDF_CHUNK_CHARS = int(os.getenv("PDF_CHUNK_CHARS", "100000"))
+
+# Part of every PDF cache key: editing the templates below renders afresh
+TEMPLATE_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
+
+
+def _write_pdf(html_content: str) -> bytes:
+    # On the render pool: a slow or huge render cannot stall or grow this process
+    return render_pdf(html_content)
+
+
+def _data_date(*rows) -> str:
+    """When the newest of ``rows`` last changed
+
+    The documents state this rather than the render time: a cached PDF is
+    served again until its data changes, so only the data's date stays true.
+    """
+    stamps = [getattr(row, "updated_at", None) or getattr(row, "created_at", None) for row in rows if row is not None]
+    newest = max((stamp for stamp in stamps if stamp is not None), default=None)
+    return newest.strftime("%d/%m/%Y a las %H:%M") if newest else "fecha desconocida"
+
+
+def _observe_render(kind: str):
+    """Record render duration and output size of a _generate_*_pdf function"""
+
+    def decorator(generate):
+        @wraps(generate)
+        def wrapper(*args, **kwargs):
+            with PDF_RENDER_DURATION.time(kind=kind):
+                pdf = generate(*args, **kwargs)
+            PDF_RENDER_BYTES.observe(pdf.stat().st_size if isinstance(pdf, Path) else len(pdf), kind=kind)
+            return pdf
+
+        return wrapper
 
+    return decorator
+
+
+@_observe_render("complaint")
 def _generate_complaint_pdf(patient: Patient, complaint: str, records: list[ClinicalRecord]) -> bytes:
     """Generate PDF for specific complaint using WeasyPrint and HTML template from clinica"""
     
@@ -211,7 +269,7 @@ def _generate_complaint_pdf(patient: Patient, complaint: str, records: list[Clin
         </div>
 
         <div class="document-info">
-            📄 Documento generado el {datetime.now().strftime("%d/%m/%Y a las %H:%M")} |
+            📄 Datos actualizados el {_data_date(patient, *records)} |
             Paciente ID: {patient.id} | {len(records)} notas
         </div>
 
@@ -245,54 +303,99 @@ def _generate_complaint_pdf(patient: Patient, complaint: str, records: list[Clin
     </html>
     """
     
-    return HTML(string=html_content).write_pdf()
+    return _write_pdf(html_content)
 
 
-def _generate_patient_history_pdf(patient: Patient, records: list[ClinicalRecord]) -> bytes:
-    """Generate beautiful PDF for patient history using WeasyPrint and HTML template from clinica"""
-    
-    # Format records for display
-    records_html = ""
-    for i, record in enumerate(records, 1):
-        record_date = record.created_at.strftime("%d/%m/%Y %H:%M")
-        records_html += f"""
-        <div class="section" style="page-break-inside: avoid; margin-bottom: 20px;">
-            <div class="section-header">Nota Clínica #{i} - {record_date}</div>
-            <div class="info-card full-width">
-                <div class="info-label">📋 Motivo de Consulta</div>
-                <div class="info-value">{record.chief_complaint or 'No registrado'}</div>
+def _history_note_html(i: int, record: ClinicalRecord) -> str:
+    record_date = record.created_at.strftime("%d/%m/%Y %H:%M")
+    return f"""
+    <div class="section" style="page-break-inside: avoid; margin-bottom: 20px;">
+        <div class="section-header">Nota Clínica #{i} - {record_date}</div>
+        <div class="info-card full-width">
+            <div class="info-label">📋 Motivo de Consulta</div>
+            <div class="info-value">{record.chief_complaint or 'No registrado'}</div>
+        </div>
+        <div class="info-grid">
+            <div class="info-card">
+                <div class="info-label">📚 Antecedentes</div>
+                <div class="info-value">{record.background or 'No registrado'}</div>
+            </div>
+            <div class="info-card">
+                <div class="info-label">🔍 Valoración</div>
+                <div class="info-value">{record.assessment or 'No registrado'}</div>
             </div>
+        </div>
+        <div class="info-card full-width">
+            <div class="info-label">📝 Plan</div>
+            <div class="info-value">{record.plan or 'No registrado'}</div>
+        </div>
+        <div class="info-grid">
+            <div class="info-card">
+                <div class="info-label">⚠️ Alergias</div>
+                <div class="info-value">{record.allergies or 'No registrado'}</div>
+            </div>
+            <div class="info-card">
+                <div class="info-label">💊 Medicación</div>
+                <div class="info-value">{record.medications or 'No registrado'}</div>
+            </div>
+        </div>
+    </div>
+    """
+
+
+def _history_intro_html(patient: Patient, records: list[ClinicalRecord]) -> str:
+    """Title and patient card, then the notes heading: the top of the first page"""
+    return f"""
+        <div class="header">
+            <div class="header-left">
+                <h1>Telemedicina Platform</h1>
+                <div class="subtitle">Historia Clínica Completa</div>
+            </div>
+        </div>
+
+        <div class="document-info">
+            📄 Datos actualizados el {_data_date(patient, *records)} |
+            Paciente ID: {patient.id}
+        </div>
+
+        <div class="section">
+            <div class="section-header">Información del Paciente</div>
             <div class="info-grid">
                 <div class="info-card">
-                    <div class="info-label">📚 Antecedentes</div>
-                    <div class="info-value">{record.background or 'No registrado'}</div>
+                    <div class="info-label">👤 Nombre Completo</div>
+                    <div class="info-value">{patient.full_name or 'No registrado'}</div>
                 </div>
                 <div class="info-card">
-                    <div class="info-label">🔍 Valoración</div>
-                    <div class="info-value">{record.assessment or 'No registrado'}</div>
+                    <div class="info-label">📧 Email</div>
+                    <div class="info-value">{patient.email}</div>
                 </div>
-            </div>
-            <div class="info-card full-width">
-                <div class="info-label">📝 Plan</div>
-                <div class="info-value">{record.plan or 'No registrado'}</div>
-            </div>
-            <div class="info-grid">
                 <div class="info-card">
-                    <div class="info-label">⚠️ Alergias</div>
-                    <div class="info-value">{record.allergies or 'No registrado'}</div>
+                    <div class="info-label">📞 Teléfono</div>
+                    <div class="info-value">{patient.phone or 'No registrado'}</div>
                 </div>
                 <div class="info-card">
-                    <div class="info-label">💊 Medicación</div>
-                    <div class="info-value">{record.medications or 'No registrado'}</div>
+                    <div class="info-label">📅 Fecha de Registro</div>
+                    <div class="info-value">{patient.created_at.strftime('%d/%m/%Y')}</div>
                 </div>
             </div>
         </div>
-        """
-    
-    if not records_html:
-        records_html = '<div class="clinical-notes"><p style="color: #adb5bd; font-style: italic;">No se registraron notas clínicas para este paciente.</p></div>'
-    
-    html_content = f"""
+
+        <div class="section">
+            <div class="section-header">Historia Clínica ({len(records)} notas)</div>
+    """
+
+
+# Every page's footer. Chunked renders leave it out of the chunks and stamp
+# it over the joined pages instead, see _render_history_chunked
+HISTORY_PAGE_FOOTER = """@bottom-center {
+                    content: "Página " counter(page) " de " counter(pages);
+                    font-size: 8pt;
+                    color: #999;
+                }"""
+
+
+def _history_html(body: str, page_footer: str = HISTORY_PAGE_FOOTER) -> str:
+    return f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -301,11 +404,7 @@ def _generate_patient_history_pdf(patient: Patient, records: list[ClinicalRecord
             @page {{
                 size: A4;
                 margin: 1.5cm 2cm;
-                @bottom-center {{
-                    content: "Página " counter(page) " de " counter(pages);
-                    font-size: 8pt;
-                    color: #999;
-                }}
+                {page_footer}
             }}
 
             * {{
@@ -440,57 +539,121 @@ def _generate_patient_history_pdf(patient: Patient, records: list[ClinicalRecord
         </style>
     </head>
     <body>
-        <div class="header">
-            <div class="header-left">
-                <h1>Telemedicina Platform</h1>
-                <div class="subtitle">Historia Clínica Completa</div>
-            </div>
-        </div>
-
-        <div class="document-info">
-            📄 Documento generado el {datetime.now().strftime("%d/%m/%Y a las %H:%M")} |
-            Paciente ID: {patient.id}
-        </div>
-
-        <div class="section">
-            <div class="section-header">Información del Paciente</div>
-            <div class="info-grid">
-                <div class="info-card">
-                    <div class="info-label">👤 Nombre Completo</div>
-                    <div class="info-value">{patient.full_name or 'No registrado'}</div>
-                </div>
-                <div class="info-card">
-                    <div class="info-label">📧 Email</div>
-                    <div class="info-value">{patient.email}</div>
-                </div>
-                <div class="info-card">
-                    <div class="info-label">📞 Teléfono</div>
-                    <div class="info-value">{patient.phone or 'No registrado'}</div>
-                </div>
-                <div class="info-card">
-                    <div class="info-label">📅 Fecha de Registro</div>
-                    <div class="info-value">{patient.created_at.strftime('%d/%m/%Y')}</div>
-                </div>
-            </div>
-        </div>
-
-        <div class="section">
-            <div class="section-header">Historia Clínica ({len(records)} notas)</div>
-            {records_html}
-        </div>
+{body}
     </body>
     </html>
     """
+
+
+# A note's card layout takes about this much room even when empty
+NOTE_OVERHEAD_CHARS = 1500
+NOTE_FIELDS = ("chief_complaint", "background", "assessment", "plan", "allergies", "medications")
+
+
+@lru_cache(maxsize=1)
+def _chunking_available() -> bool:
+    if importlib.util.find_spec("pypdf") is None:
+        logger.warning("pypdf is not installed: long histories are rendered in one pass (pip install pypdf)")
+        return False
+    return True
+
+
+def _chunk_records(records: list[ClinicalRecord], max_chars: int) -> list[list[ClinicalRecord]]:
+    """Consecutive runs of notes, each about ``max_chars`` of text: a bounded number of pages"""
+    chunks, chunk, size = [], [], 0
+    for record in records:
+        record_size = NOTE_OVERHEAD_CHARS + sum(len(getattr(record, field) or "") for field in NOTE_FIELDS)
+        if chunk and size + record_size > max_chars:
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(record)
+        size += record_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _render_history_chunked(
+    patient: Patient,
+    records: list[ClinicalRecord],
+    chunks: list[list[ClinicalRecord]],
+    on_progress: Callable[[float], None] | None = None,
+) -> Path:
+    """Render each chunk to its own file, then join them into a file in the PDF cache directory
+
+    Chunks are laid out without the page footer: its "Página n de N" needs the
+    final page count. Once every chunk is rendered, a document with just the
+    footer on each of those pages is rendered and drawn over the joined pages.
+    Notes of a new chunk start on a new page.
+    """
+    cache = get_pdf_cache()
+    target = cache.temp_path()
+    workdir = tempfile.mkdtemp(dir=cache.directory, suffix=".chunks")
+    try:
+        paths, pages, numbered = [], 0, 0
+        for n, chunk in enumerate(chunks):
+            notes = "".join(_history_note_html(numbered + i, record) for i, record in enumerate(chunk, 1))
+            if n == 0:
+                body = f"{_history_intro_html(patient, records)}{notes}\n        </div>"
+            else:
+                body = f'<div class="section">{notes}</div>'
+            path = Path(workdir) / f"{n:05d}.pdf"
+            pages += render_pdf_to(_history_html(body, page_footer=""), path)
+            paths.append(path)
+            numbered += len(chunk)
+            if on_progress:
+                on_progress((n + 1) / (len(chunks) + 1))
+
+        footer = Path(workdir) / "footer.pdf"
+        render_pdf_to(_history_html('<div style="break-after: page"></div>' * (pages - 1) + "<div></div>"), footer)
+        concatenate_pdfs(paths, target, overlay=footer)
+        return target
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@_observe_render("history")
+def _generate_patient_history_pdf(
+    patient: Patient, records: list[ClinicalRecord], on_progress: Callable[[float], None] | None = None
+) -> bytes | Path:
+    """Generate beautiful PDF for patient history using WeasyPrint and HTML template from clinica
+
+    Histories longer than PDF_CHUNK_CHARS are rendered in chunks straight to
+    a file in the PDF cache directory, whose path is returned instead.
+    """
+    if PDF_CHUNK_CHARS and len(records) > 1 and _chunking_available():
+        chunks = _chunk_records(records, PDF_CHUNK_CHARS)
+        if len(chunks) > 1:
+            return _render_history_chunked(patient, records, chunks, on_progress)
+
+    # Format records for display
+    records_html = "".join(_history_note_html(i, record) for i, record in enumerate(records, 1))
+    
+    if not records_html:
+        records_html = '<div class="clinical-notes"><p style="color: #adb5bd; font-style: italic;">No se registraron notas clínicas para este paciente.</p></div>'
     
-    return HTML(string=html_content).write_pdf()
+    html_content = _history_html(f"{_history_intro_html(patient, records)}{records_html}\n        </div>")
+    return _write_pdf(html_content)
 
 
+@_observe_render("consultation")
 def _generate_consultation_pdf(consultation: Consultation, patient: Patient) -> bytes:
     """Generate beautiful PDF for individual consultation using WeasyPrint and HTML template from clinica"""
     
     consultation_date = consultation.start_time.strftime("%d/%m/%Y %H:%M")
     topic = consultation.type or 'Consulta médica'
+    updated = _data_date(consultation, patient, consultation.doctor)
     notes_block = consultation.clinical_notes or '<p style="color: #adb5bd; font-style: italic;">No se registraron notas clínicas para esta consulta.</p>'
+    # Built separately: a triple-quoted f-string nested in another needs Python 3.12
+    follow_up_notes_html = ""
+    if consultation.follow_up_required and consultation.follow_up_notes:
+        follow_up_notes_html = f'''<div class="info-card full-width">
+                <div class="info-label">📝 Notas de Seguimiento</div>
+                <div class="info-value">{consultation.follow_up_notes or 'No hay notas'}</div>
+            </div>'''
     
     html_content = f"""
     <!DOCTYPE html>
@@ -648,7 +811,7 @@ def _generate_consultation_pdf(consultation: Consultation, patient: Patient) ->
         </div>
 
         <div class="document-info">
-            📄 Documento generado el {datetime.now().strftime("%d/%m/%Y a las %H:%M")} |
+            📄 Datos actualizados el {updated} |
             Consulta ID: {consultation.id}
         </div>
 
@@ -723,16 +886,13 @@ def _generate_consultation_pdf(consultation: Consultation, patient: Patient) ->
                 <div class="info-label">📋 Requiere Seguimiento</div>
                 <div class="info-value">{'Sí' if consultation.follow_up_required else 'No'}</div>
             </div>
-            {f'''<div class="info-card full-width">
-                <div class="info-label">📝 Notas de Seguimiento</div>
-                <div class="info-value">{consultation.follow_up_notes or 'No hay notas'}</div>
-            </div>''' if consultation.follow_up_required and consultation.follow_up_notes else ''}
+            {follow_up_notes_html}
         </div>''' if consultation.follow_up_required else ''}
 
         <div class="section" style="margin-top: 30px;">
             <div style="text-align: center; color: #999; font-size: 8pt;">
                 ---<br>
-                Generado el {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}<br>
+                Datos actualizados el {updated}<br>
                 Sistema: Telemedicina Platform
             </div>
         </div>
@@ -740,87 +900,160 @@ def _generate_consultation_pdf(consultation: Consultation, patient: Patient) ->
     </html>
     """
     
-    return HTML(string=html_content).write_pdf()
+    return _write_pdf(html_content)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def _pdf_response(
+    request: Request, kind: str, key: str, filename: str, render: Callable[[], bytes | Path]
+) -> Response:
+    """Serve the PDF of ``key`` from the disk cache, rendering it on a miss"""
+    # private: patient data must not be kept by shared caches; no-cache:
+    # browsers revalidate, and get a 304 while nothing changed
+    headers = {"ETag": f'"{key}"', "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        PDF_CACHE_REQUESTS.inc(kind=kind, outcome="not_modified")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    path, outcome = get_pdf_cache().get_or_render(key, render)
+    PDF_CACHE_REQUESTS.inc(kind=kind, outcome=outcome)
+    # filename= writes an RFC 5987 filename* for non-ASCII names (patients, complaints)
+    return FileResponse(
+        path, media_type="application/pdf", filename=filename, content_disposition_type="attachment", headers=headers
+    )
 
 
-@router.get("/patients/{patient_id}/complaint/{complaint}/pdf")
-def export_patient_complaint_pdf(
-    patient_id: int,
-    complaint: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    _require_medical_user(current_user)
-    
+def _record_stamps(db: Session, patient_id: int) -> list[list]:
+    """(id, updated_at) of a patient's records: what their PDFs are keyed on"""
+    rows = db.execute(
+        select(ClinicalRecord.id, ClinicalRecord.updated_at)
+        .where(ClinicalRecord.patient_id == patient_id)
+        .order_by(ClinicalRecord.id)
+    ).all()
+    return [list(row) for row in rows]
+
+
+@dataclass
+class PdfExport:
+    """What a patient PDF is cached under, and how to render it on a miss"""
+
+    kind: str
+    key: str
+    filename: str
+    render: Callable[[], bytes | Path]
+
+
+def _load_patient(db: Session, patient_id: int) -> Patient:
     patient = db.query(Patient).filter(Patient.id == patient_id).first()
     if not patient:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Patient not found")
-    
-    # Filter records by specific complaint (case-insensitive)
-    records = (
-        db.query(ClinicalRecord)
-        .filter(ClinicalRecord.patient_id == patient_id)
-        .filter(
-            ClinicalRecord.chief_complaint.ilike(f"%{complaint}%")
-        )
-        .order_by(ClinicalRecord.created_at.desc())
-        .all()
+    return patient
+
+
+def complaint_export(db: Session, patient: Patient, complaint: str) -> PdfExport:
+    patient_id = patient.id
+    needle = complaint.casefold()
+    key = cache_key(
+        TEMPLATE_VERSION, "complaint", patient.id, patient.updated_at, needle, _record_stamps(db, patient_id)
     )
+
+    def render() -> bytes:
+        # Filter records by specific complaint (case-insensitive). The column is
+        # encrypted, so match after decrypting the patient's history.
+        history = (
+            db.query(ClinicalRecord)
+            .filter(ClinicalRecord.patient_id == patient_id)
+            .order_by(ClinicalRecord.created_at.desc())
+            .all()
+        )
+        decrypt_loaded([patient, *history])
+        records = [r for r in history if r.chief_complaint and needle in r.chief_complaint.casefold()]
+        
+        if not records:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No records found for this complaint")
+        
+        # Generate PDF using the beautiful HTML template
+        return _generate_complaint_pdf(patient, complaint, records)
     
-    if not records:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No records found for this complaint")
-    
-    # Generate PDF using the beautiful HTML template
-    pdf_bytes = _generate_complaint_pdf(patient, complaint, records)
-    
-    # Create response
     safe_complaint = complaint.replace(' ', '_').replace('/', '_')[:20]
     filename = f"{safe_complaint}_{patient.full_name or patient.email}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return PdfExport("complaint", key, filename, render)
+
+
+def history_export(
+    db: Session, patient: Patient, on_progress: Callable[[float], None] | None = None
+) -> PdfExport:
+    patient_id = patient.id
+    key = cache_key(TEMPLATE_VERSION, "history", patient.id, patient.updated_at, _record_stamps(db, patient_id))
+
+    def render() -> bytes:
+        records = (
+            db.query(ClinicalRecord)
+            .filter(ClinicalRecord.patient_id == patient_id)
+            .order_by(ClinicalRecord.created_at.desc())
+            .all()
+        )
+        decrypt_loaded([patient, *records])
+        
+        # Generate PDF using the beautiful HTML template
+        return _generate_patient_history_pdf(patient, records, on_progress)
     
-    return Response(
-        content=pdf_bytes,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    filename = f"historia_{patient.full_name or patient.email}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return PdfExport("history", key, filename, render)
+
+
+def patient_export(
+    db: Session,
+    kind: str,
+    patient_id: int,
+    complaint: str | None = None,
+    on_progress: Callable[[float], None] | None = None,
+) -> PdfExport:
+    """The history or complaint export of a patient (export jobs, app.services.pdf_exports);
+    long histories report the fraction rendered to ``on_progress``"""
+    patient = _load_patient(db, patient_id)
+    if kind == "complaint":
+        return complaint_export(db, patient, complaint or "")
+    return history_export(db, patient, on_progress)
+
+
+@router.get("/patients/{patient_id}/complaint/{complaint}/pdf")
+def export_patient_complaint_pdf(
+    patient_id: int,
+    complaint: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_sync_read_db),
+):
+    _require_medical_user(current_user)
+    export = complaint_export(db, _load_patient(db, patient_id), complaint)
+    return _pdf_response(request, export.kind, export.key, export.filename, export.render)
 
 
 @router.get("/patients/{patient_id}/history/pdf")
 def export_patient_history_pdf(
     patient_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_sync_read_db),
 ):
     _require_medical_user(current_user)
-    
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
-    if not patient:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Patient not found")
-    
-    records = (
-        db.query(ClinicalRecord)
-        .filter(ClinicalRecord.patient_id == patient_id)
-        .order_by(ClinicalRecord.created_at.desc())
-        .all()
-    )
-    
-    # Generate PDF using the beautiful HTML template
-    pdf_bytes = _generate_patient_history_pdf(patient, records)
-    
-    # Create response
-    filename = f"historia_{patient.full_name or patient.email}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    
-    return Response(
-        content=pdf_bytes,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    export = history_export(db, _load_patient(db, patient_id))
+    return _pdf_response(request, export.kind, export.key, export.filename, export.render)
 
 
 @router.get("/consultations/{consultation_id}/pdf")
 def export_consultation_pdf(
     consultation_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_sync_read_db),
 ):
     _require_medical_user(current_user)
     
@@ -829,15 +1062,21 @@ def export_consultation_pdf(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Consultation not found")
     
     patient = consultation.patient
+    doctor = consultation.doctor
+    key = cache_key(
+        TEMPLATE_VERSION,
+        "consultation",
+        consultation.id,
+        consultation.updated_at,
+        patient.id,
+        patient.updated_at,
+        doctor.id if doctor else None,
+        doctor.updated_at if doctor else None,
+    )
     
-    # Generate PDF using the beautiful HTML template
-    pdf_bytes = _generate_consultation_pdf(consultation, patient)
-    
-    # Create response
     filename = f"consulta_{consultation.id}_{patient.full_name or patient.email}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     
-    return Response(
-        content=pdf_bytes,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    # Generate PDF using the beautiful HTML template
+    return _pdf_response(
+        request, "consultation", key, filename, lambda: _generate_consultation_pdf(consultation, patient)
     )
@@ -0,0 +1,136 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.api.auth import get_current_user
+from app.api.doctor import _require_medical_user
+from app.db.session import get_sync_db
+from app.models.pdf_export import ExportStatus, PdfExportJob
+from app.models.user import Patient, User
+from app.services import pdf_exports
+
+router = APIRouter()
+
+
+class PdfExportJobOut(BaseModel):
+    id: int
+    kind: str
+    patient_id: int
+    status: str
+    progress: int
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
+    expires_at: datetime | None = None
+    download_url: str | None = None
+
+
+def _job_out(request: Request, job: PdfExportJob) -> PdfExportJobOut:
+    download_url = None
+    if job.status == ExportStatus.DONE:
+        download_url = str(request.url_for("download_pdf_export", job_id=job.id))
+    return PdfExportJobOut(
+        id=job.id,
+        kind=job.kind,
+        patient_id=job.patient_id,
+        status=job.status,
+        progress=job.progress,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        expires_at=job.expires_at,
+        download_url=download_url,
+    )
+
+
+def _enqueue(
+    request: Request, response: Response, db: Session, user: User, kind: str, patient_id: int, complaint: str | None = None
+) -> PdfExportJobOut:
+    _require_medical_user(user)
+    if not db.query(Patient.id).filter(Patient.id == patient_id).first():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Patient not found")
+    job = pdf_exports.create_job(db, kind, patient_id, user.id, complaint)
+    db.commit()
+    pdf_exports.notify()
+    response.headers["Location"] = str(request.url_for("get_pdf_export", job_id=job.id))
+    return _job_out(request, job)
+
+
+# Each mirrors a synchronous /pdf endpoint of app.api.pdf_clinica
+
+
+@router.post(
+    "/patients/{patient_id}/history/exports", response_model=PdfExportJobOut, status_code=status.HTTP_202_ACCEPTED
+)
+def create_history_export(
+    patient_id: int,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_sync_db),
+):
+    return _enqueue(request, response, db, current_user, "history", patient_id)
+
+
+@router.post(
+    "/patients/{patient_id}/complaint/{complaint}/exports",
+    response_model=PdfExportJobOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def create_complaint_export(
+    patient_id: int,
+    complaint: str,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_sync_db),
+):
+    return _enqueue(request, response, db, current_user, "complaint", patient_id, complaint)
+
+
+def _own_job(db: Session, user: User, job_id: int) -> PdfExportJob:
+    _require_medical_user(user)
+    job = db.get(PdfExportJob, job_id)
+    # Other users' jobs are not found, rather than forbidden: ids are sequential
+    if job is None or job.requested_by_id != user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Export not found")
+    return job
+
+
+# Primary, not the replica: a poll right after the POST must see the job
+@router.get("/exports/{job_id}", response_model=PdfExportJobOut, name="get_pdf_export")
+def get_export(
+    job_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_sync_db),
+):
+    return _job_out(request, _own_job(db, current_user, job_id))
+
+
+@router.get("/exports/{job_id}/download", name="download_pdf_export")
+def download_export(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_sync_db),
+):
+    job = _own_job(db, current_user, job_id)
+    if job.status == ExportStatus.EXPIRED:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Export expired, request a new one")
+    if job.status != ExportStatus.DONE:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Export is {job.status}")
+    path = pdf_exports.export_path(job.id)
+    if not path.exists():
+        # Expired by a worker since the status was read
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Export expired, request a new one")
+    # Streamed from disk in chunks
+    return FileResponse(
+        path,
+        media_type="application/pdf",
+        filename=job.filename,
+        content_disposition_type="attachment",
+        headers={"Cache-Control": "private, no-store"},
+    )
@@ -1,9 +1,11 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.auth import get_current_user
-from app.db.session import get_db
+from app.db.pagination import CursorParams
+from app.db.session import get_db, get_read_db
 from app.models.template import ClinicalTemplate as ClinicalTemplateModel
 from app.models.user import User
 from app.schemas.template import (
@@ -23,19 +25,27 @@ def _require_medical_user(current_user: User):
 
 
 @router.get("/", response_model=list[ClinicalTemplateSchema])
-def list_templates(
+async def list_templates(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=500),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     _require_medical_user(current_user)
-    return db.query(ClinicalTemplateModel).order_by(ClinicalTemplateModel.name.asc()).all()
+    page = CursorParams(cursor, limit)
+    result = await db.scalars(
+        page.apply(select(ClinicalTemplateModel), ClinicalTemplateModel.name, ClinicalTemplateModel.id)
+    )
+    return page.finish(result.all(), request, response)
 
 
 @router.post("/", response_model=ClinicalTemplateSchema)
-def create_template(
+async def create_template(
     payload: ClinicalTemplateCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     _require_medical_user(current_user)
     template = ClinicalTemplateModel(
@@ -51,53 +61,53 @@ def create_template(
         created_by_id=current_user.id,
     )
     db.add(template)
-    db.commit()
-    db.refresh(template)
+    await db.commit()
+    await db.refresh(template)
     return template
 
 
 @router.get("/{template_id}", response_model=ClinicalTemplateSchema)
-def get_template(
+async def get_template(
     template_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     _require_medical_user(current_user)
-    template = db.query(ClinicalTemplateModel).filter(ClinicalTemplateModel.id == template_id).first()
+    template = await db.get(ClinicalTemplateModel, template_id)
     if not template:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Template not found")
     return template
 
 
 @router.put("/{template_id}", response_model=ClinicalTemplateSchema)
-def update_template(
+async def update_template(
     template_id: int,
     payload: ClinicalTemplateUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     _require_medical_user(current_user)
-    template = db.query(ClinicalTemplateModel).filter(ClinicalTemplateModel.id == template_id).first()
+    template = await db.get(ClinicalTemplateModel, template_id)
     if not template:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Template not found")
     update_data = payload.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(template, field, value)
-    db.commit()
-    db.refresh(template)
+    await db.commit()
+    await db.refresh(template)
     return template
 
 
 @router.delete("/{template_id}")
-def delete_template(
+async def delete_template(
     template_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     _require_medical_user(current_user)
-    template = db.query(ClinicalTemplateModel).filter(ClinicalTemplateModel.id == template_id).first()
+    template = await db.get(ClinicalTemplateModel, template_id)
     if not template:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Template not found")
-    db.delete(template)
-    db.commit()
+    await db.delete(template)
+    await db.commit()
     return {"detail": "Template deleted"}
@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.api.auth import get_current_user
-from app.db.session import get_db
+from app.db.session import get_sync_db
 from app.models.consultation import Consultation
 from app.models.user import User
 
@@ -17,7 +17,7 @@ router = APIRouter()
 def start_video_consultation(
     consultation_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_sync_db),
 ):
     """Start video consultation and generate Jitsi room"""
 
@@ -66,7 +66,7 @@ def start_video_consultation(
 def end_video_consultation(
     consultation_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_sync_db),
 ):
     """End video consultation"""
 
@@ -97,7 +97,7 @@ def end_video_consultation(
 def get_video_info(
     consultation_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_sync_db),
 ):
     """Get video consultation information"""
 
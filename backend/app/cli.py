@@ -0,0 +1,269 @@
+"""Operational commands: ``python -m app.cli <command> [options]``"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.core.security import ENCRYPTION_KEY, ENCRYPTION_KEYS, key_fingerprint
+from app.db.blind_index import backfill
+from app.db.dataset import DATASET_BATCH_SIZE, DATASET_PASSWORD, DatasetSpec, generate
+from app.db.key_rotation import REKEY_BATCH_SIZE, REKEY_ROWS_PER_SECOND, rotate_all, rotation_status
+from app.db.seed import seed_demo
+from app.db.session import SessionLocal, engine
+from app.models import consultation, history, key_rotation, pdf_export, template, user  # noqa: F401
+from app.models.user import Patient, User
+from app.services import outbox, pdf_exports, reminders  # loads app.models.outbox too
+
+logger = logging.getLogger("app.cli")
+
+# Seconds between progress lines of long-running commands
+PROGRESS_INTERVAL = 10
+
+
+def _rotate_keys(args: argparse.Namespace) -> int:
+    if args.status:
+        for row in rotation_status(engine):
+            state = "finished" if row["finished_at"] else f"at id {row['last_id']}"
+            print(
+                f"{row['table_name']} -> key {row['key_fingerprint']}: {state}, "
+                f"{row['rows_scanned']} scanned, {row['rows_rewritten']} rewritten"
+            )
+        return 0
+
+    logger.info(
+        "Re-encrypting under key %s (%d key(s) configured)",
+        key_fingerprint(ENCRYPTION_KEY),
+        len(ENCRYPTION_KEYS),
+    )
+    last_report = 0.0
+
+    def report(progress):
+        nonlocal last_report
+        if progress.finished or time.monotonic() - last_report >= PROGRESS_INTERVAL:
+            last_report = time.monotonic()
+            logger.info(
+                "%s: %.1f%% (id %d/%d), %d scanned, %d rewritten%s",
+                progress.table,
+                progress.percent,
+                progress.last_id,
+                progress.max_id,
+                progress.rows_scanned,
+                progress.rows_rewritten,
+                f", {progress.undecryptable} undecryptable" if progress.undecryptable else "",
+            )
+
+    results = rotate_all(
+        engine,
+        tables=args.table,
+        batch_size=args.batch_size,
+        rows_per_second=args.rows_per_second,
+        on_progress=report,
+    )
+    return 1 if any(p.undecryptable for p in results) else 0
+
+
+def _backfill_blind_indexes(args: argparse.Namespace) -> int:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for model in (User, Patient):
+            updated = backfill(conn, model.__table__, "email", "email_bidx", only_missing=not args.all)
+            logger.info("%s: %d email digests written", model.__tablename__, updated)
+    return 0
+
+
+def _seed_demo(args: argparse.Namespace) -> int:
+    db = SessionLocal()
+    try:
+        result = seed_demo(db, args.patients, force_doctor_password=args.force_doctor_password)
+    finally:
+        db.close()
+    logger.info(
+        "Demo seed: doctor id %d, %d patients and %d templates created",
+        result.doctor_id,
+        result.patients_created,
+        result.templates_created,
+    )
+    return 0
+
+
+def _generate_dataset(args: argparse.Namespace) -> int:
+    spec = DatasetSpec(
+        doctors=args.doctors,
+        patients=args.patients,
+        records=args.records,
+        consultations=args.consultations,
+        seed=args.seed,
+        batch_size=args.batch_size,
+    )
+    if args.until:
+        spec.until = datetime.fromisoformat(args.until)
+    started = time.monotonic()
+    last_report = 0.0
+
+    def report(progress):
+        nonlocal last_report
+        if progress.written == progress.total or time.monotonic() - last_report >= PROGRESS_INTERVAL:
+            last_report = time.monotonic()
+            logger.info("%s: %d/%d rows", progress.table, progress.written, progress.total)
+
+    counts = generate(engine, spec, on_progress=report)
+    elapsed = time.monotonic() - started
+    logger.info(
+        "Generated %d rows in %.0fs (%.0f rows/s); doctors log in with %s",
+        sum(counts.values()),
+        elapsed,
+        sum(counts.values()) / max(elapsed, 1e-9),
+        DATASET_PASSWORD,
+    )
+    return 0
+
+
+def _email_outbox(args: argparse.Namespace) -> int:
+    db = SessionLocal()
+    try:
+        if args.requeue_dead:
+            logger.info("%d dead-lettered email(s) requeued", outbox.requeue_dead(db, args.id))
+        if args.purge_sent is not None:
+            purged = outbox.purge_sent(db, timedelta(days=args.purge_sent))
+            logger.info("%d sent email(s) older than %g days purged", purged, args.purge_sent)
+        if args.status:
+            for status, count in sorted(outbox.status_counts(db).items()):
+                print(f"{status}: {count}")
+    finally:
+        db.close()
+    if args.status or args.requeue_dead or args.purge_sent is not None:
+        return 0
+
+    if args.once:
+        logger.info("Email outbox drained: %s", outbox.drain(batch_size=args.batch_size) or "nothing due")
+        return 0
+
+    outbox.start_workers(args.workers)
+    logger.info("Delivering outbox emails with %d worker(s)", args.workers)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        logger.info("Stopping; in-flight emails finish first")
+        outbox.stop_workers()
+    return 0
+
+
+def _reminders(args: argparse.Namespace) -> int:
+    if args.once:
+        logger.info("Reminders queued: %s", reminders.run_once(batch_size=args.batch_size) or "none due")
+        return 0
+
+    reminders.start_scheduler(1, args.poll_seconds)
+    logger.info(
+        "Queueing reminders %s before consultations every %gs",
+        ", ".join(map(reminders.window_label, reminders.REMINDER_HOURS)),
+        args.poll_seconds,
+    )
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        reminders.stop_scheduler()
+    return 0
+
+
+def _pdf_exports(args: argparse.Namespace) -> int:
+    if args.once:
+        logger.info("PDF exports run: %s", pdf_exports.drain() or "nothing due")
+        return 0
+
+    pdf_exports.start_workers(args.workers)
+    logger.info("Running PDF export jobs with %d worker(s)", args.workers)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        logger.info("Stopping; in-flight exports finish first")
+        pdf_exports.stop_workers()
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rotate = commands.add_parser(
+        "rotate-keys",
+        help="Re-encrypt encrypted columns under the first ENCRYPTION_KEYS key (resumable)",
+    )
+    rotate.add_argument("--table", action="append", help="Only this table (repeatable)")
+    rotate.add_argument("--batch-size", type=int, default=REKEY_BATCH_SIZE)
+    rotate.add_argument("--rows-per-second", type=float, default=REKEY_ROWS_PER_SECOND)
+    rotate.add_argument("--status", action="store_true", help="Show checkpoints and exit")
+    rotate.set_defaults(func=_rotate_keys)
+
+    blind = commands.add_parser(
+        "backfill-blind-indexes", help="Fill missing email_bidx digests (users, patients)"
+    )
+    blind.add_argument("--all", action="store_true", help="Recompute every row, after a BLIND_INDEX_KEY change")
+    blind.set_defaults(func=_backfill_blind_indexes)
+
+    seed = commands.add_parser("seed-demo", help="Create the default doctor, demo patients and templates")
+    seed.add_argument(
+        "--patients",
+        type=int,
+        default=int(os.getenv("DEMO_PATIENTS_COUNT", "100")),
+        help="Total demo patients wanted (existing ones count)",
+    )
+    seed.add_argument(
+        "--force-doctor-password",
+        action="store_true",
+        default=os.getenv("FORCE_DEFAULT_DOCTOR_PASSWORD", "0") == "1",
+        help="Reset the default doctor's password to DEFAULT_DOCTOR_PASSWORD",
+    )
+    seed.set_defaults(func=_seed_demo)
+
+    dataset = commands.add_parser(
+        "generate-dataset", help="Append production-sized synthetic data (load tests)"
+    )
+    dataset.add_argument("--doctors", type=int, default=200)
+    dataset.add_argument("--patients", type=int, default=100_000)
+    dataset.add_argument("--records", type=int, default=500_000, help="Clinical records")
+    dataset.add_argument("--consultations", type=int, default=200_000, help="Also one payment each")
+    dataset.add_argument("--seed", type=int, default=0)
+    dataset.add_argument("--until", help="ISO date the history ends at (default: today)")
+    dataset.add_argument("--batch-size", type=int, default=DATASET_BATCH_SIZE)
+    dataset.set_defaults(func=_generate_dataset)
+
+    email = commands.add_parser(
+        "email-outbox", help="Deliver queued emails (runs until interrupted), or manage the outbox"
+    )
+    email.add_argument("--workers", type=int, default=max(outbox.OUTBOX_WORKERS, 1))
+    email.add_argument("--batch-size", type=int, default=outbox.OUTBOX_BATCH_SIZE)
+    email.add_argument("--once", action="store_true", help="Deliver what is due now and exit")
+    email.add_argument("--status", action="store_true", help="Show row counts by status and exit")
+    email.add_argument("--requeue-dead", action="store_true", help="Retry dead-lettered emails")
+    email.add_argument("--id", type=int, action="append", help="Only requeue this row (repeatable)")
+    email.add_argument("--purge-sent", type=float, metavar="DAYS", help="Delete sent rows older than DAYS")
+    email.set_defaults(func=_email_outbox)
+
+    remind = commands.add_parser(
+        "reminders", help="Queue consultation reminder emails (runs until interrupted)"
+    )
+    remind.add_argument("--once", action="store_true", help="Queue what is due now and exit")
+    remind.add_argument("--batch-size", type=int, default=reminders.REMINDER_BATCH_SIZE)
+    remind.add_argument("--poll-seconds", type=float, default=reminders.REMINDER_POLL_SECONDS)
+    remind.set_defaults(func=_reminders)
+
+    exports = commands.add_parser(
+        "pdf-exports", help="Run background PDF export jobs and expire old files (runs until interrupted)"
+    )
+    exports.add_argument("--workers", type=int, default=max(pdf_exports.PDF_EXPORT_WORKERS, 1))
+    exports.add_argument("--once", action="store_true", help="Run the jobs due now and exit")
+    exports.set_defaults(func=_pdf_exports)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
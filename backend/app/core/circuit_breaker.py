@@ -0,0 +1,79 @@
+"""Consecutive-failure circuit breaker for calls to external services
+
+Closed: calls go through. After ``failure_threshold`` failures in a row the
+breaker opens and ``allow()`` refuses calls for ``reset_seconds``, so a
+service that is down costs callers nothing instead of a timeout each. Then
+it lets a single probe through (half-open): success closes it, failure
+opens it for another ``reset_seconds``.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable
+
+from app.core.metrics import CIRCUIT_BREAKER_OPEN, CIRCUIT_BREAKER_REJECTED
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        service: str,
+        failure_threshold: int,
+        reset_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        CIRCUIT_BREAKER_OPEN.set(0, service=service)
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or self._clock() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and self._clock() - self._opened_at >= self.reset_seconds:
+                self._probing = True
+                return True
+        CIRCUIT_BREAKER_REJECTED.inc(service=self.service)
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("%s circuit closed", self.service)
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+        CIRCUIT_BREAKER_OPEN.set(0, service=self.service)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is None and self._failures < self.failure_threshold:
+                return
+            if self._opened_at is None:
+                logger.warning(
+                    "%s circuit open after %d consecutive failures; retrying in %gs",
+                    self.service,
+                    self._failures,
+                    self.reset_seconds,
+                )
+            self._opened_at = self._clock()
+        CIRCUIT_BREAKER_OPEN.set(1, service=self.service)
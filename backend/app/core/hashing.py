@@ -0,0 +1,140 @@
+"""Password hashing on a dedicated process pool with admission control
+
+pbkdf2 is pure CPU. Run on the shared threadpool, a burst of logins holds
+the GIL and starves every other request. Here hashes run in a small process
+pool. At most HASH_QUEUE_LIMIT jobs may be running or waiting; past that,
+callers get ``HashingBusy`` straight away, which the app maps to 503 with
+Retry-After.
+
+Hashes use PASSWORD_HASH_ROUNDS. A stored hash with any other round count
+verifies as usual and is flagged for replacement (see ``averify_and_update``),
+so changing the setting migrates users as they log in.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from passlib.context import CryptContext
+
+from app.core.metrics import (
+    PASSWORD_HASH_DURATION,
+    PASSWORD_HASH_OPERATIONS,
+    PASSWORD_HASH_QUEUE_DEPTH,
+    PASSWORD_HASH_REJECTED,
+)
+
+# passlib's pbkdf2_sha256 default, so existing hashes are not rehashed
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(HASH_POOL_WORKERS * 8)))
+HASH_RETRY_AFTER_SECONDS = 1
+
+
+class HashingBusy(Exception):
+    """The hashing queue is full; the request should be retried shortly"""
+
+
+@lru_cache(maxsize=None)
+def build_context(rounds: int) -> CryptContext:
+    # min == max == default: any other round count "needs update"
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=rounds,
+        pbkdf2_sha256__min_rounds=rounds,
+        pbkdf2_sha256__max_rounds=rounds,
+    )
+
+
+# Worker-side functions: module-level so they pickle by reference.
+def _hash(password: str, rounds: int) -> str:
+    return build_context(rounds).hash(password)
+
+
+def _verify(password: str, hashed: str, rounds: int) -> bool:
+    return build_context(rounds).verify(password, hashed)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> tuple[bool, str | None]:
+    return build_context(rounds).verify_and_update(password, hashed)
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_inflight = 0
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that runs an event loop and DB pools is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=HASH_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _admit() -> None:
+    global _inflight
+    with _pool_lock:
+        if _inflight >= HASH_QUEUE_LIMIT:
+            PASSWORD_HASH_REJECTED.inc()
+            raise HashingBusy()
+        _inflight += 1
+        PASSWORD_HASH_QUEUE_DEPTH.set(_inflight)
+
+
+def _release() -> None:
+    global _inflight
+    with _pool_lock:
+        _inflight -= 1
+        PASSWORD_HASH_QUEUE_DEPTH.set(_inflight)
+
+
+async def _run(operation: str, fn, *args):
+    _admit()
+    start = time.perf_counter()
+    try:
+        if HASH_POOL_WORKERS <= 0:
+            # Inline mode (HASH_POOL_WORKERS=0): a thread, still under admission control
+            return await asyncio.to_thread(fn, *args)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(_get_pool(), fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM kill...): start a fresh pool for the next caller
+            shutdown_pool()
+            raise HashingBusy()
+    finally:
+        _release()
+        PASSWORD_HASH_OPERATIONS.inc(operation=operation)
+        PASSWORD_HASH_DURATION.observe(time.perf_counter() - start, operation=operation)
+
+
+async def ahash(password: str) -> str:
+    return await _run("hash", _hash, password, PASSWORD_HASH_ROUNDS)
+
+
+async def averify(password: str, hashed: str) -> bool:
+    return await _run("verify", _verify, password, hashed, PASSWORD_HASH_ROUNDS)
+
+
+async def averify_and_update(password: str, hashed: str) -> tuple[bool, str | None]:
+    """(matches, replacement hash or None); a replacement means the stored rounds are outdated"""
+    return await _run("verify", _verify_and_update, password, hashed, PASSWORD_HASH_ROUNDS)
@@ -0,0 +1,350 @@
+"""In-process metrics rendered in the Prometheus text exposition format
+
+A deliberately small subset of prometheus_client: counters, gauges (optionally
+computed at scrape time) and histograms with labels. Each worker process keeps
+its own registry, so scrape every worker (or run one worker per container).
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Sequence
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6, 64e6)
+
+_registry: list["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(f"{line}\n" for line in self._samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Settable gauge, or a scrape-time gauge when ``callback`` is given
+
+    The callback returns ``{label_values_tuple: value}``.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Callable[[], dict[tuple, float]] | None = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+        self._callbacks: list[Callable[[], dict[tuple, float]]] = [callback] if callback else []
+
+    def add_callback(self, callback: Callable[[], dict[tuple, float]]) -> None:
+        self._callbacks.append(callback)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            values = dict(self._values)
+        for callback in self._callbacks:
+            values.update(callback())
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label key -> [bucket counts..., sum, count]
+        self._values: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> float:
+        series = self._values.get(self._key(labels))
+        return series[-1] if series else 0.0
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._values.items()]
+        for key, series in items:
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(series[-2])}"
+            yield f"{self.name}_count{labels} {_format_value(series[-1])}"
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    return "".join(m.render() for m in metrics)
+
+
+# HTTP
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served", ["method"]
+)
+
+# Database pool
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled DB connection",
+    ["pool"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Pooled DB connections by state (size, checked_out, overflow)",
+    ["pool", "state"],
+)
+
+# PDF rendering
+PDF_RENDER_DURATION = Histogram(
+    "pdf_render_duration_seconds", "WeasyPrint render time including time queued for a render worker", ["kind"]
+)
+PDF_RENDER_BYTES = Histogram(
+    "pdf_render_bytes", "Size of rendered PDFs", ["kind"], buckets=SIZE_BUCKETS
+)
+PDF_RENDER_QUEUE_DEPTH = Gauge(
+    "pdf_render_queue_depth", "Renders running or waiting on the render pool"
+)
+PDF_RENDER_REJECTED = Counter(
+    "pdf_render_rejected_total", "Renders refused because the render queue was full"
+)
+PDF_RENDER_FAILURES = Counter(
+    "pdf_render_failures_total", "Renders that ran out of time or memory or lost their worker", ["reason"]
+)
+PDF_EXPORT_JOBS = Counter(
+    "pdf_export_jobs_total",
+    "Background PDF export jobs by outcome (queued, done, retry, failed, expired)",
+    ["kind", "outcome"],
+)
+PDF_EXPORT_DURATION = Histogram(
+    "pdf_export_duration_seconds", "Time from export request to downloadable file", ["kind"]
+)
+PDF_CACHE_REQUESTS = Counter(
+    "pdf_cache_requests_total",
+    "PDF exports by cache outcome (hit, miss, shared: waited for an identical render, not_modified)",
+    ["kind", "outcome"],
+)
+PDF_CACHE_BYTES = Gauge("pdf_cache_bytes", "Size of the rendered PDFs kept on disk")
+PDF_CACHE_EVICTIONS = Counter("pdf_cache_evictions_total", "PDFs removed to stay under PDF_CACHE_MAX_BYTES")
+
+# Third-party APIs
+EXTERNAL_CALL_DURATION = Histogram(
+    "external_call_duration_seconds",
+    "Latency of calls to external services (Stripe, SendGrid)",
+    ["service", "operation", "outcome"],
+)
+
+CIRCUIT_BREAKER_OPEN = Gauge(
+    "circuit_breaker_open", "1 while calls to the service fail fast", ["service"]
+)
+CIRCUIT_BREAKER_REJECTED = Counter(
+    "circuit_breaker_rejected_total", "Calls refused by an open circuit breaker", ["service"]
+)
+EMAIL_BATCH_RECIPIENTS = Histogram(
+    "email_batch_recipients",
+    "Recipients per email API request",
+    buckets=(1, 10, 50, 100, 250, 500, 1000),
+)
+
+# Password hashing
+PASSWORD_HASH_OPERATIONS = Counter(
+    "password_hash_operations_total", "pbkdf2 hash and verify operations", ["operation"]
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "pbkdf2 latency including time queued for a hashing worker",
+    ["operation"],
+)
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth", "Hash jobs running or waiting on the hashing pool"
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total", "Hash jobs refused because the hashing queue was full"
+)
+
+# Encrypted columns
+FIELD_DECRYPTIONS = Counter(
+    "field_decryptions_total",
+    "Encrypted column values resolved to plaintext, by path (lazy attribute access, batch)",
+    ["path"],
+)
+FIELD_DECRYPTION_FAILURES = Counter(
+    "field_decryption_failures_total",
+    "Encrypted column values that no configured key decrypts (key misconfiguration)",
+)
+
+# Authentication
+PRINCIPAL_CACHE_REQUESTS = Counter(
+    "principal_cache_requests_total", "get_current_user cache lookups (hit, miss)", ["result"]
+)
+PRINCIPAL_CACHE_ENTRIES = Gauge(
+    "principal_cache_entries", "Users held in the get_current_user cache"
+)
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total",
+    "Rate limit checks by route scope, bucket (ip, account) and outcome",
+    ["scope", "bucket", "outcome"],
+)
+
+# Email outbox
+EMAIL_OUTBOX_ENQUEUED = Counter(
+    "email_outbox_enqueued_total", "Emails written to the outbox", ["kind"]
+)
+EMAIL_OUTBOX_DELIVERIES = Counter(
+    "email_outbox_deliveries_total",
+    "Outbox delivery attempts by outcome (sent, retry, dead)",
+    ["kind", "outcome"],
+)
+EMAIL_OUTBOX_DELIVERY_LAG = Histogram(
+    "email_outbox_delivery_lag_seconds",
+    "Time from enqueue to successful delivery",
+    ["kind"],
+    buckets=(1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0, 4 * 3600.0, 24 * 3600.0),
+)
+EMAIL_OUTBOX_ROWS = Gauge(
+    "email_outbox_rows", "Outbox rows waiting to be sent or dead-lettered", ["status"]
+)
+
+# Consultation reminders
+CONSULTATION_REMINDERS = Counter(
+    "consultation_reminders_total",
+    "Reminders by window (24h, 1h, ...) and outcome (queued, skipped: no patient email)",
+    ["window", "outcome"],
+)
+CONSULTATION_REMINDER_DELAY = Histogram(
+    "consultation_reminder_delay_seconds",
+    "Time from a window opening to its reminder being queued (scheduler lag)",
+    ["window"],
+    buckets=(1.0, 10.0, 60.0, 300.0, 900.0, 3600.0),
+)
+
+
+@contextmanager
+def time_external_call(service: str, operation: str) -> Iterator[None]:
+    """Observe an external call's latency, labelled with whether it raised"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        EXTERNAL_CALL_DURATION.observe(
+            time.perf_counter() - start,
+            service=service,
+            operation=operation,
+            outcome=outcome,
+        )
@@ -0,0 +1,69 @@
+"""Bounded TTL/LRU cache of authenticated users, keyed by (user id, token iat)
+
+get_current_user would otherwise load the user row on every authenticated
+request. Entries hold plain column snapshots, never ORM instances, so nothing
+is shared between sessions or requests. The cache is per process: handlers
+that change a user call ``invalidate()`` for the local worker, and
+PRINCIPAL_CACHE_TTL bounds how long other workers can serve the old row.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from app.core.metrics import PRINCIPAL_CACHE_ENTRIES, PRINCIPAL_CACHE_REQUESTS
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "2048"))
+
+
+class PrincipalCache:
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (user_id, iat) -> (expires_at, snapshot)
+        self._entries: OrderedDict[tuple[int, Hashable], tuple[float, dict[str, Any]]] = OrderedDict()
+
+    def get(self, user_id: int, iat: Hashable) -> dict[str, Any] | None:
+        key = (user_id, iat)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                PRINCIPAL_CACHE_REQUESTS.inc(result="hit")
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        PRINCIPAL_CACHE_REQUESTS.inc(result="miss")
+        return None
+
+    def put(self, user_id: int, iat: Hashable, snapshot: dict[str, Any]) -> None:
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        key = (user_id, iat)
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop every cached token of ``user_id``"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+PRINCIPAL_CACHE_ENTRIES.add_callback(lambda: {(): len(principal_cache)})
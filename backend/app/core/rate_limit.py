@@ -0,0 +1,212 @@
+"""Token-bucket rate limiting for the public and credential endpoints
+
+Each protected route declares a ``RateLimit`` dependency with a per-IP
+bucket, a per-account bucket (keyed by an email in the JSON body), or both.
+A bucket holds up to N tokens and refills at N per period. Every request
+takes one token, and an empty bucket answers 429 with Retry-After set to
+the time until the next token.
+
+Buckets live in process memory by default, so each worker enforces its own
+limits. Set RATE_LIMIT_REDIS_URL (needs the ``redis`` package and Redis >= 5)
+to share them between workers and hosts. If Redis is unreachable the limiter
+fails open: requests are allowed and counted with outcome="error".
+
+Limits can be overridden per route with RATE_LIMIT_<SCOPE>_IP and
+RATE_LIMIT_<SCOPE>_ACCOUNT, e.g. ``RATE_LIMIT_LOGIN_IP=30/minute``. An empty
+value or ``off`` disables that bucket.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+from fastapi import HTTPException, Request, status
+
+from app.core.metrics import RATE_LIMIT_DECISIONS
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# nginx overwrites X-Real-IP with the peer address; only trust it behind the proxy
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "1") == "1"
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass(frozen=True)
+class Rate:
+    capacity: int
+    per_second: float
+
+    @classmethod
+    def parse(cls, spec: str) -> "Rate":
+        """``"10/minute"``: bursts of 10, refilled at 10 per minute"""
+        count, _, period = spec.strip().partition("/")
+        try:
+            seconds = _PERIODS[period.strip().rstrip("s")]
+            capacity = int(count)
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid rate limit {spec!r}, expected e.g. '10/minute'") from None
+        if capacity <= 0:
+            raise ValueError(f"Invalid rate limit {spec!r}, count must be positive")
+        return cls(capacity, capacity / seconds)
+
+
+class MemoryBackend:
+    """Per-process buckets; the least recently used are dropped past ``maxsize``"""
+
+    def __init__(self, maxsize: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (tokens, last refill)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: Rate) -> float:
+        """Take one token; returns 0 when allowed, else seconds until one is available"""
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (rate.capacity, now))
+            tokens = min(rate.capacity, tokens + (now - updated) * rate.per_second)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate.per_second
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+# Same algorithm as MemoryBackend.take, atomically on the Redis server clock
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Buckets shared by every worker through one Redis hash per key"""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the 'redis' package is not installed") from exc
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_TOKEN_BUCKET_LUA)
+
+    async def take(self, key: str, rate: Rate) -> float:
+        return float(await self._script(keys=[key], args=[rate.capacity, rate.per_second]))
+
+
+_backend: MemoryBackend | RedisBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> MemoryBackend | RedisBackend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = RedisBackend(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else MemoryBackend()
+        return _backend
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_PROXY and request.headers.get("x-real-ip"):
+        return request.headers["x-real-ip"].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _configured(scope: str, bucket: str, default: str | None) -> Rate | None:
+    spec = os.getenv(f"RATE_LIMIT_{scope.upper()}_{bucket}", default)
+    if not spec or spec.strip().lower() == "off":
+        return None
+    return Rate.parse(spec)
+
+
+class RateLimit:
+    """FastAPI dependency enforcing one route's per-IP and per-account buckets
+
+    ``account_field`` is a dotted path into the JSON body (``"patient.email"``).
+    Requests whose body has no such field are only limited per IP.
+    """
+
+    def __init__(
+        self,
+        scope: str,
+        per_ip: str | None = None,
+        per_account: str | None = None,
+        account_field: str = "email",
+    ):
+        self.scope = scope
+        self.per_ip = _configured(scope, "IP", per_ip)
+        self.per_account = _configured(scope, "ACCOUNT", per_account)
+        self.account_field = account_field
+
+    async def _account(self, request: Request) -> str | None:
+        try:
+            value = await request.json()  # cached on the request for the route's own parsing
+        except ValueError:
+            return None  # malformed bodies are left to request validation
+        for part in self.account_field.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if not isinstance(value, str) or not value.strip():
+            return None
+        # Bucket keys may sit in a shared store: never keep the address itself
+        return hashlib.sha256(value.strip().lower().encode()).hexdigest()[:32]
+
+    async def __call__(self, request: Request) -> None:
+        if not RATE_LIMIT_ENABLED:
+            return
+        buckets = []
+        if self.per_ip:
+            buckets.append(("ip", client_ip(request), self.per_ip))
+        if self.per_account:
+            account = await self._account(request)
+            if account:
+                buckets.append(("account", account, self.per_account))
+
+        for bucket, identity, rate in buckets:
+            try:
+                wait = await get_backend().take(f"rl:{self.scope}:{bucket}:{identity}", rate)
+            except Exception:
+                logger.warning("Rate limit backend failed, allowing request", exc_info=True)
+                RATE_LIMIT_DECISIONS.inc(scope=self.scope, bucket=bucket, outcome="error")
+                continue
+            if wait > 0:
+                RATE_LIMIT_DECISIONS.inc(scope=self.scope, bucket=bucket, outcome="rejected")
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests, please retry later",
+                    headers={"Retry-After": str(max(1, math.ceil(wait)))},
+                )
+            RATE_LIMIT_DECISIONS.inc(scope=self.scope, bucket=bucket, outcome="allowed")
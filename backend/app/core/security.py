@@ -1,39 +1,93 @@
+import base64
+import hashlib
+import logging
 import os
 from datetime import datetime, timedelta
 from typing import Union
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
 from jose import jwt
-from passlib.context import CryptContext
+
+from app.core.hashing import PASSWORD_HASH_ROUNDS, build_context
+from app.core.metrics import PASSWORD_HASH_OPERATIONS
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-keep-it-secret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
-ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", Fernet.generate_key().decode())
+# "production" requires explicit data keys (see _derived_key)
+ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+
+logger = logging.getLogger(__name__)
+
+
+def _derived_key(name: str, label: bytes) -> bytes:
+    """Development and test fallback for an unset key: derived from SECRET_KEY
+
+    Not for production: the default SECRET_KEY is public, and rotating the
+    JWT secret would change the key under data already written with it.
+    """
+    if ENVIRONMENT == "production":
+        raise RuntimeError(f"{name} must be set in production; refusing to derive it from SECRET_KEY")
+    logger.warning("%s is not set; deriving it from SECRET_KEY (development only)", name)
+    return hashlib.sha256(label + SECRET_KEY.encode()).digest()
+
+
+def _load_encryption_keys() -> list[str]:
+    """ENCRYPTION_KEYS="new,old,...": the first key encrypts, every key decrypts
+
+    ENCRYPTION_KEY (single key) is still honoured. Without either, outside
+    production, a key is derived from SECRET_KEY so every worker and restart
+    agrees on it.
+    """
+    keys = [k.strip() for k in os.getenv("ENCRYPTION_KEYS", "").split(",") if k.strip()]
+    if not keys and os.getenv("ENCRYPTION_KEY"):
+        keys = [os.environ["ENCRYPTION_KEY"]]
+    if not keys:
+        keys = [base64.urlsafe_b64encode(_derived_key("ENCRYPTION_KEYS", b"telemed-encryption-key:")).decode()]
+    return keys
+
+
+def key_fingerprint(key: str) -> str:
+    """Short non-secret identifier of a key, for logs and rotation checkpoints"""
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+ENCRYPTION_KEYS = _load_encryption_keys()
+ENCRYPTION_KEY = ENCRYPTION_KEYS[0]
+
+# HMAC key for blind indexes (app.db.blind_index). Changing it requires
+# rebuilding them: python -m app.cli backfill-blind-indexes --all
+BLIND_INDEX_KEY = (
+    os.getenv("BLIND_INDEX_KEY") or _derived_key("BLIND_INDEX_KEY", b"telemed-blind-index-key:").hex()
+).encode()
 
-pwd_context = CryptContext(
-    schemes=["pbkdf2_sha256"],
-    deprecated="auto",
-)
-cipher_suite = Fernet(ENCRYPTION_KEY.encode())
+# Sync helpers for scripts and startup; request handlers use app.core.hashing
+pwd_context = build_context(PASSWORD_HASH_ROUNDS)
+# Decrypts with any configured key; MultiFernet.rotate() re-encrypts with the first
+cipher_suite = MultiFernet([Fernet(key.encode()) for key in ENCRYPTION_KEYS])
+primary_cipher = Fernet(ENCRYPTION_KEY.encode())
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
+    PASSWORD_HASH_OPERATIONS.inc(operation="verify")
     return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
+    PASSWORD_HASH_OPERATIONS.inc(operation="hash")
     return pwd_context.hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=15)
+    # iat keys the principal cache (app.core.principal_cache)
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
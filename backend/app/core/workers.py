@@ -0,0 +1,56 @@
+"""In-process background threads for the outbox, reminders and PDF exports
+
+Each thread calls ``step`` in a loop. While it reports work done it runs
+again at once; otherwise the thread sleeps ``poll_seconds`` or until
+``notify()`` (call it after committing new work). An exception (database
+down, a bad row) is logged and the thread keeps polling.
+"""
+
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorkers:
+    def __init__(self, name: str, step: Callable[[], bool], poll_seconds: float):
+        self.name = name
+        self.step = step
+        self.poll_seconds = poll_seconds
+        self._threads: list[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def notify(self) -> None:
+        """Wake this process's threads"""
+        self._wakeup.set()
+
+    def _work(self, poll_seconds: float) -> None:
+        while not self._stop.is_set():
+            try:
+                busy = self.step()
+            except Exception:
+                logger.exception("%s worker failed", self.name)
+                busy = False
+            if not busy:
+                self._wakeup.wait(poll_seconds)
+                self._wakeup.clear()
+
+    def start(self, count: int, poll_seconds: float | None = None) -> None:
+        if self._threads or count <= 0:
+            return
+        self._stop.clear()
+        poll_seconds = self.poll_seconds if poll_seconds is None else poll_seconds
+        for i in range(count):
+            thread = threading.Thread(target=self._work, args=(poll_seconds,), name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10) -> None:
+        """Let the current step finish; threads still running after ``timeout`` are left behind"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
@@ -0,0 +1,503 @@
+"""Synthetic production-sized data: ``python -m app.cli generate-dataset``
+
+Generates doctors across specialties, patients, clinical records,
+consultations and one payment per consultation, appended after the rows
+already in the database. It is meant for load tests and for reproducing slow
+query plans, so volumes go to millions of rows:
+
+* PostgreSQL loads each batch with ``COPY ... FROM STDIN``; other databases
+  use one executemany INSERT per batch. Each batch is its own transaction.
+* Primary keys are assigned here (continuing from the current maximum), so
+  child rows reference parents without reading ids back. Sequences are
+  moved past them when a table is done.
+* Memory is bounded by ``batch_size`` rows; parents are referenced by id
+  range, never held in memory.
+* Each table draws from its own ``random.Random`` seeded from ``seed``, so the
+  same seed, sizes and ``until`` produce the same plaintext data on an empty
+  database. Fernet tokens differ between runs (they embed a random IV).
+
+Encrypted columns hold real tokens under the current key. Clinical notes come
+from small vocabularies, so each distinct value is encrypted once and its
+token reused. Phones are encrypted per patient.
+"""
+
+import csv
+import io
+import logging
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from typing import Callable, Iterator, Sequence
+
+from sqlalchemy import Table, func, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core import security
+from app.core.security import get_password_hash
+from app.db.blind_index import blind_index
+from app.db.encrypted import Ciphertext
+from app.db.search import normalize_search_text
+from app.db.seed import (
+    ALLERGIES,
+    BACKGROUNDS,
+    COMPLAINTS,
+    FIRST_NAMES,
+    LAST_NAMES,
+    MEDICATIONS,
+    PLANS,
+)
+from app.models.consultation import (
+    Consultation,
+    ConsultationStatus,
+    Payment,
+    PaymentStatus,
+)
+from app.models.history import ClinicalRecord
+from app.models.user import Patient, User
+
+logger = logging.getLogger(__name__)
+
+DATASET_BATCH_SIZE = 10_000
+# Responses validate emails as EmailStr, which rejects reserved TLDs such as
+# .test and .example: use a real documentation domain
+DATASET_EMAIL_DOMAIN = "loadtest.example.com"
+# Every generated doctor logs in with this password
+DATASET_PASSWORD = "LoadTest123!"
+
+SPECIALTIES = {
+    "Medicina General": Decimal("40.00"),
+    "Cardiología": Decimal("80.00"),
+    "Pediatría": Decimal("50.00"),
+    "Dermatología": Decimal("60.00"),
+    "Psicología": Decimal("55.00"),
+    "Ginecología": Decimal("70.00"),
+    "Oftalmología": Decimal("65.00"),
+}
+REASONS = [
+    "Dolor de cabeza persistente",
+    "Chequeo anual de rutina",
+    "Fiebre y tos",
+    "Problemas de sueño",
+    "Dolor abdominal",
+    "Revisión de medicación",
+    "Consulta de seguimiento",
+    "Dolor en el pecho",
+    "Problemas de ansiedad",
+    "Lesión deportiva",
+]
+# Patients and clinical records span this far back; consultations are
+# scheduled up to FUTURE_DAYS after ``until``
+HISTORY_DAYS = 5 * 365
+FUTURE_DAYS = 60
+
+
+@dataclass
+class DatasetSpec:
+    doctors: int = 200
+    patients: int = 100_000
+    records: int = 500_000
+    consultations: int = 200_000
+    seed: int = 0
+    until: datetime = field(
+        default_factory=lambda: datetime.utcnow().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+    )
+    batch_size: int = DATASET_BATCH_SIZE
+
+
+@dataclass
+class TableProgress:
+    table: str
+    written: int
+    total: int
+
+
+class _Tokens:
+    """Fernet token per distinct plaintext, encrypted once"""
+
+    def __init__(self):
+        self._tokens: dict[str, Ciphertext] = {}
+
+    def __call__(self, value: str) -> Ciphertext:
+        token = self._tokens.get(value)
+        if token is None:
+            token = self._tokens[value] = encrypt(value)
+        return token
+
+
+def encrypt(value: str) -> Ciphertext:
+    # Ciphertext: executemany binds it through EncryptedText unchanged
+    return Ciphertext(security.cipher_suite.encrypt(value.encode()).decode())
+
+
+def _rng(spec: DatasetSpec, table: str) -> random.Random:
+    return random.Random(f"{spec.seed}:{table}")
+
+
+def _spread(
+    start: datetime, span: timedelta, index: int, total: int, rng: random.Random
+) -> datetime:
+    """Timestamps that grow with the id, as rows inserted over time do"""
+    step = span / max(total, 1)
+    return start + step * index + step * rng.random()
+
+
+def _batches(rows: Iterator[tuple], size: int) -> Iterator[list[tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def doctor_rows(spec: DatasetSpec, first_id: int) -> Iterator[tuple]:
+    rng = _rng(spec, "users")
+    hashed_password = get_password_hash(DATASET_PASSWORD)
+    specialties = list(SPECIALTIES)
+    created = spec.until - timedelta(days=HISTORY_DAYS)
+    for i in range(spec.doctors):
+        user_id = first_id + i
+        email = f"doctor{user_id}@{DATASET_EMAIL_DOMAIN}"
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+        yield (
+            user_id,
+            email,
+            blind_index(email),
+            hashed_password,
+            True,
+            False,
+            True,
+            "specialist",
+            name,
+            f"LT{user_id:08d}",
+            specialties[i % len(specialties)],
+            False,
+            created,
+            created,
+        )
+
+
+DOCTOR_COLUMNS = (
+    "id",
+    "email",
+    "email_bidx",
+    "hashed_password",
+    "is_active",
+    "is_superuser",
+    "is_medical_professional",
+    "role",
+    "full_name",
+    "license_number",
+    "specialty",
+    "is_first_login",
+    "created_at",
+    "updated_at",
+)
+
+
+def patient_rows(spec: DatasetSpec, first_id: int) -> Iterator[tuple]:
+    rng = _rng(spec, "patients")
+    span = timedelta(days=HISTORY_DAYS)
+    start = spec.until - span
+    for i in range(spec.patients):
+        patient_id = first_id + i
+        first, last1, last2 = (
+            rng.choice(FIRST_NAMES),
+            rng.choice(LAST_NAMES),
+            rng.choice(LAST_NAMES),
+        )
+        email = normalize_search_text(
+            f"{first}.{last1}.{patient_id}@{DATASET_EMAIL_DOMAIN}"
+        )
+        phone = f"6{rng.randint(10000000, 99999999)}"
+        yield (
+            patient_id,
+            f"{first} {last1} {last2}",
+            email,
+            blind_index(email),
+            encrypt(phone),
+            _spread(start, span, i, spec.patients, rng),
+        )
+
+
+PATIENT_COLUMNS = ("id", "full_name", "email", "email_bidx", "phone", "created_at")
+
+
+def record_rows(
+    spec: DatasetSpec, first_id: int, patient_ids: range
+) -> Iterator[tuple]:
+    rng = _rng(spec, "clinical_records")
+    tokens = _Tokens()
+    span = timedelta(days=HISTORY_DAYS)
+    start = spec.until - span
+    for i in range(spec.records):
+        yield (
+            first_id + i,
+            rng.choice(patient_ids),
+            tokens(rng.choice(COMPLAINTS)),
+            tokens(rng.choice(BACKGROUNDS)),
+            tokens("Evolución favorable. Sin signos de alarma."),
+            tokens(rng.choice(PLANS)),
+            tokens(rng.choice(ALLERGIES)),
+            tokens(rng.choice(MEDICATIONS)),
+            _spread(start, span, i, spec.records, rng),
+        )
+
+
+RECORD_COLUMNS = (
+    "id",
+    "patient_id",
+    "chief_complaint",
+    "background",
+    "assessment",
+    "plan",
+    "allergies",
+    "medications",
+    "created_at",
+)
+
+
+def _consultation_status(
+    rng: random.Random, scheduled_at: datetime, until: datetime
+) -> str:
+    if scheduled_at >= until:
+        return rng.choices(
+            [ConsultationStatus.CONFIRMED, ConsultationStatus.PENDING], [4, 1]
+        )[0].value
+    return rng.choices(
+        [
+            ConsultationStatus.COMPLETED,
+            ConsultationStatus.CANCELLED,
+            ConsultationStatus.NO_SHOW,
+        ],
+        [16, 3, 1],
+    )[0].value
+
+
+_PAYMENT_STATUS = {
+    ConsultationStatus.COMPLETED.value: PaymentStatus.COMPLETED.value,
+    ConsultationStatus.CONFIRMED.value: PaymentStatus.COMPLETED.value,
+    ConsultationStatus.NO_SHOW.value: PaymentStatus.COMPLETED.value,
+    ConsultationStatus.CANCELLED.value: PaymentStatus.REFUNDED.value,
+    ConsultationStatus.PENDING.value: PaymentStatus.PENDING.value,
+}
+
+
+def consultation_rows(
+    spec: DatasetSpec,
+    first_id: int,
+    patient_ids: range,
+    doctors: Sequence[tuple[int, str]],
+) -> Iterator[tuple[tuple, tuple]]:
+    """(consultation, payment) pairs; payments share the consultation's id offset"""
+    rng = _rng(spec, "consultations")
+    # A few doctors carry most of the load, as in production
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(doctors))))
+    start = spec.until - timedelta(days=HISTORY_DAYS)
+    span = timedelta(days=HISTORY_DAYS + FUTURE_DAYS)
+    for i in range(spec.consultations):
+        consultation_id = first_id + i
+        doctor_id, specialty = rng.choices(doctors, cum_weights=cum_weights)[0]
+        scheduled_at = _spread(start, span, i, spec.consultations, rng).replace(
+            second=0, microsecond=0
+        )
+        created_at = scheduled_at - timedelta(
+            days=rng.randint(1, 30), minutes=rng.randint(0, 1439)
+        )
+        status = _consultation_status(rng, scheduled_at, spec.until)
+        started_at = (
+            scheduled_at if status == ConsultationStatus.COMPLETED.value else None
+        )
+        ended_at = (
+            scheduled_at + timedelta(minutes=rng.randint(10, 40))
+            if started_at
+            else None
+        )
+        room = f"Telemed_{consultation_id}_{rng.getrandbits(32):08x}"
+        consultation = (
+            consultation_id,
+            rng.choice(patient_ids),
+            doctor_id,
+            "video",
+            specialty,
+            rng.choice(REASONS),
+            scheduled_at,
+            30,
+            status,
+            room,
+            f"https://meet.jit.si/{room}",
+            created_at,
+            ended_at or created_at,
+            started_at,
+            ended_at,
+        )
+
+        payment_status = _PAYMENT_STATUS[status]
+        amount = SPECIALTIES[specialty]
+        paid = payment_status != PaymentStatus.PENDING.value
+        payment = (
+            consultation_id,
+            consultation_id,
+            amount,
+            "EUR",
+            payment_status,
+            f"pi_synthetic_{consultation_id}" if paid else None,
+            f"cs_synthetic_{consultation_id}",
+            amount if payment_status == PaymentStatus.REFUNDED.value else None,
+            created_at,
+            created_at,
+            created_at if paid else None,
+        )
+        yield consultation, payment
+
+
+CONSULTATION_COLUMNS = (
+    "id",
+    "patient_id",
+    "doctor_id",
+    "consultation_type",
+    "specialty",
+    "reason_for_visit",
+    "scheduled_at",
+    "duration_minutes",
+    "status",
+    "jitsi_room_name",
+    "jitsi_room_url",
+    "created_at",
+    "updated_at",
+    "started_at",
+    "ended_at",
+)
+PAYMENT_COLUMNS = (
+    "id",
+    "consultation_id",
+    "amount",
+    "currency",
+    "status",
+    "stripe_payment_intent_id",
+    "stripe_session_id",
+    "refund_amount",
+    "created_at",
+    "updated_at",
+    "completed_at",
+)
+
+
+def write_rows(
+    conn: Connection, table: Table, columns: Sequence[str], rows: list[tuple]
+) -> None:
+    if conn.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)  # None becomes an unquoted empty field: NULL
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+    else:
+        conn.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+def _next_id(conn: Connection, table: Table) -> int:
+    return (conn.scalar(select(func.max(table.c.id))) or 0) + 1
+
+
+def _finish_table(conn: Connection, table: Table) -> None:
+    if conn.dialect.name == "postgresql":
+        conn.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), (SELECT max(id) FROM {table.name}))"
+            )
+        )
+        conn.execute(text(f"ANALYZE {table.name}"))
+    conn.commit()
+
+
+def generate(
+    engine: Engine,
+    spec: DatasetSpec,
+    on_progress: Callable[[TableProgress], None] | None = None,
+) -> dict[str, int]:
+    """Append ``spec``'s volumes of data; returns rows written per table"""
+    users, patients = User.__table__, Patient.__table__
+    records, consultations, payments = (
+        ClinicalRecord.__table__,
+        Consultation.__table__,
+        Payment.__table__,
+    )
+
+    def load(conn, table, columns, rows, total):
+        written = 0
+        for batch in _batches(rows, spec.batch_size):
+            write_rows(conn, table, columns, batch)
+            conn.commit()
+            written += len(batch)
+            if on_progress:
+                on_progress(TableProgress(table.name, written, total))
+        _finish_table(conn, table)
+        return written
+
+    if (spec.records or spec.consultations) and not spec.patients:
+        raise ValueError("clinical records and consultations need patients")
+    if spec.consultations and not spec.doctors:
+        raise ValueError("consultations need doctors")
+
+    counts = {}
+    with engine.connect() as conn:
+        first_doctor = _next_id(conn, users)
+        counts[users.name] = load(
+            conn, users, DOCTOR_COLUMNS, doctor_rows(spec, first_doctor), spec.doctors
+        )
+        specialties = list(SPECIALTIES)
+        doctors = [
+            (first_doctor + i, specialties[i % len(specialties)])
+            for i in range(spec.doctors)
+        ]
+
+        first_patient = _next_id(conn, patients)
+        counts[patients.name] = load(
+            conn,
+            patients,
+            PATIENT_COLUMNS,
+            patient_rows(spec, first_patient),
+            spec.patients,
+        )
+        patient_ids = range(first_patient, first_patient + spec.patients)
+
+        counts[records.name] = load(
+            conn,
+            records,
+            RECORD_COLUMNS,
+            record_rows(spec, _next_id(conn, records), patient_ids),
+            spec.records,
+        )
+
+        # Payments reuse the consultation ids, so both must start after every existing row
+        first_consultation = max(
+            _next_id(conn, consultations), _next_id(conn, payments)
+        )
+        pairs = consultation_rows(spec, first_consultation, patient_ids, doctors)
+        written = 0
+        for batch in _batches(pairs, spec.batch_size):
+            write_rows(conn, consultations, CONSULTATION_COLUMNS, [c for c, _ in batch])
+            write_rows(conn, payments, PAYMENT_COLUMNS, [p for _, p in batch])
+            conn.commit()
+            written += len(batch)
+            if on_progress:
+                on_progress(
+                    TableProgress(consultations.name, written, spec.consultations)
+                )
+        _finish_table(conn, consultations)
+        _finish_table(conn, payments)
+        counts[consultations.name] = counts[payments.name] = written
+    return counts
@@ -0,0 +1,189 @@
+"""Encrypted PII columns: encrypt on write, decrypt lazily on read
+
+``EncryptedText`` stores Fernet tokens (``app.core.security.cipher_suite``).
+Loading a row does no crypto: the column attribute holds the token wrapped as
+``Ciphertext``, and the public attribute (``encrypted_synonym``) decrypts it
+on first access and keeps the plaintext on the instance. Inside a
+``decryption_scope()`` (one per HTTP request, see ``app.main``) plaintexts
+are also kept in a bounded LRU keyed by token, so rows loaded twice in a
+request are decrypted once.
+
+List endpoints and PDF exports call ``decrypt_loaded()`` on their results:
+one pass over every pending token, deduplicated, instead of a property call
+and cache lookup per object and field.
+
+Rows written before encryption was enabled hold plaintext. A value that is
+not a Fernet token is returned as stored, so old rows keep working until
+they are rewritten. A token that no configured key decrypts raises
+``DecryptionFailed`` (a 500, see ``app.main``): ciphertext is never handed
+out as if it were the value.
+"""
+
+import logging
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+from cryptography.fernet import InvalidToken
+from sqlalchemy import Text, inspect
+from sqlalchemy.orm import synonym
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.types import TypeDecorator
+
+from app.core import security
+from app.core.metrics import FIELD_DECRYPTION_FAILURES, FIELD_DECRYPTIONS
+
+logger = logging.getLogger(__name__)
+
+DECRYPTION_CACHE_SIZE = int(os.getenv("DECRYPTION_CACHE_SIZE", "4096"))
+
+# Every Fernet token starts with the base64 of version byte 0x80 and a timestamp
+_TOKEN_PREFIX = "gAAAAA"
+
+
+class DecryptionFailed(Exception):
+    """A stored token does not decrypt with the configured keys (ENCRYPTION_KEYS missing a key?)"""
+
+
+class Ciphertext(str):
+    """A column value as loaded from the database, not decrypted yet"""
+
+    __slots__ = ()
+
+
+class EncryptedText(TypeDecorator):
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, Ciphertext):
+            return str(value)  # unchanged since load: keep the stored token
+        return security.cipher_suite.encrypt(value.encode()).decode()
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else Ciphertext(value)
+
+
+class _DecryptionCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, str] = OrderedDict()
+
+    def get(self, token: str) -> str | None:
+        plaintext = self._entries.get(token)
+        if plaintext is not None:
+            self._entries.move_to_end(token)
+        return plaintext
+
+    def put(self, token: str, plaintext: str) -> None:
+        self._entries[token] = plaintext
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+_cache: ContextVar[_DecryptionCache | None] = ContextVar("decryption_cache", default=None)
+
+
+@contextmanager
+def decryption_scope(maxsize: int = DECRYPTION_CACHE_SIZE) -> Iterator[None]:
+    """Share decrypted values within the current context (request scope)"""
+    token = _cache.set(_DecryptionCache(maxsize))
+    try:
+        yield
+    finally:
+        _cache.reset(token)
+
+
+def is_token(value: str) -> bool:
+    """False for plaintext stored before encryption was enabled"""
+    return value.startswith(_TOKEN_PREFIX)
+
+
+def _decrypt(token: str) -> str:
+    if not is_token(token):
+        return token  # stored before encryption was enabled
+    try:
+        return security.cipher_suite.decrypt(token.encode()).decode()
+    except InvalidToken:
+        FIELD_DECRYPTION_FAILURES.inc()
+        logger.error("Encrypted column value does not decrypt with the configured keys")
+        raise DecryptionFailed() from None
+
+
+def decrypt_value(token: str) -> str:
+    cache = _cache.get()
+    plaintext = cache.get(token) if cache is not None else None
+    if plaintext is None:
+        plaintext = _decrypt(token)
+        FIELD_DECRYPTIONS.inc(path="lazy")
+        if cache is not None:
+            cache.put(token, plaintext)
+    return plaintext
+
+
+def encrypted_synonym(column_key: str):
+    """Public attribute for the EncryptedText column mapped as ``column_key``
+
+    Class-level access proxies the column (for filters and ordering); instance
+    access returns plaintext.
+    """
+
+    def fget(obj):
+        value = getattr(obj, column_key)
+        if isinstance(value, Ciphertext):
+            value = decrypt_value(value)
+            # Committed, not a change: the row is not rewritten on flush
+            set_committed_value(obj, column_key, value)
+        return value
+
+    def fset(obj, value):
+        setattr(obj, column_key, value)
+
+    return synonym(column_key, descriptor=property(fget, fset))
+
+
+@lru_cache(maxsize=None)
+def _encrypted_keys(cls: type) -> tuple[str, ...]:
+    return tuple(
+        attr.key
+        for attr in inspect(cls).column_attrs
+        if isinstance(attr.columns[0].type, EncryptedText)
+    )
+
+
+def decrypt_loaded(objects: Iterable[object]) -> None:
+    """Decrypt every encrypted attribute of ``objects`` in one pass (None entries are skipped)"""
+    pending = []
+    for obj in objects:
+        if obj is None:
+            continue
+        state = obj.__dict__
+        for key in _encrypted_keys(type(obj)):
+            value = state.get(key)
+            if isinstance(value, Ciphertext):
+                pending.append((obj, key, value))
+    if not pending:
+        return
+
+    cache = _cache.get()
+    plaintexts: dict[str, str] = {}
+    decrypted = 0
+    for _, _, token in pending:
+        if token in plaintexts:
+            continue
+        plaintext = cache.get(token) if cache is not None else None
+        if plaintext is None:
+            plaintext = _decrypt(token)
+            decrypted += 1
+            if cache is not None:
+                cache.put(token, plaintext)
+        plaintexts[token] = plaintext
+    FIELD_DECRYPTIONS.inc(decrypted, path="batch")
+
+    for obj, key, token in pending:
+        set_committed_value(obj, key, plaintexts[token])
@@ -0,0 +1,216 @@
+"""Re-encrypt EncryptedText columns under the primary key, without downtime
+
+Put the new key first in ENCRYPTION_KEYS, keeping the old ones after it so
+every worker can still read old values, then run
+``python -m app.cli rotate-keys``.
+
+Each table is walked in primary-key order, ``batch_size`` rows per short
+transaction, so memory use is bounded and no lock is held for long:
+
+- values already under the primary key are skipped, so a resumed or repeated
+  run only writes rows that still need it. Legacy plaintext is encrypted;
+- an UPDATE only applies while the column still holds the value that was
+  read, so a concurrent write from the app is never overwritten;
+- the checkpoint (last id and counters) commits with the batch, so a killed
+  job resumes where it stopped.
+
+``rows_per_second`` caps throughput, which also bounds the WAL written per
+second. Once every table reports finished, drop the old keys from
+ENCRYPTION_KEYS.
+"""
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from cryptography.fernet import InvalidToken
+from sqlalchemy import Column, Table, Text, bindparam, func, insert, select, text, update
+from sqlalchemy.engine import Engine
+
+from app.core import security
+from app.db.encrypted import EncryptedText, is_token
+from app.db.session import Base
+from app.models.key_rotation import KeyRotationCheckpoint
+
+logger = logging.getLogger(__name__)
+
+REKEY_BATCH_SIZE = int(os.getenv("REKEY_BATCH_SIZE", "500"))
+REKEY_ROWS_PER_SECOND = float(os.getenv("REKEY_ROWS_PER_SECOND", "2000"))
+# Give up on a batch rather than queue behind (and in front of) DDL or long transactions
+REKEY_LOCK_TIMEOUT = "2s"
+
+_checkpoints = KeyRotationCheckpoint.__table__
+
+
+@dataclass
+class RotationProgress:
+    table: str
+    last_id: int
+    max_id: int
+    rows_scanned: int
+    rows_rewritten: int
+    undecryptable: int = 0
+    finished: bool = False
+
+    @property
+    def percent(self) -> float:
+        if self.finished or not self.max_id:
+            return 100.0
+        return min(100.0, 100.0 * self.last_id / self.max_id)
+
+
+def encrypted_tables() -> dict[Table, list[Column]]:
+    """Every mapped table with EncryptedText columns"""
+    tables = {}
+    for table in Base.metadata.sorted_tables:
+        columns = [c for c in table.columns if isinstance(c.type, EncryptedText)]
+        if columns:
+            tables[table] = columns
+    return tables
+
+
+def _rekeyed(value: str) -> str | None:
+    """``value`` encrypted under the primary key, or None when it already is"""
+    if not is_token(value):
+        return security.primary_cipher.encrypt(value.encode()).decode()
+    try:
+        security.primary_cipher.decrypt(value.encode())
+        return None
+    except InvalidToken:
+        return security.cipher_suite.rotate(value.encode()).decode()
+
+
+def _load_checkpoint(conn, table: Table, fingerprint: str):
+    where = (_checkpoints.c.table_name == table.name) & (_checkpoints.c.key_fingerprint == fingerprint)
+    row = conn.execute(select(_checkpoints).where(where)).first()
+    if row is None:
+        conn.execute(
+            insert(_checkpoints).values(
+                table_name=table.name, key_fingerprint=fingerprint, last_id=0, rows_scanned=0, rows_rewritten=0
+            )
+        )
+        row = conn.execute(select(_checkpoints).where(where)).first()
+    return where, row
+
+
+def rotate_table(
+    engine: Engine,
+    table: Table,
+    columns: list[Column],
+    batch_size: int = REKEY_BATCH_SIZE,
+    rows_per_second: float = REKEY_ROWS_PER_SECOND,
+    on_progress: Callable[[RotationProgress], None] | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+) -> RotationProgress:
+    (pk,) = table.primary_key.columns
+    fingerprint = security.key_fingerprint(security.ENCRYPTION_KEY)
+
+    with engine.begin() as conn:
+        where, checkpoint = _load_checkpoint(conn, table, fingerprint)
+        max_id = conn.scalar(select(func.max(pk))) or 0
+    progress = RotationProgress(
+        table=table.name,
+        last_id=checkpoint.last_id,
+        max_id=max_id,
+        rows_scanned=checkpoint.rows_scanned,
+        rows_rewritten=checkpoint.rows_rewritten,
+        finished=checkpoint.finished_at is not None,
+    )
+    if progress.finished:
+        return progress
+
+    # Raw Text binds: values are written exactly as computed, never re-encrypted
+    values = {c.name: bindparam(f"_new_{c.name}", type_=Text) for c in columns}
+    if "updated_at" in table.c:
+        # Same plaintext: not an edit (and keeps cached PDFs valid)
+        values["updated_at"] = table.c.updated_at
+    rewrite = (
+        update(table)
+        .where(pk == bindparam("_id"))
+        .where(*[c.is_not_distinct_from(bindparam(f"_old_{c.name}", type_=Text)) for c in columns])
+        .values(values)
+    )
+    batch_query = select(pk, *columns).where(pk > bindparam("last_id")).order_by(pk).limit(batch_size)
+
+    started, scanned = clock(), 0
+    while True:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text(f"SET LOCAL lock_timeout = '{REKEY_LOCK_TIMEOUT}'"))
+            rows = conn.execute(batch_query, {"last_id": progress.last_id}).all()
+            if not rows:
+                conn.execute(update(_checkpoints).where(where).values(finished_at=datetime.utcnow()))
+                progress.finished = True
+                break
+
+            params = []
+            for row in rows:
+                old = {c.name: row._mapping[c] for c in columns}
+                new = dict(old)
+                for name, value in old.items():
+                    if value is None:
+                        continue
+                    try:
+                        rekeyed = _rekeyed(value)
+                    except InvalidToken:
+                        progress.undecryptable += 1
+                        logger.error("%s id=%s: %s does not decrypt with any configured key", table.name, row[0], name)
+                        continue
+                    if rekeyed is not None:
+                        new[name] = rekeyed
+                if new != old:
+                    params.append(
+                        {"_id": row[0]}
+                        | {f"_old_{k}": str(v) if v is not None else None for k, v in old.items()}
+                        | {f"_new_{k}": str(v) if v is not None else None for k, v in new.items()}
+                    )
+
+            rewritten = 0
+            if params:
+                result = conn.execute(rewrite, params)
+                # Rows changed by the app since the read are skipped by the WHERE clause
+                rewritten = result.rowcount if result.supports_sane_multi_rowcount() else len(params)
+
+            progress.last_id = rows[-1][0]
+            progress.rows_scanned += len(rows)
+            progress.rows_rewritten += rewritten
+            conn.execute(
+                update(_checkpoints)
+                .where(where)
+                .values(
+                    last_id=progress.last_id,
+                    rows_scanned=progress.rows_scanned,
+                    rows_rewritten=progress.rows_rewritten,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+
+        if on_progress:
+            on_progress(progress)
+        scanned += len(rows)
+        ahead = scanned / rows_per_second - (clock() - started)
+        if ahead > 0:
+            sleep(ahead)
+
+    if on_progress:
+        on_progress(progress)
+    return progress
+
+
+def rotate_all(engine: Engine, tables: list[str] | None = None, **options) -> list[RotationProgress]:
+    results = []
+    for table, columns in encrypted_tables().items():
+        if tables and table.name not in tables:
+            continue
+        results.append(rotate_table(engine, table, columns, **options))
+    return results
+
+
+def rotation_status(engine: Engine) -> list[dict]:
+    with engine.connect() as conn:
+        rows = conn.execute(select(_checkpoints).order_by(_checkpoints.c.started_at)).mappings().all()
+    return [dict(row) for row in rows]
@@ -0,0 +1,35 @@
+"""Compare the database's Alembic revision with the migration scripts"""
+
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy.engine import Engine
+
+ALEMBIC_DIR = Path(__file__).resolve().parents[2] / "alembic"
+
+
+@lru_cache(maxsize=1)
+def head_revisions() -> frozenset[str]:
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    return frozenset(ScriptDirectory.from_config(config).get_heads())
+
+
+def current_revisions(engine: Engine) -> frozenset[str]:
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.connect() as conn:
+        return frozenset(MigrationContext.configure(conn).get_current_heads())
+
+
+def schema_is_current(engine: Engine) -> bool:
+    """True when the database is stamped at every head revision
+
+    A database that was never stamped (e.g. built by ``create_all``) is not
+    current, so callers fall back to creating missing tables.
+    """
+    current = current_revisions(engine)
+    return bool(current) and current == head_revisions()
@@ -0,0 +1,100 @@
+"""Keyset (cursor) pagination over a ``(sort key, id)`` pair
+
+Rather than OFFSET, each page continues strictly after the last row of the
+previous one, so deep pages cost the same as the first one and the
+``(sort key, id)`` index serves the scan. Cursors are opaque to clients:
+base64url-encoded JSON of the last row's sort key and id.
+
+Usage in a handler::
+
+    page = CursorParams(cursor, limit)
+    query = page.apply(select(Model), Model.created_at, Model.id, descending=True)
+    rows = (await db.scalars(query)).all()
+    return page.finish(rows, request, response)
+
+Bodies stay plain JSON lists; the next page is advertised in the ``Link``
+(``rel="next"``) and ``X-Next-Cursor`` headers and is absent on the last page.
+The sort column must be NOT NULL (or coalesced) for the comparison to hold.
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, Sequence
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.orm import InstrumentedAttribute, Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    if isinstance(sort_value, (datetime, date)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, sort_column: InstrumentedAttribute) -> tuple[Any, int]:
+    """Inverse of encode_cursor; a malformed cursor is the client's error (400)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        python_type = sort_column.type.python_type
+        if python_type is datetime:
+            sort_value = datetime.fromisoformat(sort_value)
+        elif python_type is date:
+            sort_value = date.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (binascii.Error, ValueError, TypeError, NotImplementedError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+class CursorParams:
+    def __init__(self, cursor: str | None, limit: int):
+        self.cursor = cursor
+        self.limit = limit
+        self._sort_attr: str | None = None
+        self._id_attr: str | None = None
+
+    def apply(
+        self,
+        query: Select | Query,
+        sort_column: InstrumentedAttribute,
+        id_column: InstrumentedAttribute,
+        *,
+        descending: bool = False,
+    ) -> Select | Query:
+        """Restrict ``query`` to rows after the cursor, ordered, with one look-ahead row
+
+        Works on 2.0 ``select()`` and on legacy ``Session.query()`` alike.
+        """
+        self._sort_attr = sort_column.key
+        self._id_attr = id_column.key
+
+        if self.cursor:
+            key = tuple_(sort_column, id_column)
+            after = tuple_(*decode_cursor(self.cursor, sort_column))
+            query = query.where(key < after if descending else key > after)
+
+        if descending:
+            query = query.order_by(sort_column.desc(), id_column.desc())
+        else:
+            query = query.order_by(sort_column.asc(), id_column.asc())
+        return query.limit(self.limit + 1)
+
+    def finish(self, rows: Sequence[Any], request: Request, response: Response) -> list[Any]:
+        """Trim the look-ahead row and advertise the next cursor when there is one"""
+        rows = list(rows)
+        if len(rows) <= self.limit:
+            return rows
+
+        rows = rows[: self.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, self._sort_attr), getattr(last, self._id_attr))
+        next_url = request.url.include_query_params(cursor=next_cursor, limit=self.limit)
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+        return rows
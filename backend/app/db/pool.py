@@ -0,0 +1,53 @@
+"""Connection pools that report checkout wait and occupancy to app.core.metrics"""
+
+import time
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_CONNECTIONS
+
+
+class _TimedCheckout:
+    # pool_logging_name survives Pool.recreate() (engine.dispose()), so it
+    # doubles as the metrics label.
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(
+                time.perf_counter() - start, pool=self._orig_logging_name or "default"
+            )
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(url: str, label: str, is_async: bool = False) -> dict:
+    """create_engine() kwargs for an instrumented pool; SQLite keeps its default pool"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_logging_name": label,
+    }
+
+
+def register_pool_gauges(engine: Engine, label: str) -> None:
+    def collect() -> dict[tuple, float]:
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            return {}
+        return {
+            (label, "size"): pool.size(),
+            (label, "checked_out"): pool.checkedout(),
+            (label, "overflow"): max(pool.overflow(), 0),
+        }
+
+    DB_POOL_CONNECTIONS.add_callback(collect)
@@ -0,0 +1,138 @@
+"""Per-request SQL accounting: statement count, DB time and repeated statement shapes
+
+Engines are instrumented once at import time (see ``app.db.session``). The
+HTTP middleware opens a ``track_queries()`` scope per request; tests use
+``capture_queries()``/``assert_max_queries()``, which see statements from any
+thread, including the TestClient's event loop.
+"""
+
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# A statement shape repeated this many times in one request is logged as a likely N+1
+DUPLICATE_QUERY_THRESHOLD = int(os.getenv("DUPLICATE_QUERY_THRESHOLD", "5"))
+
+_WHITESPACE = re.compile(r"\s+")
+_PARAM_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*,?)+\)")
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so repeats that differ only in parameters compare equal"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _PARAM_LIST.sub("(?)", shape)
+    return _NUMBER.sub("N", shape)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_time: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.total_time += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+    @property
+    def duplicates(self) -> dict[str, int]:
+        """Statement shapes executed more than once, most repeated first"""
+        return {shape: n for shape, n in self.shapes.most_common() if n > 1}
+
+    @property
+    def duplicate_count(self) -> int:
+        """Executions that repeated an earlier shape"""
+        return sum(n - 1 for n in self.shapes.values() if n > 1)
+
+    def report(self) -> str:
+        lines = [f"{self.count} statements in {self.total_time * 1000:.1f} ms"]
+        for shape, n in self.duplicates.items():
+            lines.append(f"  x{n}: {shape[:200]}")
+        return "\n".join(lines)
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+_captures: list[QueryStats] = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    for capture in _captures:
+        capture.record(statement, elapsed)
+
+
+def instrument(engine: Engine) -> None:
+    """Attach the accounting hooks to a sync engine (or an async engine's sync_engine)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Collect statements issued from the current context (request scope)"""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryStats]:
+    """Collect every statement on instrumented engines, whatever thread runs it"""
+    stats = QueryStats()
+    _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        _captures.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """Fail when the wrapped block issues more than ``limit`` statements"""
+    with capture_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        raise AssertionError(
+            f"Query budget exceeded: {stats.count} > {limit}\n{stats.report()}"
+        )
+
+
+def log_request_stats(method: str, path: str, stats: QueryStats) -> None:
+    worst = max(stats.shapes.values(), default=0)
+    if worst >= DUPLICATE_QUERY_THRESHOLD:
+        logger.warning(
+            "Possible N+1 on %s %s: %s", method, path, stats.report()
+        )
+    else:
+        logger.debug(
+            "%s %s: %d statements in %.1f ms",
+            method,
+            path,
+            stats.count,
+            stats.total_time * 1000,
+        )
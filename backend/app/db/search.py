@@ -0,0 +1,167 @@
+"""Accent-insensitive fuzzy search for name/email search boxes
+
+On PostgreSQL, search runs on pg_trgm. The ``add_patient_search_indexes``
+migration creates GIN trigram indexes over ``f_unaccent(lower(full_name))``
+and ``lower(email)``. Substring matches (``LIKE '%q%'``) and typo-tolerant
+matches (``q <% name``) are then index scans rather than sequential scans.
+Results are ranked by ``word_similarity``.
+
+SQLite dev databases get Python stand-ins for ``f_unaccent`` and
+``word_similarity``, registered on connect by ``install()``. They return the
+same matches and ranking, just without an index.
+"""
+
+import unicodedata
+
+from sqlalchemy import Float, Index, String, bindparam, event, func, literal, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+from sqlalchemy.types import Boolean
+
+# pg_trgm's default pg_trgm.word_similarity_threshold, used by the ``<%`` operator
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+# unaccent() is only STABLE (its dictionary can change), so expression indexes
+# need an IMMUTABLE wrapper with the dictionary pinned.
+POSTGRES_SEARCH_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+    "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$",
+)
+
+
+def normalize_search_text(value: str) -> str:
+    """Lowercase and strip diacritics, so "Álvarez Núñez" matches "alvarez nunez" """
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _trigrams(text: str) -> list[str]:
+    """Trigrams in pg_trgm order: per alphanumeric word, padded with two leading and one trailing space"""
+    words = "".join(c if c.isalnum() else " " for c in text.lower()).split()
+    grams = []
+    for word in words:
+        padded = f"  {word} "
+        grams.extend(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def word_similarity(needle: str | None, haystack: str | None) -> float:
+    """Python port of pg_trgm's word_similarity()
+
+    Best score over any contiguous run of ``haystack`` trigrams:
+    shared / (|needle| + |run| - shared).
+    """
+    if not needle or not haystack:
+        return 0.0
+    wanted = set(_trigrams(needle))
+    grams = _trigrams(haystack)
+    if not wanted or not grams:
+        return 0.0
+
+    best = 0.0
+    for start in range(len(grams)):
+        if grams[start] not in wanted:
+            continue
+        run: set[str] = set()
+        for gram in grams[start:]:
+            run.add(gram)
+            shared = len(run & wanted)
+            best = max(best, shared / (len(wanted) + len(run) - shared))
+    return best
+
+
+def _sqlite_unaccent(value: str | None) -> str | None:
+    # SQLite's lower() only folds ASCII, so the stand-in also lowercases
+    return normalize_search_text(value) if value is not None else None
+
+
+def _register_sqlite_functions(dbapi_connection, connection_record) -> None:
+    dbapi_connection.create_function("f_unaccent", 1, _sqlite_unaccent, deterministic=True)
+    dbapi_connection.create_function("word_similarity", 2, word_similarity, deterministic=True)
+
+
+def install(engine: Engine) -> None:
+    """Register the SQLite fallbacks on ``engine``; a no-op on other databases"""
+    if engine.dialect.name != "sqlite":
+        return
+    if not event.contains(engine, "connect", _register_sqlite_functions):
+        event.listen(engine, "connect", _register_sqlite_functions)
+
+
+class word_similar(ColumnElement):
+    """``needle <% haystack`` on PostgreSQL (trigram-indexable), a function call elsewhere"""
+
+    type = Boolean()
+    inherit_cache = True
+    _traverse_internals = [
+        ("needle", InternalTraversal.dp_clauseelement),
+        ("haystack", InternalTraversal.dp_clauseelement),
+    ]
+
+    def __init__(self, needle, haystack):
+        self.needle = needle
+        self.haystack = haystack
+
+
+@compiles(word_similar)
+def _compile_word_similar(element, compiler, **kw):
+    return "word_similarity(%s, %s) >= %s" % (
+        compiler.process(element.needle, **kw),
+        compiler.process(element.haystack, **kw),
+        WORD_SIMILARITY_THRESHOLD,
+    )
+
+
+@compiles(word_similar, "postgresql")
+def _compile_word_similar_pg(element, compiler, **kw):
+    # A custom op, so the compiler escapes "%" for pyformat drivers
+    return compiler.process(element.needle.op("<%", is_comparison=True)(element.haystack), **kw)
+
+
+def search_key(column):
+    """The expression trigram indexes are built on; queries must use it verbatim"""
+    return func.f_unaccent(func.lower(column), type_=String)
+
+
+def trigram_index(name: str, expression) -> Index:
+    """GIN trigram index over ``expression``; PostgreSQL only"""
+    return Index(
+        name,
+        expression.label("key"),
+        postgresql_using="gin",
+        postgresql_ops={"key": "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
+
+
+def _like_escape(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def fuzzy_search(q: str, name_column, email_column):
+    """(where clause, rank) for a search box query over a name and an email column
+
+    Matches name substrings (ignoring accents and case), name typos close
+    enough for word_similarity, and email substrings.
+    """
+    term = normalize_search_text(q.strip())
+    needle = bindparam("search_term", term, type_=String)
+    contains = f"%{_like_escape(term)}%"
+    name_key = search_key(name_column)
+    email_key = func.lower(email_column)
+
+    where = or_(
+        name_key.like(contains, escape="\\"),
+        email_key.like(contains, escape="\\"),
+        word_similar(needle, name_key),
+    )
+    rank = func.word_similarity(
+        needle,
+        func.coalesce(name_key, literal("")) + literal(" ") + email_key,
+        type_=Float,
+    )
+    return where, rank
@@ -0,0 +1,247 @@
+"""Demo data: ``python -m app.cli seed-demo``
+
+Creates the default doctor, random patients with 1-3 clinical records each
+and a few clinical templates. Idempotent: only the missing patients are
+created, and templates only when there are none.
+"""
+
+import logging
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.security import get_password_hash
+from app.db.blind_index import blind_index
+from app.models.history import ClinicalRecord
+from app.models.template import ClinicalTemplate
+from app.models.user import Patient, User
+
+logger = logging.getLogger(__name__)
+
+# Patients per INSERT round trip and per commit
+SEED_BATCH_SIZE = 500
+
+FIRST_NAMES = [
+    "María",
+    "Lucía",
+    "Paula",
+    "Carmen",
+    "Sara",
+    "Laura",
+    "Elena",
+    "Claudia",
+    "Ana",
+    "Marta",
+    "Juan",
+    "Luis",
+    "Pedro",
+    "Carlos",
+    "Javier",
+    "Daniel",
+    "Sergio",
+    "Manuel",
+    "Alberto",
+    "Diego",
+]
+LAST_NAMES = [
+    "García",
+    "Fernández",
+    "González",
+    "Rodríguez",
+    "López",
+    "Martínez",
+    "Sánchez",
+    "Pérez",
+    "Gómez",
+    "Ruiz",
+    "Hernández",
+    "Jiménez",
+    "Díaz",
+    "Moreno",
+    "Álvarez",
+    "Muñoz",
+]
+COMPLAINTS = [
+    "Fiebre y malestar general",
+    "Dolor de garganta",
+    "Tos persistente",
+    "Dolor lumbar",
+    "Cefalea",
+    "Dolor abdominal",
+    "Insomnio",
+    "Ansiedad",
+    "Revisión de HTA",
+    "Control de diabetes",
+]
+BACKGROUNDS = [
+    "No antecedentes de interés",
+    "HTA",
+    "Diabetes tipo 2",
+    "Asma",
+    "Dislipemia",
+    "Hipotiroidismo",
+    "Migraña",
+    "Ansiedad",
+]
+PLANS = [
+    "Reposo e hidratación. Paracetamol si precisa.",
+    "Solicitar analítica básica y control en 7 días.",
+    "Derivar a especialista si no mejora en 2 semanas.",
+    "Ajuste de tratamiento y control de constantes.",
+    "Educación sanitaria y seguimiento.",
+]
+ALLERGIES = [
+    "Sin alergias conocidas",
+    "Alergia a penicilina",
+    "Alergia a AINEs",
+    "Alergia estacional (polen)",
+]
+MEDICATIONS = [
+    "Ninguna",
+    "Enalapril 10mg",
+    "Metformina 850mg",
+    "Salbutamol inhalador",
+    "Atorvastatina 20mg",
+    "Levotiroxina 50mcg",
+]
+TEMPLATES = [
+    {
+        "name": "Hipertensión arterial",
+        "description": "Control y seguimiento de HTA",
+        "chief_complaint": "Hipertensión arterial",
+        "background": "Paciente con diagnóstico de HTA en tratamiento. No adherencia al tratamiento.",
+        "assessment": "HTA no controlada. Riesgo cardiovascular elevado.",
+        "plan": "Reforzar adherencia a medicación. Cambio de estilo de vida. Control de TA en 4 semanas.",
+        "allergies": "Ninguna conocida",
+        "medications": "Losartán 50 mg/día, AAS 100 mg/día",
+    },
+    {
+        "name": "Diabetes mellitus tipo 2",
+        "description": "Seguimiento de DM2",
+        "chief_complaint": "Diabetes mellitus tipo 2",
+        "background": "Paciente diabético con mal control glucémico. Sedentarismo.",
+        "assessment": "DM2 descompensada. Riesgo de complicaciones crónicas.",
+        "plan": "Ajuste de metformina. Dieta low-carb. Ejercicio 30 min/día. "
+        "Hemoglobina glicosilada en 3 meses.",
+        "allergies": "Ninguna conocida",
+        "medications": "Metformina 850 mg BID, Sitagliptina 100 mg/día",
+    },
+    {
+        "name": "Infección respiratoria aguda",
+        "description": "Cuadro gripal/resfriado común",
+        "chief_complaint": "Tos, fiebre y malestar general",
+        "background": "Cuadro de 3 días de evolución. Contacto con casos similares.",
+        "assessment": "Infección viral de vías aéreas superiores. Sin neumonía.",
+        "plan": "Tratamiento sintomático. Reposo. Hidratación. Reevaluar si persiste fiebre >5 días.",
+        "allergies": "Penicilina",
+        "medications": "Paracetamol 500 mg c/6h si dolor/fiebre",
+    },
+    {
+        "name": "Ansiedad/estrés",
+        "description": "Trastorno de ansiedad generalizada",
+        "chief_complaint": "Ansiedad y dificultad para dormir",
+        "background": "Paciente refiere estrés laboral. Irritabilidad. Palpitaciones.",
+        "assessment": "Trastorno de ansiedad generalizada. Sin depresión mayor.",
+        "plan": "Técnicas de relajación. Ejercicio regular. Considerar psicoterapia. "
+        "Reevaluar en 4 semanas.",
+        "allergies": "Ninguna conocida",
+        "medications": "Sin medicación actual. Valorar SSRIs si no mejora.",
+    },
+    {
+        "name": "Dolor lumbar crónico",
+        "description": "Lumbalgia mecánica crónica",
+        "chief_complaint": "Dolor lumbar crónico",
+        "background": "Dolor >6 meses. Empeora con sedestación prolongada. No irradiación a piernas.",
+        "assessment": "Lumbalgia mecánica crónica. Sin signos de alarma neurológicos.",
+        "plan": "Fisioterapia. Ejercicios de core. Evitar sedestación prolongada. NSAIDs puntuales.",
+        "allergies": "Ibuprofeno",
+        "medications": "Paracetamol 1 g c/8h si dolor, Metocarbamol 400 mg c/8h si contractura",
+    },
+]
+
+
+@dataclass
+class SeedResult:
+    doctor_id: int
+    patients_created: int
+    templates_created: int
+
+
+def _ensure_doctor(db: Session, force_password: bool) -> User:
+    email = os.getenv("DEFAULT_DOCTOR_EMAIL", "beatrizjc87@gmail.com")
+    password = os.getenv("DEFAULT_DOCTOR_PASSWORD", "ChangeMe123!")
+    doctor = db.scalar(select(User).where(User.email_bidx == blind_index(email)))
+    if not doctor:
+        doctor = User(
+            email=email,
+            hashed_password=get_password_hash(password),
+            is_active=True,
+            is_superuser=False,
+            is_medical_professional=True,
+            role="specialist",
+            full_name=os.getenv("DEFAULT_DOCTOR_FULL_NAME", "Beatriz Jiménez Canet"),
+            specialty=os.getenv("DEFAULT_DOCTOR_SPECIALTY", "Medicina de familia"),
+            is_first_login=False,
+        )
+        db.add(doctor)
+        db.commit()
+        logger.info("Created default doctor %s", email)
+    elif force_password:
+        doctor.hashed_password = get_password_hash(password)
+        doctor.is_active = True
+        doctor.is_medical_professional = True
+        doctor.role = doctor.role or "specialist"
+        doctor.is_first_login = False
+        db.commit()
+        logger.info("Updated password for default doctor %s", email)
+    return doctor
+
+
+def _demo_patient(index: int) -> Patient:
+    first_name = random.choice(FIRST_NAMES)
+    last_name = random.choice(LAST_NAMES)
+    return Patient(
+        full_name=f"{first_name} {last_name}",
+        email=f"{first_name.lower()}.{last_name.lower()}{index}@demo.com",
+        phone=f"6{random.randint(10000000, 99999999)}",
+        clinical_records=[
+            ClinicalRecord(
+                chief_complaint=random.choice(COMPLAINTS),
+                background=random.choice(BACKGROUNDS),
+                assessment="Evolución favorable. Sin signos de alarma.",
+                plan=random.choice(PLANS),
+                allergies=random.choice(ALLERGIES),
+                medications=random.choice(MEDICATIONS),
+            )
+            for _ in range(random.randint(1, 3))
+        ],
+    )
+
+
+def seed_demo(db: Session, target_patients: int, force_doctor_password: bool = False) -> SeedResult:
+    doctor_id = _ensure_doctor(db, force_doctor_password).id
+
+    existing = db.scalar(select(func.count()).select_from(Patient))
+    created = 0
+    # Batched: one multi-row INSERT per table and one commit per batch,
+    # instead of a flush and a commit per patient
+    for start in range(existing, target_patients, SEED_BATCH_SIZE):
+        stop = min(start + SEED_BATCH_SIZE, target_patients)
+        db.add_all(_demo_patient(i) for i in range(start, stop))
+        db.commit()
+        db.expunge_all()
+        created += stop - start
+        logger.info("Demo patients: %d/%d", stop, target_patients)
+
+    templates = 0
+    if not db.scalar(select(func.count()).select_from(ClinicalTemplate)):
+        now = datetime.utcnow()
+        db.add_all(ClinicalTemplate(**t, created_at=now, created_by_id=doctor_id) for t in TEMPLATES)
+        db.commit()
+        templates = len(TEMPLATES)
+
+    return SeedResult(doctor_id=doctor_id, patients_created=created, templates_created=templates)
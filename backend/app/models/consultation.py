@@ -5,12 +5,13 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
     Text,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 
 from app.db.session import Base
 
@@ -36,7 +37,7 @@ class Consultation(Base):
     __tablename__ = "consultations"
 
     id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
+    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False, index=True)
     doctor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     # Consultation details
@@ -49,6 +50,8 @@ class Consultation(Base):
     scheduled_at = Column(DateTime, nullable=False)
     duration_minutes = Column(Integer, default=30)
     status = Column(String, default=ConsultationStatus.PENDING)
+    # Reminder windows (app.services.reminders) already handled, longest first
+    reminders_sent = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Video consultation
     jitsi_room_name = Column(String, nullable=True)
@@ -65,12 +68,29 @@ class Consultation(Base):
     doctor = relationship("User", back_populates="consultations")
     payment = relationship("Payment", back_populates="consultation", uselist=False)
 
+    @validates("scheduled_at")
+    def _reset_reminders(self, key, value):
+        # A rescheduled consultation gets its reminders again; echoing the
+        # same time back (full-object updates) is not a reschedule
+        if value != self.scheduled_at:
+            self.reminders_sent = 0
+        return value
+
+    # (sort key, id) indexes back the keyset pagination in app.db.pagination
+    __table_args__ = (
+        Index("ix_consultations_doctor_scheduled", "doctor_id", "scheduled_at", "id"),
+        Index("ix_consultations_scheduled_at", "scheduled_at", "id"),
+        Index("ix_consultations_status_scheduled", "status", "scheduled_at"),
+        # Reminder scan: stages not sent yet, then the upcoming window
+        Index("ix_consultations_reminders_due", "reminders_sent", "scheduled_at"),
+    )
+
 
 class Payment(Base):
     __tablename__ = "payments"
 
     id = Column(Integer, primary_key=True, index=True)
-    consultation_id = Column(Integer, ForeignKey("consultations.id"), nullable=False)
+    consultation_id = Column(Integer, ForeignKey("consultations.id"), nullable=False, index=True)
 
     # Payment details
     amount = Column(Numeric(10, 2), nullable=False)
@@ -87,7 +107,7 @@ class Payment(Base):
     stripe_refund_id = Column(String, nullable=True)
 
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
 
@@ -1,8 +1,9 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
 from sqlalchemy.orm import relationship
 
+from app.db.encrypted import EncryptedText, encrypted_synonym
 from app.db.session import Base
 
 
@@ -10,15 +11,29 @@ class ClinicalRecord(Base):
     __tablename__ = "clinical_records"
 
     id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False, index=True)
-
-    chief_complaint = Column(Text, nullable=True)
-    background = Column(Text, nullable=True)
-    assessment = Column(Text, nullable=True)
-    plan = Column(Text, nullable=True)
-    allergies = Column(Text, nullable=True)
-    medications = Column(Text, nullable=True)
+    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
+
+    # Clinical notes are encrypted at rest, see app.db.encrypted
+    _chief_complaint = Column("chief_complaint", EncryptedText, nullable=True)
+    _background = Column("background", EncryptedText, nullable=True)
+    _assessment = Column("assessment", EncryptedText, nullable=True)
+    _plan = Column("plan", EncryptedText, nullable=True)
+    _allergies = Column("allergies", EncryptedText, nullable=True)
+    _medications = Column("medications", EncryptedText, nullable=True)
+    chief_complaint = encrypted_synonym("_chief_complaint")
+    background = encrypted_synonym("_background")
+    assessment = encrypted_synonym("_assessment")
+    plan = encrypted_synonym("_plan")
+    allergies = encrypted_synonym("_allergies")
+    medications = encrypted_synonym("_medications")
 
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Part of the PDF cache key (app.services.pdf_cache); NULL until first edited on old rows
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     patient = relationship("Patient", back_populates="clinical_records")
+
+    # A patient's history, newest first; also covers lookups by patient_id alone
+    __table_args__ = (
+        Index("ix_clinical_records_patient_created", patient_id, created_at.desc(), id.desc()),
+    )
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String
+
+from app.db.session import Base
+
+
+class KeyRotationCheckpoint(Base):
+    """Progress of the re-encryption job (app.db.key_rotation) for one table and target key"""
+
+    __tablename__ = "key_rotation_checkpoints"
+
+    table_name = Column(String, primary_key=True)
+    # key_fingerprint() of the key the table is being moved to
+    key_fingerprint = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    rows_scanned = Column(BigInteger, nullable=False, default=0)
+    rows_rewritten = Column(BigInteger, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,38 @@
+from datetime import datetime
+from enum import Enum
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from app.db.encrypted import EncryptedText, encrypted_synonym
+from app.db.session import Base
+
+
+class OutboxStatus(str, Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"
+
+
+class EmailOutbox(Base):
+    """An email committed with the change that triggered it, sent by app.services.outbox"""
+
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    # EmailService method suffix: consultation_confirmation, password_reset, ...
+    kind = Column(String, nullable=False)
+    to_email = Column(String, nullable=False)
+    # JSON keyword arguments of the send method; may hold reset tokens and
+    # temporary passwords, so it is encrypted and cleared once sent
+    _payload = Column("payload", EncryptedText, nullable=True)
+    payload = encrypted_synonym("_payload")
+    status = Column(String, nullable=False, default=OutboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Due time while pending; a claimed row is leased until it, so a worker
+    # that dies mid-send leaves the row to be picked up again
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),)
@@ -0,0 +1,52 @@
+from datetime import datetime
+from enum import Enum
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
+
+from app.db.encrypted import EncryptedText, encrypted_synonym
+from app.db.session import Base
+
+
+class ExportStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    # Done, but the file is gone after PDF_EXPORT_TTL_SECONDS
+    EXPIRED = "expired"
+
+
+class PdfExportJob(Base):
+    """A PDF export rendered in the background by app.services.pdf_exports"""
+
+    __tablename__ = "pdf_export_jobs"
+
+    id = Column(Integer, primary_key=True)
+    # pdf_clinica export: history or complaint
+    kind = Column(String, nullable=False)
+    patient_id = Column(Integer, ForeignKey("patients.id", ondelete="CASCADE"), nullable=False)
+    # The complaint searched for is clinical data too
+    _complaint = Column("complaint", EncryptedText, nullable=True)
+    complaint = encrypted_synonym("_complaint")
+    requested_by_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String, nullable=False, default=ExportStatus.QUEUED)
+    # Percent done, for polling clients
+    progress = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Due time while queued; a running job is leased until it, so a worker
+    # that dies mid-render leaves the job to be picked up again
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    error = Column(Text, nullable=True)
+    # Download name; holds the patient's name
+    _filename = Column("filename", EncryptedText, nullable=True)
+    filename = encrypted_synonym("_filename")
+    size_bytes = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    # When a finished job's file is deleted
+    expires_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_pdf_export_jobs_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_pdf_export_jobs_status_expires", "status", "expires_at"),
+    )
@@ -1,8 +1,11 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
-from sqlalchemy.orm import relationship
+from sqlalchemy import DDL, Boolean, Column, DateTime, Index, Integer, String, event, func
+from sqlalchemy.orm import relationship, validates
 
+from app.db.blind_index import blind_index, blind_index_default
+from app.db.encrypted import EncryptedText, encrypted_synonym
+from app.db.search import POSTGRES_SEARCH_DDL, search_key, trigram_index
 from app.db.session import Base
 
 
@@ -11,6 +14,8 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
+    # Exact-match lookups (login, password reset) go through the blind index
+    email_bidx = Column(String(32), index=True, default=blind_index_default("email"))
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
@@ -30,6 +35,21 @@ class User(Base):
 
     consultations = relationship("Consultation", back_populates="doctor")
 
+    @validates("email")
+    def _index_email(self, key, value):
+        self.email_bidx = blind_index(value)
+        return value
+
+    # Only users with a pending reset carry a token
+    __table_args__ = (
+        Index(
+            "ix_users_password_reset_token",
+            password_reset_token,
+            postgresql_where=password_reset_token.isnot(None),
+            sqlite_where=password_reset_token.isnot(None),
+        ),
+    )
+
 
 class Patient(Base):
     __tablename__ = "patients"
@@ -37,8 +57,28 @@ class Patient(Base):
     id = Column(Integer, primary_key=True, index=True)
     full_name = Column(String, index=True)
     email = Column(String, unique=True, index=True)
-    phone = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    email_bidx = Column(String(32), index=True, default=blind_index_default("email"))
+    # Encrypted at rest; name and email stay plaintext for search
+    _phone = Column("phone", EncryptedText)
+    phone = encrypted_synonym("_phone")
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     consultations = relationship("Consultation", back_populates="patient")
     clinical_records = relationship("ClinicalRecord", back_populates="patient")
+
+    @validates("email")
+    def _index_email(self, key, value):
+        self.email_bidx = blind_index(value)
+        return value
+
+    # Admin listing (newest first) and the search box, see app.db.search
+    __table_args__ = (
+        Index("ix_patients_created_at", "created_at", "id"),
+        trigram_index("ix_patients_full_name_trgm", search_key(full_name)),
+        trigram_index("ix_patients_email_trgm", func.lower(email)),
+    )
+
+
+for _statement in POSTGRES_SEARCH_DDL:
+    event.listen(Patient.__table__, "before_create", DDL(_statement).execute_if(dialect="postgresql"))
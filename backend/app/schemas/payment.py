@@ -42,6 +42,17 @@ class PaymentWithPatient(Payment):
     consultation: Optional['ConsultationWithPatient'] = None
 
 
+class PaymentSummary(BaseModel):
+    """Totals over all of a doctor's payments (the list endpoint returns one page)"""
+
+    total_count: int
+    total_amount: Decimal
+    completed_count: int
+    completed_amount: Decimal
+    pending_count: int
+    failed_count: int
+
+
 class ConsultationWithPatient(BaseModel):
     id: int
     patient: Optional['PatientBasic'] = None
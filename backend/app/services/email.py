@@ -1,100 +1,159 @@
 import os
+import textwrap
+from email.message import EmailMessage
+from email.utils import formataddr, formatdate, make_msgid
 
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from app.services.sendgrid_transport import SendGridTransport, TemplateEmail, get_transport
+from app.services.smtp_transport import SmtpTransport, get_smtp_transport
+
+# Subjects of the plain-text emails (SMTP and console); SendGrid templates carry their own
+SUBJECTS = {
+    "consultation_confirmation": "Tu videoconsulta está confirmada",
+    "consultation_reminder": "Recordatorio: tienes una videoconsulta próximamente",
+    "doctor_notification": "Nueva videoconsulta reservada",
+    "temporary_password": "Tu cuenta en Tu Clínica Médica",
+    "password_reset": "Restablece tu contraseña",
+    "welcome": "Bienvenido a Tu Clínica Médica",
+}
+
+
+def _reset_url(reset_token: str) -> str:
+    return f"https://tuclinica.com/reset-password?token={reset_token}"
 
 
 class EmailService:
-    def __init__(self):
-        self.api_key = os.getenv("SENDGRID_API_KEY")
+    """SendGrid dynamic templates. ``<kind>_message()`` builds an email,
+    ``send_<kind>()`` sends one, ``send_many()`` sends a batch (one API call
+    per template, see app.services.sendgrid_transport)"""
+
+    def __init__(self, transport: SendGridTransport | None = None):
         self.from_email = os.getenv("SENDGRID_FROM_EMAIL", "noreply@tuclinica.com")
         self.from_name = os.getenv("FROM_NAME", "Tu Clínica Médica")
+        self.transport = transport or get_transport()
+
+    def send_many(self, emails: list[TemplateEmail]) -> list[dict]:
+        return self.transport.send_many((self.from_email, self.from_name), emails)
+
+    def send(self, email: TemplateEmail) -> dict:
+        return self.send_many([email])[0]
+
+    def message(self, kind: str, to_email: str, **data) -> TemplateEmail:
+        """The email of an outbox kind (app.services.outbox.KINDS)"""
+        return getattr(self, f"{kind}_message")(to_email, **data)
+
+    def consultation_confirmation_message(self, to_email: str, full_name: str, consultation):
+        return TemplateEmail(
+            to_email,
+            "d-consultation-confirmation-template",
+            {
+                "full_name": full_name,
+                "scheduled_at": getattr(consultation, "scheduled_at", None),
+                "specialty": getattr(consultation, "specialty", ""),
+                "jitsi_room_url": getattr(consultation, "jitsi_room_url", ""),
+                "support_email": "soporte@tuclinica.com",
+            },
+            "consultation_confirmation",
+        )
 
-    def send_consultation_confirmation(self, to_email: str, full_name: str, consultation):
-        message = Mail(from_email=(self.from_email, self.from_name), to_emails=to_email)
-        message.template_id = "d-consultation-confirmation-template"
-        message.dynamic_template_data = {
-            "full_name": full_name,
-            "scheduled_at": getattr(consultation, "scheduled_at", None),
-            "specialty": getattr(consultation, "specialty", ""),
-            "jitsi_room_url": getattr(consultation, "jitsi_room_url", ""),
-            "support_email": "soporte@tuclinica.com",
-        }
-
-        try:
-            sg = SendGridAPIClient(self.api_key)
-            response = sg.send(message)
-            return {"success": True, "status_code": response.status_code}
-        except Exception as e:
-            return {"success": False, "error": str(e)}
-
-    def send_temporary_password_email(
-        self, to_email: str, full_name: str, temporary_password: str
-    ):
-        """Send temporary password email to new medical professional"""
-        message = Mail(from_email=(self.from_email, self.from_name), to_emails=to_email)
+    def consultation_reminder_message(self, to_email: str, full_name: str, consultation):
+        """Remind the patient of an upcoming consultation (app.services.reminders)"""
+        return TemplateEmail(
+            to_email,
+            "d-consultation-reminder-template",  # TODO: Create template in SendGrid
+            {
+                "full_name": full_name,
+                "scheduled_at": getattr(consultation, "scheduled_at", None),
+                "specialty": getattr(consultation, "specialty", ""),
+                "jitsi_room_url": getattr(consultation, "jitsi_room_url", ""),
+                "support_email": "soporte@tuclinica.com",
+            },
+            "consultation_reminder",
+        )
 
-        message.template_id = (
-            "d-temp-password-template"  # TODO: Create template in SendGrid
+    def doctor_notification_message(self, to_email: str, full_name: str, consultation):
+        """Tell the doctor a consultation was booked with them"""
+        return TemplateEmail(
+            to_email,
+            "d-doctor-notification-template",  # TODO: Create template in SendGrid
+            {
+                "full_name": full_name,
+                "scheduled_at": getattr(consultation, "scheduled_at", None),
+                "specialty": getattr(consultation, "specialty", ""),
+                "jitsi_room_url": getattr(consultation, "jitsi_room_url", ""),
+            },
+            "doctor_notification",
         )
 
-        message.dynamic_template_data = {
-            "full_name": full_name,
-            "temporary_password": temporary_password,
-            "login_url": "https://tuclinica.com/login",
-            "support_email": "soporte@tuclinica.com",
-        }
-
-        try:
-            sg = SendGridAPIClient(self.api_key)
-            response = sg.send(message)
-            return {"success": True, "status_code": response.status_code}
-        except Exception as e:
-            return {"success": False, "error": str(e)}
-
-    def send_password_reset_email(
-        self, to_email: str, full_name: str, reset_token: str
-    ):
-        """Send password reset email"""
-        message = Mail(from_email=(self.from_email, self.from_name), to_emails=to_email)
+    def temporary_password_message(self, to_email: str, full_name: str, temporary_password: str):
+        """Temporary password email to a new medical professional"""
+        return TemplateEmail(
+            to_email,
+            "d-temp-password-template",  # TODO: Create template in SendGrid
+            {
+                "full_name": full_name,
+                "temporary_password": temporary_password,
+                "login_url": "https://tuclinica.com/login",
+                "support_email": "soporte@tuclinica.com",
+            },
+            "temporary_password",
+        )
 
-        message.template_id = (
-            "d-password-reset-template"  # TODO: Create template in SendGrid
+    def password_reset_message(self, to_email: str, full_name: str, reset_token: str):
+        reset_url = _reset_url(reset_token)
+        return TemplateEmail(
+            to_email,
+            "d-password-reset-template",  # TODO: Create template in SendGrid
+            {
+                "full_name": full_name,
+                "reset_url": reset_url,
+                "support_email": "soporte@tuclinica.com",
+            },
+            "password_reset",
         )
 
-        reset_url = f"https://tuclinica.com/reset-password?token={reset_token}"
+    def welcome_message(self, to_email: str, full_name: str):
+        """Welcome email after successful registration"""
+        return TemplateEmail(
+            to_email,
+            "d-welcome-template",  # TODO: Create template in SendGrid
+            {
+                "full_name": full_name,
+                "dashboard_url": "https://tuclinica.com/dashboard",
+                "support_email": "soporte@tuclinica.com",
+            },
+            "welcome",
+        )
 
-        message.dynamic_template_data = {
-            "full_name": full_name,
-            "reset_url": reset_url,
-            "support_email": "soporte@tuclinica.com",
-        }
+    def send_consultation_confirmation(self, to_email: str, full_name: str, consultation):
+        return self.send(
+            self.message("consultation_confirmation", to_email, full_name=full_name, consultation=consultation)
+        )
 
-        try:
-            sg = SendGridAPIClient(self.api_key)
-            response = sg.send(message)
-            return {"success": True, "status_code": response.status_code}
-        except Exception as e:
-            return {"success": False, "error": str(e)}
+    def send_consultation_reminder(self, to_email: str, full_name: str, consultation):
+        return self.send(
+            self.message("consultation_reminder", to_email, full_name=full_name, consultation=consultation)
+        )
 
-    def send_welcome_email(self, to_email: str, full_name: str):
-        """Send welcome email after successful registration"""
-        message = Mail(from_email=(self.from_email, self.from_name), to_emails=to_email)
+    def send_doctor_notification(self, to_email: str, full_name: str, consultation):
+        return self.send(
+            self.message("doctor_notification", to_email, full_name=full_name, consultation=consultation)
+        )
 
-        message.template_id = "d-welcome-template"  # TODO: Create template in SendGrid
+    def send_temporary_password_email(self, to_email: str, full_name: str, temporary_password: str):
+        """Send temporary password email to new medical professional"""
+        return self.send(
+            self.message("temporary_password", to_email, full_name=full_name, temporary_password=temporary_password)
+        )
 
-        message.dynamic_template_data = {
-            "full_name": full_name,
-            "dashboard_url": "https://tuclinica.com/dashboard",
-            "support_email": "soporte@tuclinica.com",
-        }
+    def send_password_reset_email(self, to_email: str, full_name: str, reset_token: str):
+        """Send password reset email"""
+        return self.send(
+            self.message("password_reset", to_email, full_name=full_name, reset_token=reset_token)
+        )
 
-        try:
-            sg = SendGridAPIClient(self.api_key)
-            response = sg.send(message)
-            return {"success": True, "status_code": response.status_code}
-        except Exception as e:
-            return {"success": False, "error": str(e)}
+    def send_welcome_email(self, to_email: str, full_name: str):
+        """Send welcome email after successful registration"""
+        return self.send(self.message("welcome", to_email, full_name=full_name))
 
 
 # Email templates for development (when SendGrid is not configured)
@@ -107,6 +166,38 @@ class DevEmailService:
         print(body)
         print("--- END DEV EMAIL ---\n")
 
+    @staticmethod
+    def send_consultation_reminder(to_email: str, full_name: str, consultation):
+        body = DevEmailService.get_consultation_reminder_template(full_name, consultation)
+        DevEmailService._print("consultation reminder", to_email, body)
+
+    @staticmethod
+    def send_doctor_notification(to_email: str, full_name: str, consultation):
+        body = DevEmailService.get_doctor_notification_template(full_name, consultation)
+        DevEmailService._print("doctor notification", to_email, body)
+
+    @staticmethod
+    def send_temporary_password_email(to_email: str, full_name: str, temporary_password: str):
+        body = DevEmailService.get_temporary_password_template(full_name, temporary_password)
+        DevEmailService._print("temporary password", to_email, body)
+
+    @staticmethod
+    def send_password_reset_email(to_email: str, full_name: str, reset_token: str):
+        body = DevEmailService.get_password_reset_template(full_name, _reset_url(reset_token))
+        DevEmailService._print("password reset", to_email, body)
+
+    @staticmethod
+    def send_welcome_email(to_email: str, full_name: str):
+        body = DevEmailService.get_welcome_template(full_name)
+        DevEmailService._print("welcome", to_email, body)
+
+    @staticmethod
+    def _print(kind: str, to_email: str, body: str):
+        print(f"\n--- DEV EMAIL ({kind}) ---")
+        print(f"To: {to_email}")
+        print(body)
+        print("--- END DEV EMAIL ---\n")
+
     @staticmethod
     def get_temporary_password_template(full_name: str, temporary_password: str) -> str:
         return f"""
@@ -149,6 +240,65 @@ class DevEmailService:
         El equipo de Tu Clínica Médica
         """
 
+    @staticmethod
+    def get_consultation_reminder_template(full_name: str, consultation) -> str:
+        scheduled_at = getattr(consultation, "scheduled_at", None)
+        specialty = getattr(consultation, "specialty", "")
+        room_url = getattr(consultation, "jitsi_room_url", "")
+
+        return f"""
+        Hola {full_name},
+
+        Te recordamos que tienes una videoconsulta próximamente.
+
+        Especialidad: {specialty}
+        Fecha/Hora: {scheduled_at}
+
+        Enlace de la sala (Jitsi):
+        {room_url}
+
+        Si no puedes asistir, avísanos en soporte@tuclinica.com para liberar la cita.
+
+        Saludos,
+        El equipo de Tu Clínica Médica
+        """
+
+    @staticmethod
+    def get_doctor_notification_template(full_name: str, consultation) -> str:
+        scheduled_at = getattr(consultation, "scheduled_at", None)
+        specialty = getattr(consultation, "specialty", "")
+        room_url = getattr(consultation, "jitsi_room_url", "")
+
+        return f"""
+        Hola {full_name},
+
+        Se ha reservado una nueva videoconsulta contigo.
+
+        Especialidad: {specialty}
+        Fecha/Hora: {scheduled_at}
+
+        Enlace de la sala (Jitsi):
+        {room_url}
+
+        Saludos,
+        El equipo de Tu Clínica Médica
+        """
+
+    @staticmethod
+    def get_welcome_template(full_name: str) -> str:
+        return f"""
+        Hola {full_name},
+
+        Bienvenido a Tu Clínica Médica. Tu cuenta ha sido creada exitosamente.
+
+        Accede a tu panel en: https://tuclinica.com/dashboard
+
+        Si tienes alguna pregunta, contacta a soporte@tuclinica.com
+
+        Saludos,
+        El equipo de Tu Clínica Médica
+        """
+
     @staticmethod
     def get_password_reset_template(full_name: str, reset_url: str) -> str:
         return f"""
@@ -170,9 +320,50 @@ class DevEmailService:
         """
 
 
+def render_email(kind: str, **data) -> tuple[str, str]:
+    """Subject and plain-text body of an outbox kind (app.services.outbox.KINDS)"""
+    if kind == "password_reset":
+        data = {"full_name": data["full_name"], "reset_url": _reset_url(data["reset_token"])}
+    body = getattr(DevEmailService, f"get_{kind}_template")(**data)
+    return SUBJECTS[kind], textwrap.dedent(body).strip() + "\n"
+
+
+class SmtpEmailService(EmailService):
+    """Plain-text emails through our own SMTP server (EMAIL_BACKEND=smtp),
+    on pooled, pipelined sessions (see app.services.smtp_transport)"""
+
+    def __init__(self, transport: SmtpTransport | None = None):
+        self.from_email = os.getenv("SMTP_FROM_EMAIL") or os.getenv("SENDGRID_FROM_EMAIL", "noreply@tuclinica.com")
+        self.from_name = os.getenv("FROM_NAME", "Tu Clínica Médica")
+        self.transport = transport or get_smtp_transport()
+
+    def send_many(self, emails: list[EmailMessage]) -> list[dict]:
+        return self.transport.send_many(self.from_email, emails)
+
+    def message(self, kind: str, to_email: str, **data) -> EmailMessage:
+        subject, body = render_email(kind, **data)
+        message = EmailMessage()
+        message["From"] = formataddr((self.from_name, self.from_email))
+        message["To"] = to_email
+        message["Subject"] = subject
+        message["Date"] = formatdate(localtime=True)
+        message["Message-ID"] = make_msgid(domain=self.from_email.rpartition("@")[2])
+        # 7-bit clean, so no server has to support 8BITMIME
+        message.set_content(body, cte="quoted-printable")
+        return message
+
+
 def get_email_service():
-    """Get appropriate email service based on configuration"""
-    if os.getenv("SENDGRID_API_KEY"):
+    """Get appropriate email service based on configuration
+
+    EMAIL_BACKEND picks one (sendgrid, smtp or console); by default SendGrid
+    if SENDGRID_API_KEY is set, else SMTP if SMTP_HOST is, else the console.
+    """
+    backend = os.getenv("EMAIL_BACKEND")
+    if backend is None:
+        backend = "sendgrid" if os.getenv("SENDGRID_API_KEY") else "smtp" if os.getenv("SMTP_HOST") else "console"
+    if backend == "sendgrid":
         return EmailService()
-    else:
-        return DevEmailService()
+    if backend == "smtp":
+        return SmtpEmailService()
+    return DevEmailService()
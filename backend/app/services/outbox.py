@@ -0,0 +1,333 @@
+"""Transactional email outbox
+
+Handlers call ``enqueue_email()`` on their session before committing, so the
+email commits (or rolls back) with the change that caused it and the request
+never waits on the email provider. Worker threads (``start_workers()`` in
+each app process, or ``python -m app.cli email-outbox`` on its own) deliver
+due rows:
+
+- a claim takes up to ``batch_size`` due rows with ``FOR UPDATE SKIP LOCKED``,
+  so workers in any process never pick the same row, bumps their attempt
+  count, leases them for OUTBOX_LEASE_SECONDS and commits: no transaction is
+  open while the provider is called, and rows held by a worker that died
+  become due again when the lease ends;
+- a result only applies while the row still carries the claimed attempt
+  number, so a worker whose lease ran out cannot overwrite a newer attempt;
+- failures are retried with exponential backoff and jitter. After
+  OUTBOX_MAX_ATTEMPTS, or when the provider rejects the message itself (4xx),
+  the row is dead-lettered with its last error for
+  ``email-outbox --requeue-dead``.
+
+SQLite has no row locks: run a single worker there.
+"""
+
+import json
+import logging
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Callable
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.metrics import (
+    EMAIL_OUTBOX_DELIVERIES,
+    EMAIL_OUTBOX_DELIVERY_LAG,
+    EMAIL_OUTBOX_ENQUEUED,
+    EMAIL_OUTBOX_ROWS,
+)
+from app.core.workers import BackgroundWorkers
+from app.db.session import SessionLocal, engine
+from app.models.outbox import EmailOutbox, OutboxStatus
+from app.services.email import get_email_service
+
+logger = logging.getLogger(__name__)
+
+# Delivery threads per app process; 0 when a separate `email-outbox` process runs them
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "1"))
+# Rows claimed at once; EmailService sends them in one API call per template
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+# Idle workers look for due rows this often (enqueues in the same process wake them at once)
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+# Retry n waits BACKOFF * 2**(n-1), capped, then scaled by a random 50-100%
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "30"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+
+# Outbox kind -> email service method
+KINDS = {
+    "consultation_confirmation": "send_consultation_confirmation",
+    "consultation_reminder": "send_consultation_reminder",
+    "doctor_notification": "send_doctor_notification",
+    "password_reset": "send_password_reset_email",
+    "temporary_password": "send_temporary_password_email",
+    "welcome": "send_welcome_email",
+}
+
+_outbox = EmailOutbox.__table__
+
+
+def consultation_details(consultation) -> dict:
+    """The consultation fields email templates use, as JSON"""
+    scheduled_at = consultation.scheduled_at
+    return {
+        "scheduled_at": scheduled_at.isoformat() if scheduled_at else None,
+        "specialty": consultation.specialty or "",
+        "jitsi_room_url": consultation.jitsi_room_url or "",
+    }
+
+
+def enqueue_email(db: Session | AsyncSession, kind: str, to_email: str, **data) -> EmailOutbox:
+    """Add an email to ``db``; it is sent once the caller commits"""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown email kind {kind!r}")
+    row = EmailOutbox(kind=kind, to_email=to_email, payload=json.dumps(data))
+    db.add(row)
+    EMAIL_OUTBOX_ENQUEUED.inc(kind=kind)
+    return row
+
+
+@dataclass
+class ClaimedEmail:
+    id: int
+    kind: str
+    to_email: str
+    payload: dict
+    attempts: int
+    created_at: datetime
+
+
+def claim(db: Session, limit: int = OUTBOX_BATCH_SIZE, now: datetime | None = None) -> list[ClaimedEmail]:
+    """Lease up to ``limit`` due rows to the caller"""
+    now = now or datetime.utcnow()
+    rows = db.scalars(
+        select(EmailOutbox)
+        .where(EmailOutbox.status == OutboxStatus.PENDING, EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    claimed = []
+    for row in rows:
+        row.attempts += 1
+        row.next_attempt_at = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        claimed.append(
+            ClaimedEmail(
+                id=row.id,
+                kind=row.kind,
+                to_email=row.to_email,
+                payload=json.loads(row.payload or "{}"),
+                attempts=row.attempts,
+                created_at=row.created_at,
+            )
+        )
+    db.commit()
+    return claimed
+
+
+def _arguments(email: ClaimedEmail) -> dict:
+    data = dict(email.payload)
+    if "consultation" in data:
+        # The templates read consultations by attribute
+        data["consultation"] = SimpleNamespace(**data["consultation"])
+    return data
+
+
+def _outcome(result) -> tuple[str | None, bool]:
+    """(error, permanent) of one send result; error is None on success"""
+    # EmailService reports failures in its result (SmtpEmailService says if
+    # they are permanent); DevEmailService returns None
+    if isinstance(result, dict) and not result.get("success", True):
+        code = result.get("status_code")
+        permanent = result.get("permanent")
+        if permanent is None:
+            # HTTP: the request itself is wrong, sending it again won't help
+            permanent = code is not None and 400 <= code < 500 and code not in (408, 429)
+        return result.get("error") or f"status {code}", permanent
+    return None, False
+
+
+def _deliver(service, email: ClaimedEmail) -> tuple[str | None, bool]:
+    method = getattr(service, KINDS.get(email.kind, ""), None)
+    if method is None:
+        return f"{type(service).__name__} cannot send {email.kind!r}", True
+    try:
+        return _outcome(method(email.to_email, **_arguments(email)))
+    except Exception as e:
+        logger.exception("Email outbox row %d (%s) raised", email.id, email.kind)
+        return str(e) or type(e).__name__, False
+
+
+def _deliver_all(service, emails: list[ClaimedEmail]) -> list[tuple[str | None, bool]]:
+    """Services with ``send_many`` (EmailService) get the whole batch in one call"""
+    if not hasattr(service, "send_many"):
+        return [_deliver(service, email) for email in emails]
+
+    results: list[tuple[str | None, bool]] = [(None, False)] * len(emails)
+    messages, positions = [], []
+    for i, email in enumerate(emails):
+        try:
+            messages.append(service.message(email.kind, email.to_email, **_arguments(email)))
+            positions.append(i)
+        except Exception as e:
+            # Unknown kind or bad payload: every retry would fail the same way
+            results[i] = (f"{type(service).__name__} cannot build {email.kind!r}: {e}", True)
+    if messages:
+        try:
+            sent = service.send_many(messages)
+        except Exception as e:
+            logger.exception("Email outbox batch of %d raised", len(messages))
+            sent = [{"success": False, "error": str(e) or type(e).__name__}] * len(messages)
+        for i, result in zip(positions, sent):
+            results[i] = _outcome(result)
+    return results
+
+
+def backoff(attempts: int, rng: random.Random | None = None) -> float:
+    """Seconds before retrying after ``attempts`` failed attempts"""
+    delay = min(OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX_SECONDS)
+    return delay * (0.5 + (rng or random).random() / 2)
+
+
+def record(
+    db: Session,
+    email: ClaimedEmail,
+    error: str | None,
+    permanent: bool = False,
+    now: datetime | None = None,
+) -> str:
+    """Store a delivery result in ``db``'s transaction; returns the outcome (sent, retry, dead, stale)"""
+    now = now or datetime.utcnow()
+    if error is None:
+        outcome = "sent"
+        # Payloads may hold tokens and temporary passwords: keep them no longer than needed
+        values = {"status": OutboxStatus.SENT, "sent_at": now, "payload": None, "last_error": None}
+    elif permanent or email.attempts >= OUTBOX_MAX_ATTEMPTS:
+        outcome = "dead"
+        values = {"status": OutboxStatus.DEAD, "last_error": error[:2000]}
+    else:
+        outcome = "retry"
+        values = {
+            "next_attempt_at": now + timedelta(seconds=backoff(email.attempts)),
+            "last_error": error[:2000],
+        }
+
+    updated = db.execute(
+        update(_outbox)
+        .where(_outbox.c.id == email.id)
+        .where(_outbox.c.attempts == email.attempts)
+        .where(_outbox.c.status == OutboxStatus.PENDING)
+        .values(**values)
+    ).rowcount
+    if not updated:
+        logger.warning("Email outbox row %d was claimed again before attempt %d finished", email.id, email.attempts)
+        return "stale"
+
+    EMAIL_OUTBOX_DELIVERIES.inc(kind=email.kind, outcome=outcome)
+    if outcome == "sent" and email.created_at:
+        EMAIL_OUTBOX_DELIVERY_LAG.observe((now - email.created_at).total_seconds(), kind=email.kind)
+    elif outcome == "dead":
+        logger.error("Email outbox row %d (%s) dead-lettered after %d attempt(s): %s", email.id, email.kind, email.attempts, error)
+    return outcome
+
+
+def process_batch(
+    session_factory: Callable[[], Session] = SessionLocal,
+    batch_size: int = OUTBOX_BATCH_SIZE,
+    service=None,
+) -> dict[str, int]:
+    """Claim and deliver one batch; returns outcome counts (empty when nothing was due)"""
+    service = service or get_email_service()
+    outcomes: dict[str, int] = {}
+    db = session_factory()
+    try:
+        emails = claim(db, batch_size)
+        for email, (error, permanent) in zip(emails, _deliver_all(service, emails)):
+            outcome = record(db, email, error, permanent)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        db.commit()
+    finally:
+        db.close()
+    return outcomes
+
+
+def drain(
+    session_factory: Callable[[], Session] = SessionLocal,
+    batch_size: int = OUTBOX_BATCH_SIZE,
+    service=None,
+) -> dict[str, int]:
+    """Deliver every row due now (retries scheduled later are left for the workers)"""
+    totals: dict[str, int] = {}
+    while outcomes := process_batch(session_factory, batch_size, service):
+        for outcome, n in outcomes.items():
+            totals[outcome] = totals.get(outcome, 0) + n
+    return totals
+
+
+def status_counts(db: Session) -> dict[str, int]:
+    rows = db.execute(select(_outbox.c.status, func.count()).group_by(_outbox.c.status)).all()
+    return {status: n for status, n in rows}
+
+
+def requeue_dead(db: Session, ids: list[int] | None = None) -> int:
+    """Make dead-lettered rows due again with a fresh attempt budget"""
+    query = update(_outbox).where(_outbox.c.status == OutboxStatus.DEAD)
+    if ids:
+        query = query.where(_outbox.c.id.in_(ids))
+    count = db.execute(
+        query.values(status=OutboxStatus.PENDING, attempts=0, next_attempt_at=datetime.utcnow())
+    ).rowcount
+    db.commit()
+    return count
+
+
+def purge_sent(db: Session, older_than: timedelta) -> int:
+    count = db.execute(
+        delete(_outbox)
+        .where(_outbox.c.status == OutboxStatus.SENT)
+        .where(_outbox.c.sent_at < datetime.utcnow() - older_than)
+    ).rowcount
+    db.commit()
+    return count
+
+
+_workers = BackgroundWorkers("email-outbox", lambda: bool(process_batch()), OUTBOX_POLL_SECONDS)
+
+
+def notify() -> None:
+    """Wake this process's workers; call after committing enqueued emails"""
+    _workers.notify()
+
+
+def start_workers(count: int = OUTBOX_WORKERS, poll_seconds: float = OUTBOX_POLL_SECONDS) -> None:
+    _workers.start(count, poll_seconds)
+
+
+def stop_workers(timeout: float = 10) -> None:
+    """Let in-flight sends finish; rows left claimed are retried after their lease"""
+    _workers.stop(timeout)
+
+
+def _collect_rows() -> dict[tuple, float]:
+    waiting = (OutboxStatus.PENDING, OutboxStatus.DEAD)
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(_outbox.c.status, func.count())
+                .where(_outbox.c.status.in_(waiting))
+                .group_by(_outbox.c.status)
+            ).all()
+    except SQLAlchemyError:
+        return {}
+    counts = {(status.value,): 0.0 for status in waiting}
+    counts.update({(status,): n for status, n in rows})
+    return counts
+
+
+EMAIL_OUTBOX_ROWS.add_callback(_collect_rows)
@@ -0,0 +1,181 @@
+"""Content-addressed disk cache of rendered PDFs
+
+A PDF's key is a digest of everything it is rendered from: the kind, the
+row ids and ``updated_at`` stamps it shows (see app.api.pdf_clinica) and
+the template code itself, so an edit, a new note or a deploy that changes
+the layout gives a new key. Nothing is ever invalidated; stale files simply
+stop being asked for and age out:
+
+- files live in PDF_CACHE_DIR, written to a temp file and renamed into
+  place, so readers (other workers too) never see a partial PDF;
+- when the directory grows past PDF_CACHE_MAX_BYTES the least recently
+  used files are deleted (hits touch the file's mtime, so the order holds
+  across workers and restarts);
+- concurrent requests for the same key in a process wait for the first
+  one's render instead of starting their own (single-flight).
+
+The key doubles as the response ETag: a client that already has the PDF
+gets a 304 without the cache being read at all.
+
+Cached PDFs contain patient data in clear: keep PDF_CACHE_DIR on an
+encrypted volume (or tmpfs) readable by the app user only.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+from app.core.metrics import PDF_CACHE_BYTES, PDF_CACHE_EVICTIONS
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "telemed-pdf-cache"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+SUFFIX = ".pdf"
+
+
+def cache_key(version: str, kind: str, *parts) -> str:
+    """Digest of a PDF's inputs; ``parts`` must be JSON-serialisable (datetimes are str()'d)"""
+    payload = json.dumps([version, kind, *parts], default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PdfCache:
+    def __init__(self, directory: str | Path, max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        # key -> size, least recently used first
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._rescan()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}{SUFFIX}"
+
+    def _rescan(self) -> None:
+        """Rebuild the LRU order from the directory, which other workers write to too"""
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime, entry.name[: -len(SUFFIX)], stat.st_size))
+        found.sort()
+        self._entries = OrderedDict((key, size) for _, key, size in found)
+        self._size = sum(self._entries.values())
+        PDF_CACHE_BYTES.set(self._size)
+
+    def get(self, key: str) -> Path | None:
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return path
+
+    def temp_path(self) -> Path:
+        """A new empty file in the cache directory, for renders written straight to disk"""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        return Path(tmp)
+
+    def put(self, key: str, data: bytes | Path) -> Path:
+        """Store ``data``: the PDF's bytes, or a file from temp_path(), which is moved in"""
+        path = self.path(key)
+        if isinstance(data, Path):
+            size = data.stat().st_size
+            os.replace(data, path)
+        else:
+            size = len(data)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        with self._lock:
+            self._size += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            if self._size > self.max_bytes:
+                self._evict(keep=key)
+            PDF_CACHE_BYTES.set(self._size)
+        return path
+
+    def _evict(self, keep: str) -> None:
+        self._rescan()
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            key, size = next(iter(self._entries.items()))
+            if key == keep:
+                self._entries.move_to_end(key)
+                continue
+            del self._entries[key]
+            self._size -= size
+            try:
+                os.unlink(self.path(key))
+            except FileNotFoundError:
+                pass
+            PDF_CACHE_EVICTIONS.inc()
+
+    def get_or_render(self, key: str, render: Callable[[], bytes | Path]) -> tuple[Path, str]:
+        """The cached file for ``key``, rendering it once if missing; also returns
+        the outcome: hit, miss (rendered here) or shared (another thread's render)"""
+        path = self.get(key)
+        if path is not None:
+            return path, "hit"
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            # Raises the leader's exception too (e.g. a 404), as a render here would
+            return future.result(), "shared"
+
+        try:
+            # The previous leader may have finished between our get() and taking the lead
+            path = self.get(key)
+            outcome = "hit"
+            if path is None:
+                path, outcome = self.put(key, render()), "miss"
+            future.set_result(path)
+            return path, outcome
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.unlink(self.path(key))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._size = 0
+            PDF_CACHE_BYTES.set(0)
+
+
+@lru_cache(maxsize=1)
+def get_pdf_cache() -> PdfCache:
+    return PdfCache(PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES)
@@ -0,0 +1,304 @@
+"""Background PDF export jobs
+
+Large histories take longer to render than the proxy in front of the API
+waits, so clients can ask for an export job instead (app.api.pdf_exports):
+a POST stores a ``pdf_export_jobs`` row and returns its id, clients poll it,
+and download the file once it is done. Worker threads (``start_workers()``
+in each app process, or ``python -m app.cli pdf-exports`` on its own) run
+the jobs:
+
+- a claim takes the oldest due job with ``FOR UPDATE SKIP LOCKED``, bumps
+  its attempt count, leases it for PDF_EXPORT_LEASE_SECONDS and commits, so
+  workers in any process never run the same job and a job whose worker died
+  is picked up again when the lease ends;
+- jobs render through the same cache key and render function as the
+  synchronous endpoints (app.api.pdf_clinica), on the render pool: an
+  export already in the cache completes at once, and the result is linked
+  into PDF_EXPORT_DIR, where the cache's LRU cannot evict it;
+- finished files are deleted PDF_EXPORT_TTL_SECONDS after the job is done
+  and the job marked expired; the row stays as a record of the export.
+
+Rows and progress live in the database, so jobs survive restarts; files
+must be on storage every app process can read (a shared volume when the
+API runs on several hosts). Exported PDFs hold patient data in clear: same
+precautions as PDF_CACHE_DIR.
+
+SQLite has no row locks: run a single worker there.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.metrics import PDF_EXPORT_DURATION, PDF_EXPORT_JOBS
+from app.core.workers import BackgroundWorkers
+from app.db.session import SessionLocal
+from app.models.pdf_export import ExportStatus, PdfExportJob
+from app.services.pdf_cache import get_pdf_cache
+from app.services.pdf_render import PDF_RENDER_RETRY_AFTER_SECONDS, PdfRenderBusy, PdfRenderFailed
+
+logger = logging.getLogger(__name__)
+
+# Export threads per app process; 0 when a separate `pdf-exports` process runs them
+PDF_EXPORT_WORKERS = int(os.getenv("PDF_EXPORT_WORKERS", "1"))
+PDF_EXPORT_POLL_SECONDS = float(os.getenv("PDF_EXPORT_POLL_SECONDS", "2"))
+PDF_EXPORT_DIR = os.getenv("PDF_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "telemed-pdf-exports"))
+# Finished exports can be downloaded for this long
+PDF_EXPORT_TTL_SECONDS = float(os.getenv("PDF_EXPORT_TTL_SECONDS", str(24 * 3600)))
+PDF_EXPORT_LEASE_SECONDS = float(os.getenv("PDF_EXPORT_LEASE_SECONDS", "600"))
+PDF_EXPORT_MAX_ATTEMPTS = int(os.getenv("PDF_EXPORT_MAX_ATTEMPTS", "3"))
+
+KINDS = ("history", "complaint")
+
+_jobs = PdfExportJob.__table__
+
+
+def export_path(job_id: int) -> Path:
+    return Path(PDF_EXPORT_DIR) / f"{job_id}.pdf"
+
+
+def create_job(
+    db: Session, kind: str, patient_id: int, requested_by_id: int, complaint: str | None = None
+) -> PdfExportJob:
+    """Add an export job to ``db``; workers pick it up once the caller commits (then call notify())"""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown export kind {kind!r}")
+    job = PdfExportJob(kind=kind, patient_id=patient_id, requested_by_id=requested_by_id, complaint=complaint)
+    db.add(job)
+    PDF_EXPORT_JOBS.inc(kind=kind, outcome="queued")
+    return job
+
+
+@dataclass
+class ClaimedJob:
+    id: int
+    kind: str
+    patient_id: int
+    complaint: str | None
+    attempts: int
+    created_at: datetime
+
+
+def claim(db: Session, now: datetime | None = None) -> ClaimedJob | None:
+    """Lease the oldest due job to the caller
+
+    A job still running when its lease ran out lost its worker (killed, hung);
+    after PDF_EXPORT_MAX_ATTEMPTS of those it fails instead of taking down
+    another one.
+    """
+    now = now or datetime.utcnow()
+    while True:
+        job = db.scalars(
+            select(PdfExportJob)
+            .where(
+                PdfExportJob.status.in_((ExportStatus.QUEUED, ExportStatus.RUNNING)),
+                PdfExportJob.next_attempt_at <= now,
+            )
+            .order_by(PdfExportJob.next_attempt_at, PdfExportJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if job is None:
+            db.rollback()
+            return None
+        if job.status != ExportStatus.RUNNING or job.attempts < PDF_EXPORT_MAX_ATTEMPTS:
+            break
+        logger.warning("PDF export job %d lost its worker %d times; giving up", job.id, job.attempts)
+        job.status = ExportStatus.FAILED
+        job.finished_at = now
+        job.error = "worker lost"
+        PDF_EXPORT_JOBS.inc(kind=job.kind, outcome="failed")
+        db.commit()
+    job.attempts += 1
+    job.status = ExportStatus.RUNNING
+    job.progress = 10
+    job.next_attempt_at = now + timedelta(seconds=PDF_EXPORT_LEASE_SECONDS)
+    claimed = ClaimedJob(job.id, job.kind, job.patient_id, job.complaint, job.attempts, job.created_at)
+    db.commit()
+    return claimed
+
+
+def _held(job: ClaimedJob, **values):
+    """UPDATE of the job that only applies while this attempt still holds it"""
+    return (
+        update(_jobs)
+        .where(_jobs.c.id == job.id)
+        .where(_jobs.c.attempts == job.attempts)
+        .where(_jobs.c.status == ExportStatus.RUNNING)
+        .values(**values)
+    )
+
+
+def _update(db: Session, job: ClaimedJob, **values) -> bool:
+    """Write to the job while this worker still holds it; False when another attempt took over"""
+    updated = db.execute(_held(job, **values)).rowcount
+    db.commit()
+    return bool(updated)
+
+
+def _progress(db: Session, job: ClaimedJob, progress: int) -> bool:
+    """``_update`` of the progress mid-render, on a connection of its own
+
+    Committing ``db`` would expire the patient and notes being rendered, and
+    every note would then be loaded and decrypted again one row at a time.
+    """
+    with db.get_bind().begin() as conn:
+        return bool(conn.execute(_held(job, progress=progress)).rowcount)
+
+
+def _store(source: Path, job_id: int) -> Path:
+    """Link the cached PDF into the export directory (copy across filesystems)"""
+    target = export_path(job_id)
+    target.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    tmp = target.with_suffix(".tmp")
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+    return target
+
+
+def run_job(db: Session, job: ClaimedJob, now: datetime | None = None) -> str:
+    """Render a claimed job and store the outcome (done, retry, failed, stale)"""
+    # The templates and cache keys live with the synchronous endpoints
+    from app.api.pdf_clinica import patient_export
+
+    error, retry_at = None, None
+    try:
+        export = patient_export(
+            db,
+            job.kind,
+            job.patient_id,
+            job.complaint,
+            # Chunked renders of long histories: 30% -> 90%
+            on_progress=lambda done: _progress(db, job, 30 + int(60 * done)),
+        )
+        if not _progress(db, job, 30):
+            return "stale"
+        path, _ = get_pdf_cache().get_or_render(export.key, export.render)
+        stored = _store(path, job.id)
+    except HTTPException as e:
+        # Patient gone, no matching records: the same on every attempt
+        error = str(e.detail)
+    except PdfRenderBusy:
+        # Not the job's fault: try again shortly without spending an attempt
+        db.rollback()
+        retry_at = datetime.utcnow() + timedelta(seconds=PDF_RENDER_RETRY_AFTER_SECONDS)
+        _update(db, job, status=ExportStatus.QUEUED, attempts=job.attempts - 1, next_attempt_at=retry_at)
+        return "busy"
+    except PdfRenderFailed as e:
+        error = f"render {e.reason}"
+        if e.reason == "crash" and job.attempts < PDF_EXPORT_MAX_ATTEMPTS:
+            retry_at = datetime.utcnow()
+    except Exception:
+        # The details (SQL, paths, patient data) stay in the logs, not in the job
+        logger.exception("PDF export job %d failed", job.id)
+        error = "internal error"
+        if job.attempts < PDF_EXPORT_MAX_ATTEMPTS:
+            retry_at = datetime.utcnow() + timedelta(seconds=PDF_EXPORT_POLL_SECONDS * 2**job.attempts)
+    db.rollback()
+
+    now = now or datetime.utcnow()
+    if error is None:
+        outcome = "done"
+        values = {
+            "status": ExportStatus.DONE,
+            "progress": 100,
+            "filename": export.filename,  # encrypted by the column type
+            "size_bytes": stored.stat().st_size,
+            "finished_at": now,
+            "expires_at": now + timedelta(seconds=PDF_EXPORT_TTL_SECONDS),
+            "error": None,
+        }
+    elif retry_at is not None:
+        outcome = "retry"
+        values = {"status": ExportStatus.QUEUED, "progress": 0, "next_attempt_at": retry_at, "error": error[:2000]}
+    else:
+        outcome = "failed"
+        values = {"status": ExportStatus.FAILED, "finished_at": now, "error": error[:2000]}
+    if not _update(db, job, **values):
+        logger.warning("PDF export job %d was claimed again before attempt %d finished", job.id, job.attempts)
+        return "stale"
+    PDF_EXPORT_JOBS.inc(kind=job.kind, outcome=outcome)
+    if outcome == "done" and job.created_at:
+        PDF_EXPORT_DURATION.observe((now - job.created_at).total_seconds(), kind=job.kind)
+    return outcome
+
+
+def expire(db: Session, now: datetime | None = None) -> int:
+    """Delete the files of jobs past their TTL; returns the jobs expired"""
+    now = now or datetime.utcnow()
+    ids = db.scalars(
+        select(_jobs.c.id).where(_jobs.c.status == ExportStatus.DONE, _jobs.c.expires_at <= now)
+    ).all()
+    for job_id in ids:
+        export_path(job_id).unlink(missing_ok=True)
+    if ids:
+        db.execute(update(_jobs).where(_jobs.c.id.in_(ids)).values(status=ExportStatus.EXPIRED))
+        PDF_EXPORT_JOBS.inc(len(ids), kind="all", outcome="expired")
+    db.commit()
+    return len(ids)
+
+
+def process_one(session_factory: Callable[[], Session] = SessionLocal) -> str | None:
+    """Claim and run one job; returns its outcome, or None when nothing was due"""
+    db = session_factory()
+    try:
+        job = claim(db)
+        return run_job(db, job) if job else None
+    finally:
+        db.close()
+
+
+def drain(session_factory: Callable[[], Session] = SessionLocal) -> dict[str, int]:
+    """Run every job due now, and expire old files"""
+    totals: dict[str, int] = {}
+    while outcome := process_one(session_factory):
+        totals[outcome] = totals.get(outcome, 0) + 1
+        if outcome == "busy":
+            break
+    db = session_factory()
+    try:
+        if expired := expire(db):
+            totals["expired"] = expired
+    finally:
+        db.close()
+    return totals
+
+
+def _step() -> bool:
+    outcome = process_one()
+    if outcome is None:
+        db = SessionLocal()
+        try:
+            expire(db)
+        finally:
+            db.close()
+    return outcome not in (None, "busy")
+
+
+_workers = BackgroundWorkers("pdf-exports", _step, PDF_EXPORT_POLL_SECONDS)
+
+
+def notify() -> None:
+    """Wake this process's workers; call after committing a new job"""
+    _workers.notify()
+
+
+def start_workers(count: int = PDF_EXPORT_WORKERS, poll_seconds: float = PDF_EXPORT_POLL_SECONDS) -> None:
+    _workers.start(count, poll_seconds)
+
+
+def stop_workers(timeout: float = 10) -> None:
+    """Let in-flight renders finish; jobs left running are retried after their lease"""
+    _workers.stop(timeout)
@@ -0,0 +1,222 @@
+"""WeasyPrint rendering on an isolated, bounded process pool
+
+A clinical history can take seconds and hundreds of megabytes to lay out.
+Rendered in the request thread, a few large exports hold the GIL, fill the
+threadpool and grow the API process; a burst of them stalls bookings too.
+Here renders run in PDF_RENDER_WORKERS separate processes:
+
+- at most PDF_RENDER_QUEUE_LIMIT renders may be running or waiting per app
+  process; past that, callers get ``PdfRenderBusy`` straight away, which the
+  app maps to 503 with Retry-After, so waiting exports never hold more than
+  that many request threads;
+- each render gets PDF_RENDER_TIMEOUT_SECONDS, enforced by a timer in the
+  worker; a worker stuck in native code past that is killed from here;
+- workers are capped at PDF_RENDER_MAX_MEMORY_MB of address space (a render
+  that needs more fails with ``PdfRenderFailed`` instead of swapping the
+  host) and replaced after PDF_RENDER_MAX_TASKS renders, which returns the
+  memory WeasyPrint and fontconfig keep hold of.
+
+PDF_RENDER_WORKERS=0 renders in the calling thread, still under admission
+control (tests, and hosts that cannot spawn processes).
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from app.core.metrics import PDF_RENDER_FAILURES, PDF_RENDER_QUEUE_DEPTH, PDF_RENDER_REJECTED
+
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(2, os.cpu_count() or 1))))
+PDF_RENDER_QUEUE_LIMIT = int(os.getenv("PDF_RENDER_QUEUE_LIMIT", str(max(PDF_RENDER_WORKERS, 1) * 4)))
+PDF_RENDER_TIMEOUT_SECONDS = float(os.getenv("PDF_RENDER_TIMEOUT_SECONDS", "60"))
+PDF_RENDER_MAX_MEMORY_MB = int(os.getenv("PDF_RENDER_MAX_MEMORY_MB", "1024"))
+PDF_RENDER_MAX_TASKS = int(os.getenv("PDF_RENDER_MAX_TASKS", "50"))
+PDF_RENDER_RETRY_AFTER_SECONDS = 5
+# Extra wait for the worker's own timer before the worker is killed
+KILL_GRACE_SECONDS = 5
+
+
+class PdfRenderBusy(Exception):
+    """The render queue is full; the export should be retried shortly"""
+
+
+class PdfRenderFailed(Exception):
+    """A render ran out of time or memory, or its worker died"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _RenderTimeout(Exception):
+    pass
+
+
+# Worker-side functions: module-level so they pickle by reference.
+def _init_worker(max_memory_mb: int) -> None:
+    if max_memory_mb > 0:
+        try:
+            import resource
+
+            limit = max_memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass  # no RLIMIT_AS on this platform
+    try:
+        # Pay the WeasyPrint import once per worker, not on its first render
+        import weasyprint  # noqa: F401
+    except Exception:
+        pass  # reported by the first render
+
+
+def _on_alarm(signum, frame):
+    raise _RenderTimeout()
+
+
+def _call(fn, args: tuple, timeout: float):
+    """Run ``fn`` in the worker, interrupted after ``timeout`` seconds"""
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _render(html_content: str) -> bytes:
+    from weasyprint import HTML
+
+    return HTML(string=html_content).write_pdf()
+
+
+def _render_to_file(html_content: str, path: str) -> int:
+    from weasyprint import HTML
+
+    document = HTML(string=html_content).render()
+    document.write_pdf(path)
+    return len(document.pages)
+
+
+def _concatenate(paths: list[str], target: str, overlay: str | None = None) -> int:
+    """Append the pages of ``paths`` to ``target``, page n of ``overlay`` drawn over the n-th"""
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    stamps = PdfReader(overlay).pages if overlay else None
+    n = 0
+    for path in paths:
+        for page in PdfReader(path).pages:
+            if stamps is not None:
+                page.merge_page(stamps[n])
+            writer.add_page(page)
+            n += 1
+    with open(target, "wb") as f:
+        writer.write(f)
+    return n
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_inflight = 0
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that runs an event loop and DB pools is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(PDF_RENDER_MAX_MEMORY_MB,),
+                max_tasks_per_child=PDF_RENDER_MAX_TASKS or None,
+            )
+        return _pool
+
+
+def shutdown_pool(kill: bool = False) -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is None:
+        return
+    if kill:
+        # A worker is stuck in native code: nothing else can stop it
+        for process in list((pool._processes or {}).values()):
+            process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _admit() -> int:
+    """Take a place in the queue; returns the renders now running or waiting, this one included"""
+    global _inflight
+    with _pool_lock:
+        if _inflight >= PDF_RENDER_QUEUE_LIMIT:
+            PDF_RENDER_REJECTED.inc()
+            raise PdfRenderBusy()
+        _inflight += 1
+        PDF_RENDER_QUEUE_DEPTH.set(_inflight)
+        return _inflight
+
+
+def _release() -> None:
+    global _inflight
+    with _pool_lock:
+        _inflight -= 1
+        PDF_RENDER_QUEUE_DEPTH.set(_inflight)
+
+
+def _fail(reason: str) -> PdfRenderFailed:
+    PDF_RENDER_FAILURES.inc(reason=reason)
+    return PdfRenderFailed(reason)
+
+
+def run(fn, *args, timeout: float | None = None):
+    """``fn(*args)`` on the render pool; blocks the calling (threadpool) thread"""
+    timeout = PDF_RENDER_TIMEOUT_SECONDS if timeout is None else timeout
+    depth = _admit()
+    try:
+        if PDF_RENDER_WORKERS <= 0:
+            # Inline mode: no process to time out or cap; admission control only
+            return fn(*args)
+        future = _get_pool().submit(_call, fn, args, timeout)
+        # Each render ahead of this one takes at most its own timeout: waiting
+        # longer means a worker ignored its timer (stuck in native code)
+        rounds = -(-depth // PDF_RENDER_WORKERS)
+        try:
+            return future.result(rounds * timeout + KILL_GRACE_SECONDS)
+        except _RenderTimeout:
+            raise _fail("timeout") from None
+        except MemoryError:
+            raise _fail("memory") from None
+        except FutureTimeout:
+            if not future.cancel():
+                shutdown_pool(kill=True)
+            raise _fail("timeout") from None
+        except BrokenProcessPool:
+            # A worker died (OOM kill, segfault in Pango...): start a fresh pool
+            shutdown_pool()
+            raise _fail("crash") from None
+    finally:
+        _release()
+
+
+def render_pdf(html_content: str) -> bytes:
+    return run(_render, html_content)
+
+
+def render_pdf_to(html_content: str, path: str | os.PathLike) -> int:
+    """Render into the file at ``path``; returns its page count"""
+    return run(_render_to_file, html_content, os.fspath(path))
+
+
+def concatenate_pdfs(paths: list, target: str | os.PathLike, overlay: str | os.PathLike | None = None) -> int:
+    """Concatenate PDF files into ``target`` on the pool (needs ``pypdf``); returns the page count"""
+    return run(
+        _concatenate, [os.fspath(p) for p in paths], os.fspath(target), os.fspath(overlay) if overlay else None
+    )
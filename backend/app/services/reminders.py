@@ -0,0 +1,168 @@
+"""Consultation reminders
+
+Patients get an email REMINDER_HOURS before their consultation (24 h and
+1 h by default). Scheduler threads (``start_scheduler()`` in each app
+process, or ``python -m app.cli reminders`` on its own) scan for due
+reminders every REMINDER_POLL_SECONDS:
+
+- ``consultations.reminders_sent`` counts the windows already handled,
+  longest first. A window's scan reads ``ix_consultations_reminders_due``
+  (reminders_sent, scheduled_at): only consultations still owing that
+  reminder and starting within the window, never the whole table;
+- rows are claimed with ``FOR UPDATE SKIP LOCKED``, and the reminders are
+  queued in the email outbox and marked sent in the same transaction, so
+  schedulers in any process never remind twice and the outbox sends each
+  batch in one provider call per template;
+- the shortest open window is handled first, so a consultation booked 30
+  minutes ahead gets one reminder, not the 24 h and 1 h ones together.
+  Rescheduling (a new scheduled_at) starts the reminders over.
+
+SQLite has no row locks: run a single scheduler there.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.metrics import CONSULTATION_REMINDER_DELAY, CONSULTATION_REMINDERS
+from app.core.workers import BackgroundWorkers
+from app.db.session import SessionLocal
+from app.models.consultation import Consultation, ConsultationStatus
+from app.models.user import Patient
+from app.services import outbox
+
+logger = logging.getLogger(__name__)
+
+# Hours before the consultation, one reminder each
+REMINDER_HOURS = sorted(
+    {float(h) for h in os.getenv("REMINDER_HOURS", "24,1").split(",") if h.strip()}, reverse=True
+)
+# Scheduler threads per app process; 0 when a separate `reminders` process runs them
+REMINDER_WORKERS = int(os.getenv("REMINDER_WORKERS", "1"))
+REMINDER_POLL_SECONDS = float(os.getenv("REMINDER_POLL_SECONDS", "60"))
+# Consultations claimed per transaction
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+
+# Consultations that still take place
+ACTIVE_STATUSES = (ConsultationStatus.PENDING, ConsultationStatus.CONFIRMED)
+
+
+def window_label(hours: float) -> str:
+    return f"{hours:g}h"
+
+
+def due_query(stage: int, hours: float, now: datetime, limit: int):
+    """Consultations owing reminder ``stage`` (1-based, longest window first)"""
+    return (
+        select(
+            Consultation.id,
+            Consultation.scheduled_at,
+            Consultation.specialty,
+            Consultation.jitsi_room_url,
+            Consultation.created_at,
+            Patient.email,
+            Patient.full_name,
+        )
+        .join(Patient, Patient.id == Consultation.patient_id)
+        .where(
+            # IN keeps it a few index range scans on (reminders_sent, scheduled_at)
+            Consultation.reminders_sent.in_(range(stage)),
+            Consultation.scheduled_at > now,
+            Consultation.scheduled_at <= now + timedelta(hours=hours),
+            Consultation.status.in_(ACTIVE_STATUSES),
+        )
+        .order_by(Consultation.scheduled_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True, of=Consultation)
+    )
+
+
+def send_window(
+    db: Session,
+    stage: int,
+    hours: float,
+    limit: int = REMINDER_BATCH_SIZE,
+    now: datetime | None = None,
+) -> int:
+    """Queue one batch of reminders for a window and commit; returns the consultations handled"""
+    now = now or datetime.utcnow()
+    label = window_label(hours)
+    rows = db.execute(due_query(stage, hours, now, limit)).all()
+    if not rows:
+        db.rollback()
+        return 0
+
+    for row in rows:
+        if not row.email:
+            CONSULTATION_REMINDERS.inc(window=label, outcome="skipped")
+            continue
+        outbox.enqueue_email(
+            db,
+            "consultation_reminder",
+            row.email,
+            full_name=row.full_name,
+            consultation=outbox.consultation_details(row),
+        )
+        CONSULTATION_REMINDERS.inc(window=label, outcome="queued")
+        opened = row.scheduled_at - timedelta(hours=hours)
+        if row.created_at and row.created_at > opened:
+            opened = row.created_at
+        CONSULTATION_REMINDER_DELAY.observe(max((now - opened).total_seconds(), 0.0), window=label)
+    db.execute(
+        update(Consultation)
+        .where(Consultation.id.in_([row.id for row in rows]))
+        # Not an edit of the consultation: keep updated_at
+        .values(reminders_sent=stage, updated_at=Consultation.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return len(rows)
+
+
+def run_once(
+    session_factory: Callable[[], Session] = SessionLocal,
+    batch_size: int = REMINDER_BATCH_SIZE,
+    now: datetime | None = None,
+) -> dict[str, int]:
+    """Queue every reminder due now; returns consultations handled per window"""
+    handled: dict[str, int] = {}
+    db = session_factory()
+    try:
+        # Shortest window first, so late bookings skip the longer ones
+        for stage in range(len(REMINDER_HOURS), 0, -1):
+            hours = REMINDER_HOURS[stage - 1]
+            total = 0
+            while count := send_window(db, stage, hours, batch_size, now):
+                total += count
+                outbox.notify()
+                if count < batch_size:
+                    break
+            if total:
+                handled[window_label(hours)] = total
+    finally:
+        db.close()
+    return handled
+
+
+def _step() -> bool:
+    handled = run_once()
+    if handled:
+        logger.info("Consultation reminders queued: %s", handled)
+    # Nothing more is due until the next poll
+    return False
+
+
+_workers = BackgroundWorkers("reminders", _step, REMINDER_POLL_SECONDS)
+
+
+def start_scheduler(count: int = REMINDER_WORKERS, poll_seconds: float = REMINDER_POLL_SECONDS) -> None:
+    if REMINDER_HOURS:
+        _workers.start(count, poll_seconds)
+
+
+def stop_scheduler(timeout: float = 10) -> None:
+    _workers.stop(timeout)
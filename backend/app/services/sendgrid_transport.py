@@ -0,0 +1,208 @@
+"""Long-lived SendGrid v3 transport: keep-alive pool, timeouts, circuit breaker, batching
+
+One transport per process (``get_transport()``) sends every email. Its
+HTTPS connections stay open between requests, where a ``SendGridAPIClient``
+per message paid a TCP and TLS handshake each time.
+
+``send_many()`` groups messages by template into multi-personalization
+requests of up to SENDGRID_BATCH_SIZE recipients (SendGrid's limit is
+1000), so a day's reminders take a few API calls instead of one each.
+SendGrid accepts or rejects a request as a whole: a rejected batch is split
+in halves and resent, so one invalid address only fails its own message.
+
+Network errors, timeouts, 429 and 5xx count as failures for the circuit
+breaker; once open, sends fail at once and callers (the email outbox)
+retry later as for any other failure.
+
+SENDGRID_BASE_URL points the transport elsewhere, e.g. at
+``benchmarks/fake_sendgrid.py`` to test offline.
+"""
+
+import http.client
+import json
+import os
+import ssl
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Sequence
+from urllib.parse import urlsplit
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.metrics import EMAIL_BATCH_RECIPIENTS, time_external_call
+
+SENDGRID_BASE_URL = os.getenv("SENDGRID_BASE_URL", "https://api.sendgrid.com")
+# Seconds to connect, and between bytes of a response
+SENDGRID_TIMEOUT = float(os.getenv("SENDGRID_TIMEOUT", "10"))
+# Concurrent requests (connections) per process
+SENDGRID_POOL_SIZE = int(os.getenv("SENDGRID_POOL_SIZE", "4"))
+SENDGRID_BATCH_SIZE = min(int(os.getenv("SENDGRID_BATCH_SIZE", "1000")), 1000)
+SENDGRID_BREAKER_FAILURES = int(os.getenv("SENDGRID_BREAKER_FAILURES", "5"))
+SENDGRID_BREAKER_RESET_SECONDS = float(os.getenv("SENDGRID_BREAKER_RESET_SECONDS", "30"))
+# Idle connections are dropped before the server's keep-alive timeout closes them
+KEEPALIVE_SECONDS = 30
+
+# Raised when reusing a connection the server has closed meanwhile
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+@dataclass
+class TemplateEmail:
+    """One recipient of a dynamic template"""
+
+    to_email: str
+    template_id: str
+    data: dict
+    # Metrics label, e.g. consultation_confirmation
+    operation: str
+
+
+class SendGridHTTPError(Exception):
+    def __init__(self, status_code: int, body: bytes):
+        super().__init__(f"HTTP {status_code}: {body[:500].decode(errors='replace')}")
+        self.status_code = status_code
+
+
+class ConnectionPool:
+    """Up to ``size`` persistent HTTP(S) connections to one host"""
+
+    def __init__(self, base_url: str, size: int, timeout: float):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port
+        self.prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self._context = ssl.create_default_context() if url.scheme == "https" else None
+        self._idle: list[tuple[http.client.HTTPConnection, float]] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._context is not None:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self._context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _checkout(self) -> tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, idle_since = self._idle.pop()
+                if now - idle_since < KEEPALIVE_SECONDS:
+                    return conn, True
+                conn.close()
+        return self._connect(), False
+
+    def request(self, method: str, path: str, body: bytes, headers: dict) -> tuple[int, bytes]:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("No free connection")
+        try:
+            while True:
+                conn, reused = self._checkout()
+                try:
+                    conn.request(method, self.prefix + path, body, headers)
+                    response = conn.getresponse()
+                    data = response.read()
+                except Exception as e:
+                    conn.close()
+                    if reused and isinstance(e, _STALE_CONNECTION_ERRORS):
+                        # The other idle connections are likely as old: retry on a new one
+                        self.close()
+                        continue
+                    raise
+                if response.will_close:
+                    conn.close()
+                else:
+                    with self._lock:
+                        self._idle.append((conn, time.monotonic()))
+                return response.status, data
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+
+class SendGridTransport:
+    def __init__(
+        self,
+        api_key: str | None,
+        base_url: str = SENDGRID_BASE_URL,
+        pool_size: int = SENDGRID_POOL_SIZE,
+        timeout: float = SENDGRID_TIMEOUT,
+        batch_size: int = SENDGRID_BATCH_SIZE,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.batch_size = batch_size
+        self.pool = ConnectionPool(base_url, pool_size, timeout)
+        self.breaker = breaker or CircuitBreaker(
+            "sendgrid", SENDGRID_BREAKER_FAILURES, SENDGRID_BREAKER_RESET_SECONDS
+        )
+        self._headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+
+    def send_many(self, sender: tuple[str, str], emails: Sequence[TemplateEmail]) -> list[dict]:
+        """One result per email, in order: ``{"success", "status_code"[, "error"]}``"""
+        by_template: dict[str, list[int]] = {}
+        for i, email in enumerate(emails):
+            by_template.setdefault(email.template_id, []).append(i)
+        results: list[dict] = [{}] * len(emails)
+        for indexes in by_template.values():
+            for start in range(0, len(indexes), self.batch_size):
+                chunk = indexes[start : start + self.batch_size]
+                for i, result in zip(chunk, self._send_batch(sender, [emails[i] for i in chunk])):
+                    results[i] = result
+        return results
+
+    def _send_batch(self, sender: tuple[str, str], emails: list[TemplateEmail]) -> list[dict]:
+        result = self._post(sender, emails)
+        code = result.get("status_code")
+        if len(emails) > 1 and code in (400, 413):
+            half = len(emails) // 2
+            return self._send_batch(sender, emails[:half]) + self._send_batch(sender, emails[half:])
+        return [result] * len(emails)
+
+    def _post(self, sender: tuple[str, str], emails: list[TemplateEmail]) -> dict:
+        if not self.breaker.allow():
+            return {"success": False, "status_code": None, "error": "SendGrid circuit open"}
+        from_email, from_name = sender
+        body = {
+            "from": {"email": from_email, "name": from_name},
+            "template_id": emails[0].template_id,
+            "personalizations": [
+                {"to": [{"email": e.to_email}], "dynamic_template_data": e.data} for e in emails
+            ],
+        }
+        try:
+            with time_external_call("sendgrid", emails[0].operation):
+                status, data = self.pool.request(
+                    "POST", "/v3/mail/send", json.dumps(body, default=str).encode(), self._headers
+                )
+                if status >= 400:
+                    raise SendGridHTTPError(status, data)
+        except SendGridHTTPError as e:
+            code, error = e.status_code, str(e)
+        except (OSError, http.client.HTTPException) as e:
+            code, error = None, str(e) or type(e).__name__
+        else:
+            self.breaker.record_success()
+            EMAIL_BATCH_RECIPIENTS.observe(len(emails))
+            return {"success": True, "status_code": status}
+
+        if code is None or code == 429 or code >= 500:
+            self.breaker.record_failure()
+        else:
+            # SendGrid answered: the request was at fault, not the service
+            self.breaker.record_success()
+        return {"success": False, "status_code": code, "error": error}
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+@lru_cache(maxsize=1)
+def get_transport() -> SendGridTransport:
+    """The process-wide transport (created on first use, after workers fork)"""
+    return SendGridTransport(os.getenv("SENDGRID_API_KEY"))
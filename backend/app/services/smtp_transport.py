@@ -0,0 +1,262 @@
+"""Pooled SMTP transport: persistent authenticated sessions, pipelined sends
+
+For clinics that relay mail through their own server (EMAIL_BACKEND=smtp).
+A session is opened, upgraded to TLS and authenticated once, then reused
+for up to SMTP_MAX_MESSAGES_PER_CONNECTION messages: no TCP and TLS
+handshake and AUTH per email.
+
+When the server advertises PIPELINING (RFC 2920), commands are not sent in
+lock-step: the envelope of a message (MAIL, RCPT, DATA) goes out in one
+write together with the content of the previous message, so each message
+costs one round trip instead of four. Every reply is still checked, and a
+refused recipient only fails its own message.
+
+Connection, TLS and login failures count towards a circuit breaker as for
+SendGrid. 5xx replies are permanent failures; 4xx and lost connections are
+retried by the outbox.
+
+The sessions are blocking sockets, used from the outbox's delivery threads,
+like the SendGrid transport.
+"""
+
+import logging
+import os
+import re
+import smtplib
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+from functools import lru_cache
+from typing import Iterator, Sequence
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.metrics import EMAIL_BATCH_RECIPIENTS, time_external_call
+
+logger = logging.getLogger(__name__)
+
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+# starttls (submission port 587), ssl (implicit TLS, port 465) or none
+SMTP_SECURITY = os.getenv("SMTP_SECURITY", "starttls")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+# Relays cap messages per session; start a new one before hitting the cap
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+# Servers drop idle sessions (RFC 5321 asks for at least 5 minutes): don't reuse older ones
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+SMTP_BREAKER_FAILURES = int(os.getenv("SMTP_BREAKER_FAILURES", "5"))
+SMTP_BREAKER_RESET_SECONDS = float(os.getenv("SMTP_BREAKER_RESET_SECONDS", "30"))
+
+_LEADING_DOT = re.compile(rb"^\.", re.MULTILINE)
+
+
+class _Session:
+    def __init__(self, conn: smtplib.SMTP):
+        self.conn = conn
+        self.sent = 0
+        self.idle_since = time.monotonic()
+
+    def close(self) -> None:
+        try:
+            self.conn.quit()
+        except (smtplib.SMTPException, OSError):
+            self.conn.close()
+
+
+class SmtpPool:
+    """Up to ``size`` authenticated sessions with one SMTP server"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        security: str = "starttls",
+        username: str | None = None,
+        password: str | None = None,
+        size: int = SMTP_POOL_SIZE,
+        timeout: float = SMTP_TIMEOUT,
+        max_messages: int = SMTP_MAX_MESSAGES_PER_CONNECTION,
+    ):
+        if security not in ("starttls", "ssl", "none"):
+            raise ValueError(f"SMTP_SECURITY must be starttls, ssl or none, not {security!r}")
+        self.host = host
+        self.port = port
+        self.security = security
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self._idle: list[_Session] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> _Session:
+        context = ssl.create_default_context()
+        if self.security == "ssl":
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=context)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.ehlo()
+            if self.security == "starttls":
+                conn.starttls(context=context)
+                conn.ehlo()
+            if self.username:
+                conn.login(self.username, self.password or "")
+        except BaseException:
+            conn.close()
+            raise
+        return _Session(conn)
+
+    def _checkout(self) -> tuple[_Session, bool]:
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                session = self._idle.pop()
+                if now - session.idle_since < SMTP_IDLE_SECONDS:
+                    return session, True
+                session.close()
+        return self._connect(), False
+
+    @contextmanager
+    def session(self) -> Iterator[tuple[_Session, bool]]:
+        """A session and whether it was reused; dropped if the block raises"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("No free SMTP session")
+        try:
+            session, reused = self._checkout()
+            try:
+                yield session, reused
+            except BaseException:
+                session.conn.close()
+                raise
+            if session.sent >= self.max_messages:
+                session.close()
+            else:
+                session.idle_since = time.monotonic()
+                with self._lock:
+                    self._idle.append(session)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            session.close()
+
+
+def _result(code: int, message: bytes | str, ok: tuple[int, ...]) -> dict:
+    if code in ok:
+        return {"success": True, "status_code": code}
+    if isinstance(message, bytes):
+        message = message.decode(errors="replace")
+    return {"success": False, "status_code": code, "error": f"SMTP {code}: {message}", "permanent": code >= 500}
+
+
+def _content(message: EmailMessage) -> bytes:
+    """The DATA payload: CRLF lines, leading dots doubled, terminated by CRLF.CRLF"""
+    data = _LEADING_DOT.sub(b"..", message.as_bytes(policy=SMTP_POLICY))
+    if not data.endswith(b"\r\n"):
+        data += b"\r\n"
+    return data + b".\r\n"
+
+
+def _send_pipelined(session: _Session, sender: str, messages: Sequence[EmailMessage], results: list) -> None:
+    conn = session.conn
+    carry, pending = b"", None
+    for i, message in enumerate(messages):
+        envelope = f"MAIL FROM:<{sender}>\r\nRCPT TO:<{message['To']}>\r\nDATA\r\n".encode()
+        conn.send(carry + envelope)
+        carry = b""
+        if pending is not None:
+            results[pending] = _result(*conn.getreply(), ok=(250,))
+            pending = None
+        mail, rcpt, data = conn.getreply(), conn.getreply(), conn.getreply()
+        session.sent += 1
+        if data[0] == 354 and mail[0] == 250 and rcpt[0] in (250, 251):
+            carry, pending = _content(message), i
+            continue
+        if data[0] == 354:
+            # Should not happen without a recipient; end the transaction empty
+            conn.send(b".\r\n")
+            conn.getreply()
+        results[i] = next(
+            _result(code, text, ok)
+            for (code, text), ok in ((mail, (250,)), (rcpt, (250, 251)), (data, (354,)))
+            if code not in ok
+        )
+        conn.rset()
+    if pending is not None:
+        conn.send(carry)
+        results[pending] = _result(*conn.getreply(), ok=(250,))
+
+
+def _send_lockstep(session: _Session, sender: str, messages: Sequence[EmailMessage], results: list) -> None:
+    for i, message in enumerate(messages):
+        session.sent += 1
+        try:
+            session.conn.sendmail(sender, [message["To"]], message.as_bytes(policy=SMTP_POLICY))
+            results[i] = {"success": True, "status_code": 250}
+        except smtplib.SMTPRecipientsRefused as e:
+            ((code, text),) = e.recipients.values()
+            results[i] = _result(code, text, ok=())
+        except (smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+            results[i] = _result(e.smtp_code, e.smtp_error, ok=())
+
+
+class SmtpTransport:
+    def __init__(self, pool: SmtpPool, breaker: CircuitBreaker | None = None):
+        self.pool = pool
+        self.breaker = breaker or CircuitBreaker("smtp", SMTP_BREAKER_FAILURES, SMTP_BREAKER_RESET_SECONDS)
+
+    def send_many(self, sender: str, messages: Sequence[EmailMessage]) -> list[dict]:
+        """One result per message, in order: ``{"success", "status_code"[, "error", "permanent"]}``"""
+        results: list[dict] = []
+        while len(results) < len(messages):
+            results += self._send_chunk(sender, messages[len(results) :])
+        return results
+
+    def _send_chunk(self, sender: str, messages: Sequence[EmailMessage]) -> list[dict]:
+        """Results for the first messages, as many as one session has left before its cap"""
+        if not self.breaker.allow():
+            return [{"success": False, "status_code": None, "error": "SMTP circuit open"}] * len(messages)
+        while True:
+            reused = False
+            results: list[dict | None] = [None] * min(len(messages), self.pool.max_messages)
+            try:
+                with time_external_call("smtp", "send_batch"), self.pool.session() as (session, reused):
+                    # A reused session has already sent some: only fill it up to the cap
+                    chunk = messages[: self.pool.max_messages - session.sent]
+                    results = [None] * len(chunk)
+                    if session.conn.has_extn("pipelining"):
+                        _send_pipelined(session, sender, chunk, results)
+                    else:
+                        _send_lockstep(session, sender, chunk, results)
+            except (smtplib.SMTPException, OSError) as e:
+                if reused and isinstance(e, (smtplib.SMTPServerDisconnected, ConnectionError)) and not any(results):
+                    # The server closed the idle session: nothing was sent, use a new one
+                    continue
+                logger.warning("SMTP batch interrupted after %d of %d: %s", sum(map(bool, results)), len(results), e)
+                self.breaker.record_failure()
+                error = {"success": False, "status_code": None, "error": str(e) or type(e).__name__}
+                return [r or error for r in results]
+            self.breaker.record_success()
+            EMAIL_BATCH_RECIPIENTS.observe(len(results))
+            return results
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+@lru_cache(maxsize=1)
+def get_smtp_transport() -> SmtpTransport:
+    """The process-wide transport (created on first use, after workers fork)"""
+    return SmtpTransport(
+        SmtpPool(SMTP_HOST, SMTP_PORT, SMTP_SECURITY, SMTP_USERNAME, SMTP_PASSWORD)
+    )
@@ -0,0 +1,93 @@
+"""Email outbox throughput against the fake SendGrid or the SMTP sink (benchmarks/)
+
+    python benchmarks/email_throughput.py [--backend sendgrid|smtp] [--emails 2000]
+        [--latency 0.05] [--database-url URL]
+
+Enqueues ``--emails`` consultation confirmations and drains the outbox
+twice. With SendGrid: one recipient per API call (how every email used to
+go out), then batched per template. With SMTP: a new session per email in
+lock-step, then pooled sessions with pipelining. Prints emails/s, requests
+(or round trips) and connections opened for each. ``--latency`` is the
+fake's time per request or round trip; SendGrid's is typically 50-300 ms.
+Without --database-url a scratch SQLite database is used.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fake_sendgrid import FakeSendGrid
+from smtp_sink import SmtpSink
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["sendgrid", "smtp"], default="sendgrid")
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per request or round trip")
+    parser.add_argument("--database-url", help="Database with the email_outbox table (default: scratch SQLite)")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp.name}/outbox.db"
+    os.environ["OUTBOX_WORKERS"] = "0"
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+    # app reads DATABASE_URL at import time
+    from sqlalchemy import delete
+
+    from app.db.session import Base, SessionLocal, engine
+    from app.models.outbox import EmailOutbox
+    from app.services import outbox
+    from app.services.email import EmailService, SmtpEmailService
+    from app.services.sendgrid_transport import SENDGRID_BATCH_SIZE, SendGridTransport
+    from app.services.smtp_transport import SmtpPool, SmtpTransport
+
+    if not args.database_url:
+        Base.metadata.create_all(bind=engine, tables=[EmailOutbox.__table__])
+
+    def enqueue():
+        db = SessionLocal()
+        db.execute(delete(EmailOutbox))
+        for i in range(args.emails):
+            details = {"scheduled_at": scheduled_at.isoformat(), "specialty": "GP", "jitsi_room_url": ""}
+            outbox.enqueue_email(
+                db, "consultation_confirmation", f"patient{i}@example.com", full_name=f"Patient {i}", consultation=details
+            )
+        db.commit()
+        db.close()
+
+    def run(label, service, server, counter):
+        enqueue()
+        requests, connections = getattr(server, counter), server.connections
+        start = time.perf_counter()
+        outcomes = outbox.drain(service=service)
+        elapsed = time.perf_counter() - start
+        service.transport.close()
+        print(
+            f"{label:>16}: {args.emails} emails in {elapsed:.2f}s ({args.emails / elapsed:.0f}/s), "
+            f"{getattr(server, counter) - requests} {counter}, {server.connections - connections} connections, "
+            f"{outcomes}"
+        )
+
+    scheduled_at = datetime.utcnow() + timedelta(days=1)
+    if args.backend == "sendgrid":
+        with FakeSendGrid(latency=args.latency) as fake:
+            for label, batch_size in (("one per request", 1), ("batched", SENDGRID_BATCH_SIZE)):
+                transport = SendGridTransport("fake-key", base_url=fake.url, batch_size=batch_size)
+                run(label, EmailService(transport), fake, "requests")
+    else:
+        with SmtpSink(latency=args.latency, username="bench", password="bench") as sink:
+            for label, pipelining, max_messages in (("session per email", False, 1), ("pooled, pipelined", True, 100)):
+                sink.pipelining = pipelining
+                pool = SmtpPool("127.0.0.1", sink.port, "none", "bench", "bench", max_messages=max_messages)
+                run(label, SmtpEmailService(SmtpTransport(pool)), sink, "flights")
+    tmp.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Local stand-in for SendGrid's ``POST /v3/mail/send``, for offline tests and benchmarks
+
+    python benchmarks/fake_sendgrid.py [--port 8025] [--latency 0.05]
+
+then run the app or ``python -m app.cli email-outbox`` with
+``SENDGRID_BASE_URL=http://127.0.0.1:8025`` and any ``SENDGRID_API_KEY``.
+
+It speaks HTTP/1.1 keep-alive and answers 202 like SendGrid, after
+``latency`` seconds. It checks what SendGrid checks up front (a bearer key,
+a template, 1-1000 personalizations with a recipient each) and answers 400
+otherwise, also for any recipient on ``invalid.example``. ``fail_next()``
+queues status codes for the next requests (outages, 429s) and
+``drop_connections()`` closes kept-alive connections.
+"""
+
+import argparse
+import json
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_PERSONALIZATIONS = 1000
+INVALID_DOMAIN = "invalid.example"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections += 1
+            self.server.fake.sockets.append(self.connection)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, errors: list[str] | None = None) -> None:
+        body = json.dumps({"errors": [{"message": m} for m in errors]}).encode() if errors else b""
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        if body:
+            self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        fake = self.server.fake
+        payload = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if fake.latency:
+            time.sleep(fake.latency)
+        with fake.lock:
+            fake.requests += 1
+            status = fake.failures.popleft() if fake.failures else None
+        if status is not None:
+            return self._reply(status, [f"injected {status}"])
+        if self.path != "/v3/mail/send":
+            return self._reply(404, ["not found"])
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._reply(401, ["missing API key"])
+        try:
+            message = json.loads(payload)
+            personalizations = message["personalizations"]
+            recipients = [to["email"] for p in personalizations for to in p["to"]]
+            assert message["template_id"] and 1 <= len(personalizations) <= MAX_PERSONALIZATIONS
+        except (ValueError, KeyError, TypeError, AssertionError):
+            return self._reply(400, ["invalid message"])
+        if any(r.endswith("@" + INVALID_DOMAIN) for r in recipients):
+            return self._reply(400, ["invalid recipient"])
+
+        with fake.lock:
+            fake.batches.append(len(personalizations))
+            fake.messages.extend(
+                {"to": r, "template_id": message["template_id"], "data": p.get("dynamic_template_data", {})}
+                for p in personalizations
+                for r in [to["email"] for to in p["to"]]
+            )
+        self._reply(202)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeSendGrid"
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out hang up before the reply
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeSendGrid:
+    def __init__(self, port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.batches: list[int] = []
+        self.messages: list[dict] = []
+        self.failures: deque[int] = deque()
+        self.sockets: list[socket.socket] = []
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.fake = self
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, *statuses: int) -> None:
+        with self.lock:
+            self.failures.extend(statuses)
+
+    def drop_connections(self) -> None:
+        """Close every open connection, as a server does with idle keep-alive ones"""
+        with self.lock:
+            sockets, self.sockets = self.sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def start(self) -> "FakeSendGrid":
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeSendGrid":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per request")
+    args = parser.parse_args(argv)
+
+    fake = FakeSendGrid(args.port, args.latency)
+    print(f"Fake SendGrid on {fake.url} (Ctrl+C to stop)")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"{fake.requests} requests, {len(fake.messages)} emails, {fake.connections} connections")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,414 @@
+"""HTTP load test with a latency-regression check against a stored baseline
+
+    python benchmarks/loadtest.py --database-url URL [--duration 60] [--concurrency 32]
+        [--workers 4] [--json results.json] [--baseline benchmarks/baseline.json]
+        [--save-baseline benchmarks/baseline.json]
+    python benchmarks/loadtest.py --base-url https://staging.example --admin-email ... --admin-password ...
+
+Drives a weighted mix of the clinic's hot paths with concurrent clients:
+
+    booking               POST /consultations/public/book (new patient each time)
+    doctor_patients       GET  /doctor/patients (random page, reported per sort)
+    doctor_consultations  GET  /doctor/consultations?day=...
+    admin_calendar        GET  /admin/consultations?day=...
+    history_edit          PUT  /doctor/patients/{id}/history/{record_id}
+    pdf_export            GET  /pdf/patients/{id}/history/pdf
+
+With --database-url the app is started here (uvicorn, rate limiting off, an
+IT admin for the calendar). Load the database with
+``python -m app.cli generate-dataset`` first: its doctors are the logged-in
+users. With --base-url an already running deployment is tested instead.
+
+Throughput and p50/p95/p99 are reported per endpoint; requests during the
+warm-up are not counted. Given --baseline, the run fails (exit status 1) when
+an endpoint's p95 grows by more than --p95-tolerance, its throughput drops by
+more than --rps-tolerance, or its error rate exceeds --max-error-rate.
+Compare runs from the same machine, dataset and options only.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import secrets
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from pathlib import Path
+
+import httpx
+
+from startup import spawn_server, wait_ready
+
+API = "/api/v1"
+# app.db.dataset.DATASET_PASSWORD: the password of generated doctors
+DATASET_PASSWORD = "LoadTest123!"
+DEFAULT_MIX = {
+    "booking": 1,
+    "doctor_patients": 4,
+    "doctor_consultations": 3,
+    "admin_calendar": 2,
+    "history_edit": 1,
+    "pdf_export": 0.5,
+}
+
+
+@dataclass
+class Context:
+    """What the scenarios pick from, discovered before the run"""
+
+    doctor_tokens: list[str]
+    admin_token: str | None
+    doctors: list[dict]
+    patient_ids: list[int]
+    records: list[tuple[int, int]]
+    days: list[str]
+    total_patients: int
+
+
+@dataclass
+class Endpoint:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: dict[str, int] = field(default_factory=dict)
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post(f"{API}/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def discover(client: httpx.AsyncClient, args: argparse.Namespace) -> Context:
+    response = await client.get(f"{API}/consultations/public/doctors")
+    response.raise_for_status()
+    doctors = response.json()
+    tokens = []
+    for doctor in doctors:
+        if len(tokens) == args.doctors:
+            break
+        try:
+            tokens.append(await _login(client, f"doctor{doctor['id']}@loadtest.example.com", args.doctor_password))
+        except httpx.HTTPStatusError:
+            continue  # not a generated doctor
+    if not tokens:
+        raise SystemExit("No generated doctor could log in: run `python -m app.cli generate-dataset` first")
+
+    admin_token = None
+    if args.admin_email and args.admin_password:
+        admin_token = await _login(client, args.admin_email, args.admin_password)
+
+    headers = _auth(tokens[0])
+    response = await client.get(
+        f"{API}/doctor/patients", params={"limit": 500, "sort": "created_at", "order": "desc"}, headers=headers
+    )
+    response.raise_for_status()
+    patient_ids = [p["id"] for p in response.json()]
+    total_patients = int(response.headers.get("X-Total-Count", len(patient_ids)))
+
+    records = []
+    for patient_id in patient_ids[:50]:
+        history = await client.get(f"{API}/doctor/patients/{patient_id}/history", headers=headers)
+        records += [(patient_id, r["id"]) for r in history.json()] if history.status_code == 200 else []
+
+    days = set()
+    for token in tokens:
+        response = await client.get(f"{API}/doctor/consultations", params={"limit": 200}, headers=_auth(token))
+        days |= {c["scheduled_at"][:10] for c in response.json()} if response.status_code == 200 else set()
+
+    return Context(
+        doctor_tokens=tokens,
+        admin_token=admin_token,
+        doctors=doctors,
+        patient_ids=patient_ids,
+        records=records,
+        days=sorted(days) or [date.today().isoformat()],
+        total_patients=total_patients,
+    )
+
+
+# Scenarios: (endpoint label, method, path, request kwargs)
+
+
+def booking(ctx: Context, rng: random.Random):
+    doctor = rng.choice(ctx.doctors)
+    scheduled_at = datetime.combine(date.today(), datetime.min.time()) + timedelta(
+        days=rng.randint(1, 60), hours=rng.randint(8, 19)
+    )
+    payload = {
+        "doctor_id": doctor["id"],
+        "patient": {"full_name": "Load Test", "email": f"lt-{secrets.token_hex(8)}@loadtest.example.com"},
+        "specialty": doctor.get("specialty") or "Medicina General",
+        "reason_for_visit": "Consulta de seguimiento",
+        "scheduled_at": scheduled_at.isoformat(),
+    }
+    return "POST /consultations/public/book", "POST", f"{API}/consultations/public/book", {"json": payload}
+
+
+def doctor_patients(ctx: Context, rng: random.Random):
+    pages = max(1, min(ctx.total_patients // 50, 200))
+    params = {
+        "limit": 50,
+        "offset": 50 * rng.randrange(pages),
+        "sort": rng.choice(["name", "created_at", "latest_record"]),
+    }
+    headers = _auth(rng.choice(ctx.doctor_tokens))
+    # Sorts run different plans: report them separately
+    label = f"GET /doctor/patients?sort={params['sort']}"
+    return label, "GET", f"{API}/doctor/patients", {"params": params, "headers": headers}
+
+
+def doctor_consultations(ctx: Context, rng: random.Random):
+    kwargs = {"params": {"day": rng.choice(ctx.days)}, "headers": _auth(rng.choice(ctx.doctor_tokens))}
+    return "GET /doctor/consultations", "GET", f"{API}/doctor/consultations", kwargs
+
+
+def admin_calendar(ctx: Context, rng: random.Random):
+    kwargs = {"params": {"day": rng.choice(ctx.days)}, "headers": _auth(ctx.admin_token)}
+    return "GET /admin/consultations", "GET", f"{API}/admin/consultations", kwargs
+
+
+def history_edit(ctx: Context, rng: random.Random):
+    patient_id, record_id = rng.choice(ctx.records)
+    kwargs = {
+        "json": {"plan": f"Control en {rng.randint(1, 8)} semanas."},
+        "headers": _auth(rng.choice(ctx.doctor_tokens)),
+    }
+    path = f"{API}/doctor/patients/{patient_id}/history/{record_id}"
+    return "PUT /doctor/patients/{id}/history/{record_id}", "PUT", path, kwargs
+
+
+def pdf_export(ctx: Context, rng: random.Random):
+    path = f"{API}/pdf/patients/{rng.choice(ctx.patient_ids)}/history/pdf"
+    return "GET /pdf/patients/{id}/history/pdf", "GET", path, {"headers": _auth(rng.choice(ctx.doctor_tokens))}
+
+
+SCENARIOS = {
+    "booking": booking,
+    "doctor_patients": doctor_patients,
+    "doctor_consultations": doctor_consultations,
+    "admin_calendar": admin_calendar,
+    "history_edit": history_edit,
+    "pdf_export": pdf_export,
+}
+
+
+def _usable(name: str, ctx: Context) -> bool:
+    if name == "admin_calendar":
+        return ctx.admin_token is not None
+    if name == "history_edit":
+        return bool(ctx.records)
+    if name == "pdf_export":
+        return bool(ctx.patient_ids)
+    return True
+
+
+async def run_load(client: httpx.AsyncClient, ctx: Context, mix: dict[str, float], args) -> dict[str, Endpoint]:
+    names = [name for name, weight in mix.items() if weight > 0 and _usable(name, ctx)]
+    skipped = sorted(set(n for n, w in mix.items() if w > 0) - set(names))
+    if skipped:
+        print(f"Skipping (no data or credentials): {', '.join(skipped)}", file=sys.stderr)
+    cum_weights = list(accumulate(mix[name] for name in names))
+    endpoints: dict[str, Endpoint] = {}
+    start = time.perf_counter()
+    measure_from = start + args.warmup
+    deadline = measure_from + args.duration
+
+    async def worker(seed: int):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, cum_weights=cum_weights)[0]
+            label, method, path, kwargs = SCENARIOS[name](ctx, rng)
+            sent = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                outcome = str(response.status_code)
+                failed = response.status_code >= 400
+            except httpx.HTTPError as exc:
+                outcome, failed = type(exc).__name__, True
+            finished = time.perf_counter()
+            if sent < measure_from:
+                continue
+            endpoint = endpoints.setdefault(label, Endpoint())
+            endpoint.latencies.append(finished - sent)
+            endpoint.errors += failed
+            endpoint.statuses[outcome] = endpoint.statuses.get(outcome, 0) + 1
+
+    await asyncio.gather(*(worker(args.seed + i) for i in range(args.concurrency)))
+    return endpoints
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return math.nan
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(endpoints: dict[str, Endpoint], duration: float) -> dict:
+    def stats(latencies: list[float], errors: int, statuses: dict[str, int]) -> dict:
+        ordered = sorted(latencies)
+        return {
+            "requests": len(ordered),
+            "errors": errors,
+            "error_rate": round(errors / len(ordered), 4) if ordered else 0.0,
+            "rps": round(len(ordered) / duration, 2),
+            "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+            "statuses": dict(sorted(statuses.items())),
+        }
+
+    results = {label: stats(e.latencies, e.errors, e.statuses) for label, e in sorted(endpoints.items())}
+    everything = [latency for e in endpoints.values() for latency in e.latencies]
+    total_statuses: dict[str, int] = {}
+    for e in endpoints.values():
+        for status, count in e.statuses.items():
+            total_statuses[status] = total_statuses.get(status, 0) + count
+    results["total"] = stats(everything, sum(e.errors for e in endpoints.values()), total_statuses)
+    return results
+
+
+def compare(results: dict, baseline: dict, args) -> list[str]:
+    """Regressions of ``results`` against ``baseline`` (both ``summarize`` output)"""
+    failures = []
+    print(f"\n{'endpoint':<48} {'p95 base':>9} {'p95 now':>9} {'rps base':>9} {'rps now':>9}")
+    for label, now in results.items():
+        if now["error_rate"] > args.max_error_rate:
+            failures.append(f"{label}: error rate {now['error_rate']:.2%} > {args.max_error_rate:.2%}")
+        base = baseline.get(label)
+        if base is None:
+            continue
+        print(f"{label:<48} {base['p95_ms']:>9} {now['p95_ms']:>9} {base['rps']:>9} {now['rps']:>9}")
+        p95_limit = base["p95_ms"] * (1 + args.p95_tolerance)
+        if now["p95_ms"] > p95_limit and now["p95_ms"] - base["p95_ms"] >= args.min_delta_ms:
+            failures.append(f"{label}: p95 {now['p95_ms']} ms > {p95_limit:.1f} ms (baseline {base['p95_ms']})")
+        if now["rps"] < base["rps"] * (1 - args.rps_tolerance):
+            failures.append(f"{label}: {now['rps']} req/s < baseline {base['rps']} req/s")
+    return failures
+
+
+def _print(results: dict) -> None:
+    print(f"{'endpoint':<48} {'req':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, s in results.items():
+        print(
+            f"{label:<48} {s['requests']:>7} {s['errors']:>5} {s['rps']:>8} "
+            f"{s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8}"
+        )
+
+
+def _parse_mix(spec: str | None) -> dict[str, float]:
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, (spec or "").split(",")):
+        name, _, weight = item.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+async def _run(args: argparse.Namespace, base_url: str) -> dict:
+    # Drop idle connections before uvicorn does (--timeout-keep-alive, 5s by
+    # default): reusing one it just closed fails the request
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency, keepalive_expiry=4
+    )
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        ctx = await discover(client, args)
+        print(
+            f"{len(ctx.doctor_tokens)} doctors, {ctx.total_patients} patients, {len(ctx.records)} records, "
+            f"{len(ctx.days)} days; {args.concurrency} clients for {args.duration}s after {args.warmup}s warm-up",
+            file=sys.stderr,
+        )
+        endpoints = await run_load(client, ctx, _parse_mix(args.mix), args)
+    return summarize(endpoints, args.duration)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--base-url", help="Test a running deployment")
+    target.add_argument("--database-url", help="Start the app here against this database")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when starting the app")
+    parser.add_argument("--duration", type=float, default=60, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds before measuring starts")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout (s)")
+    parser.add_argument("--mix", help="Scenario weights, e.g. booking=2,pdf_export=0")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--doctors", type=int, default=20, help="Distinct doctors to log in as")
+    parser.add_argument("--doctor-password", default=DATASET_PASSWORD)
+    parser.add_argument("--admin-email")
+    parser.add_argument("--admin-password")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Fail on regressions against this results file")
+    parser.add_argument("--save-baseline", help="Write the results as the new baseline")
+    parser.add_argument("--p95-tolerance", type=float, default=0.2, help="Allowed relative p95 growth")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="Ignore smaller p95 changes")
+    parser.add_argument("--rps-tolerance", type=float, default=0.2, help="Allowed relative throughput drop")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        database_url = args.database_url or os.getenv("DATABASE_URL")
+        if not database_url:
+            parser.error("pass --base-url or --database-url")
+        args.admin_email = args.admin_email or "loadtest-admin@loadtest.example.com"
+        # Startup creates this IT admin once; later runs log in with the same password
+        args.admin_password = args.admin_password or DATASET_PASSWORD
+        env = {
+            **os.environ,
+            "DATABASE_URL": database_url,
+            "RATE_LIMIT_ENABLED": "0",
+            "IT_ADMIN_EMAIL": args.admin_email,
+            "IT_ADMIN_PASSWORD": args.admin_password,
+        }
+        server, base_url = spawn_server(env, "--workers", str(args.workers))
+    try:
+        if server:
+            wait_ready(server, base_url)
+        results = asyncio.run(_run(args, base_url))
+    finally:
+        if server:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    _print(results)
+    document = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "mix": _parse_mix(args.mix),
+        },
+        "endpoints": results,
+    }
+    for path in filter(None, (args.json, args.save_baseline)):
+        Path(path).write_text(json.dumps(document, indent=2) + "\n")
+
+    if args.baseline:
+        failures = compare(results, json.loads(Path(args.baseline).read_text())["endpoints"], args)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 1 if results["total"]["error_rate"] > args.max_error_rate else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""Local SMTP server that accepts and keeps every message, for offline tests and benchmarks
+
+    python benchmarks/smtp_sink.py [--port 8026] [--latency 0.05] [--username U --password P]
+
+then run the app or ``python -m app.cli email-outbox`` with
+``EMAIL_BACKEND=smtp SMTP_HOST=127.0.0.1 SMTP_PORT=8026 SMTP_SECURITY=none``.
+
+It speaks enough ESMTP for a mail client: EHLO (advertising PIPELINING and,
+with credentials, AUTH PLAIN/LOGIN), MAIL, RCPT, DATA, RSET, NOOP and QUIT.
+Recipients on ``invalid.example`` are refused with 550, and
+``drop_connections()`` closes open sessions. ``latency`` is
+slept once per batch of bytes received, like a network round trip, so
+pipelined commands cost one delay where lock-step ones cost one each.
+"""
+
+import argparse
+import base64
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+INVALID_DOMAIN = "invalid.example"
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "_Server"
+
+    def setup(self):
+        self.sink = self.server.sink
+        self.buffer = b""
+        self.replies = b""
+        with self.sink.lock:
+            self.sink.connections += 1
+            self.sink.sockets.append(self.request)
+
+    def _reply(self, *lines: str) -> None:
+        out = [f"{line[:3]}-{line[4:]}" for line in lines[:-1]] + [lines[-1]]
+        self.replies += "".join(f"{line}\r\n" for line in out).encode()
+
+    def _readline(self) -> bytes | None:
+        while b"\r\n" not in self.buffer:
+            # Replies to pipelined commands go out together once they are all read
+            if self.replies:
+                self.request.sendall(self.replies)
+                self.replies = b""
+            data = self.request.recv(65536)
+            if not data:
+                return None
+            with self.sink.lock:
+                self.sink.flights += 1
+            if self.sink.latency:
+                time.sleep(self.sink.latency)
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b"\r\n", 1)
+        return line
+
+    def _read_data(self) -> bytes | None:
+        lines = []
+        while (line := self._readline()) != b".":
+            if line is None:
+                return None
+            lines.append(line[1:] if line.startswith(b".") else line)
+        return b"\r\n".join(lines) + b"\r\n"
+
+    def handle(self):
+        sink = self.sink
+        authenticated = sink.username is None
+        sender, recipients = None, []
+        self._reply("220 smtp-sink ESMTP")
+        while (line := self._readline()) is not None:
+            command, _, argument = line.decode(errors="replace").partition(" ")
+            command = command.upper()
+            if command == "EHLO":
+                extensions = ["8BITMIME", "SIZE 10485760"]
+                if sink.pipelining:
+                    extensions.append("PIPELINING")
+                if sink.username is not None:
+                    extensions.append("AUTH PLAIN LOGIN")
+                self._reply("250 smtp-sink", *[f"250 {e}" for e in extensions])
+            elif command == "HELO":
+                self._reply("250 smtp-sink")
+            elif command == "AUTH":
+                authenticated = self._auth(argument)
+            elif command in ("MAIL", "RCPT", "DATA") and not authenticated:
+                self._reply("530 5.7.0 Authentication required")
+            elif command == "MAIL":
+                sender, recipients = argument.partition(":")[2].split(" ")[0].strip("<>"), []
+                self._reply("250 2.1.0 OK")
+            elif command == "RCPT":
+                recipient = argument.partition(":")[2].strip().strip("<>")
+                if sender is None:
+                    self._reply("503 5.5.1 MAIL first")
+                elif recipient.endswith("@" + INVALID_DOMAIN):
+                    self._reply("550 5.1.1 No such user")
+                else:
+                    recipients.append(recipient)
+                    self._reply("250 2.1.5 OK")
+            elif command == "DATA":
+                if not recipients:
+                    self._reply("554 5.5.1 No valid recipients")
+                    continue
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = self._read_data()
+                if data is None:
+                    return
+                with sink.lock:
+                    sink.messages.append((sender, recipients, data))
+                sender, recipients = None, []
+                self._reply("250 2.0.0 Queued")
+            elif command == "RSET":
+                sender, recipients = None, []
+                self._reply("250 2.0.0 OK")
+            elif command == "NOOP":
+                self._reply("250 2.0.0 OK")
+            elif command == "QUIT":
+                self._reply("221 2.0.0 Bye")
+                self.request.sendall(self.replies)
+                return
+            else:
+                self._reply("502 5.5.2 Command not recognized")
+
+    def _auth(self, argument: str) -> bool:
+        mechanism, _, initial = argument.partition(" ")
+        if mechanism.upper() == "PLAIN":
+            if not initial:
+                self._reply("334 ")
+                initial = (self._readline() or b"").decode()
+            _, username, password = base64.b64decode(initial).decode().split("\0")
+        elif mechanism.upper() == "LOGIN":
+            self._reply("334 " + base64.b64encode(b"Username:").decode())
+            username = base64.b64decode(self._readline() or b"").decode()
+            self._reply("334 " + base64.b64encode(b"Password:").decode())
+            password = base64.b64decode(self._readline() or b"").decode()
+        else:
+            self._reply("504 5.5.4 Unrecognized authentication type")
+            return False
+        if (username, password) != (self.sink.username, self.sink.password):
+            self._reply("535 5.7.8 Authentication credentials invalid")
+            return False
+        with self.sink.lock:
+            self.sink.logins += 1
+        self._reply("235 2.7.0 Authentication successful")
+        return True
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    sink: "SmtpSink"
+
+
+class SmtpSink:
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.0,
+        username: str | None = None,
+        password: str | None = None,
+        pipelining: bool = True,
+    ):
+        self.latency = latency
+        self.username = username
+        self.password = password
+        self.pipelining = pipelining
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.flights = 0
+        # (envelope sender, recipients, raw message)
+        self.messages: list[tuple[str, list[str], bytes]] = []
+        self.sockets: list[socket.socket] = []
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.sink = self
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def drop_connections(self) -> None:
+        """Close every open session, as servers do with idle ones"""
+        with self.lock:
+            sockets, self.sockets = self.sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def start(self) -> "SmtpSink":
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "SmtpSink":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8026)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per round trip")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--no-pipelining", action="store_true")
+    args = parser.parse_args(argv)
+
+    sink = SmtpSink(args.port, args.latency, args.username, args.password, not args.no_pipelining)
+    print(f"SMTP sink on 127.0.0.1:{sink.port} (Ctrl+C to stop)")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"{len(sink.messages)} messages, {sink.connections} connections, {sink.logins} logins")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Startup benchmark: cold import time of ``app.main`` and boot-to-ready time
+
+    python benchmarks/startup.py [--runs 5] [--database-url URL] [--json out.json]
+                                 [--max-import-ms N] [--max-boot-ms N] [--importtime]
+
+Every measurement uses a fresh interpreter, as a rolling restart or a newly
+scaled worker would:
+
+* import: ``import app.main`` (interpreter start-up excluded)
+* boot: from spawning ``uvicorn app.main:app`` until ``/api/health`` answers,
+  i.e. import + startup event + first request
+
+Without --database-url a scratch SQLite database is used. Point it at a
+migrated PostgreSQL database to measure what production sees. The thresholds
+exit with status 1 when the median is slower, for use in CI.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+BOOT_TIMEOUT = 60
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env: dict) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def spawn_server(env: dict, *uvicorn_args: str) -> tuple[subprocess.Popen, str]:
+    """Start ``uvicorn app.main:app`` on a free port; returns it and its base URL"""
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning", *uvicorn_args],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return server, f"http://127.0.0.1:{port}"
+
+
+def wait_ready(server: subprocess.Popen, base_url: str, timeout: float = BOOT_TIMEOUT) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/health", timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError(f"not ready after {timeout}s")
+
+
+def measure_boot(env: dict) -> float:
+    start = time.perf_counter()
+    server, base_url = spawn_server(env)
+    try:
+        wait_ready(server, base_url)
+        return time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def slowest_imports(env: dict, limit: int = 15) -> list[tuple[int, str]]:
+    """Modules with the largest cumulative import time (microseconds)"""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        rows.append((int(cumulative), module.rstrip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def _summary(samples: list[float]) -> dict:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+        "runs": len(samples),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", help="Database to boot against (default: scratch SQLite)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-boot-ms", type=float)
+    parser.add_argument("--importtime", action="store_true", help="List the slowest imports")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": args.database_url or f"sqlite:///{tmp}/startup.db"}
+        # The first boot creates the scratch schema: keep it out of the samples
+        measure_boot(env)
+        results = {
+            "import": _summary([measure_import(env) for _ in range(args.runs)]),
+            "boot": _summary([measure_boot(env) for _ in range(args.runs)]),
+        }
+        slowest = slowest_imports(env) if args.importtime else []
+
+    for name, stats in results.items():
+        print(f"{name:>6}: median {stats['median_ms']} ms (min {stats['min_ms']}, max {stats['max_ms']})")
+    for cumulative, module in slowest:
+        print(f"{cumulative / 1000:9.1f} ms  {module}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2) + "\n")
+
+    failed = False
+    for name, limit in (("import", args.max_import_ms), ("boot", args.max_boot_ms)):
+        if limit is not None and results[name]["median_ms"] > limit:
+            print(f"{name} median {results[name]['median_ms']} ms exceeds {limit} ms", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
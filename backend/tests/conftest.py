@@ -0,0 +1,85 @@
+import os
+
+# Every app module reads DATABASE_URL at import time: point it at a throwaway
+# database before anything from ``app`` is imported.
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", "sqlite:///./test_suite.db")
+# Tests deliver outbox emails, reminders and PDF exports explicitly
+# (outbox.drain, reminders.run_once, pdf_exports.drain)
+os.environ["OUTBOX_WORKERS"] = "0"
+os.environ["REMINDER_WORKERS"] = "0"
+os.environ["PDF_EXPORT_WORKERS"] = "0"
+
+from contextlib import ExitStack  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete, func, select  # noqa: E402
+
+from app.api.auth import get_current_user  # noqa: E402
+from app.db.query_stats import assert_max_queries  # noqa: E402
+from app.db.session import Base, SessionLocal, async_engine, async_replica_engine, engine  # noqa: E402
+from app.models import consultation, history, key_rotation, outbox, pdf_export, template, user  # noqa: E402,F401
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    if engine.url.get_backend_name() == "sqlite" and engine.url.database:
+        os.remove(engine.url.database)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def fresh_async_pool():
+    """Each module's TestClient runs its own event loop, and asyncpg connections
+    cannot move between loops: start every module with an empty async pool."""
+    yield
+    for async_eng in {async_engine, async_replica_engine}:
+        async_eng.sync_engine.dispose(close=False)
+
+
+@pytest.fixture
+def query_budget():
+    """Assert an endpoint's statement budget: ``with query_budget(2): client.get(...)``"""
+    return assert_max_queries
+
+
+@pytest.fixture(scope="module")
+def api_client():
+    """``api_client(router, prefix, user)``: a TestClient on an app with just that
+    router, signed in as ``user`` (None keeps the real token check). More routers
+    go in ``mounts`` as ``{prefix: router}``; the clients close with the module."""
+    with ExitStack() as clients:
+
+        def make(router, prefix, user=None, *, mounts=None, exception_handlers=None):
+            app = FastAPI(exception_handlers=exception_handlers)
+            for mount_prefix, mount_router in {prefix: router, **(mounts or {})}.items():
+                app.include_router(mount_router, prefix=mount_prefix)
+            if user is not None:
+                app.dependency_overrides[get_current_user] = lambda: user
+            return clients.enter_context(TestClient(app))
+
+        yield make
+
+
+@pytest.fixture
+def db(request):
+    """A session; rows added meanwhile (by the test or the API) are deleted afterwards.
+    ``@pytest.mark.empty_tables("table", ...)`` also starts with those tables empty."""
+    session = SessionLocal()
+    marker = request.node.get_closest_marker("empty_tables")
+    for name in marker.args if marker else ():
+        session.execute(delete(Base.metadata.tables[name]))
+    session.commit()
+    tables = [t for t in Base.metadata.sorted_tables if "id" in t.c]
+    first_ids = {t: (session.scalar(select(func.max(t.c.id))) or 0) + 1 for t in tables}
+    yield session
+    session.rollback()
+    for table in reversed(tables):
+        session.execute(delete(table).where(table.c.id >= first_ids[table]))
+    session.commit()
+    session.close()
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import insert, select, update
+
+from app.api import auth, consultations
+from app.core import rate_limit
+from app.core.rate_limit import MemoryBackend
+from app.core.security import get_password_hash
+from app.db.blind_index import backfill, blind_index
+from app.db.session import SessionLocal, engine
+from app.models.user import Patient, User
+
+
+@pytest.fixture(scope="module")
+def client(api_client):
+    rate_limit._backend = MemoryBackend()
+    return api_client(auth.router, "/auth", mounts={"/consultations": consultations.router})
+
+
+def test_digest_ignores_case_and_surrounding_spaces():
+    assert blind_index(" Ana.Garcia@Example.com ") == blind_index("ana.garcia@example.com")
+    assert blind_index("ana.garcia@example.com") != blind_index("ana.garcia@example.org")
+    assert len(blind_index("a@b.c")) == 32 and blind_index(None) is None
+
+
+def test_orm_and_core_writes_keep_the_digest_in_sync():
+    db = SessionLocal()
+    patient = Patient(full_name="Blind Orm", email="blind.orm@example.com")
+    db.add(patient)
+    db.commit()
+    assert patient.email_bidx == blind_index("blind.orm@example.com")
+
+    patient.email = "blind.renamed@example.com"
+    db.commit()
+    assert db.scalar(select(Patient.id).where(Patient.email_bidx == blind_index("Blind.Renamed@example.com")))
+
+    # Core inserts bypass @validates: the column default derives the digest
+    db.execute(insert(Patient.__table__), [{"full_name": "Blind Core", "email": "blind.core@example.com"}])
+    db.commit()
+    stored = db.scalar(select(Patient.email_bidx).where(Patient.email == "blind.core@example.com"))
+    assert stored == blind_index("blind.core@example.com")
+    db.close()
+
+
+def test_login_matches_the_address_in_any_case(client):
+    db = SessionLocal()
+    db.add(User(email="blind.login@example.com", hashed_password=get_password_hash("s3cret-pass"), full_name="L"))
+    db.commit()
+    db.close()
+
+    response = client.post("/auth/login", json={"email": "Blind.Login@Example.com", "password": "s3cret-pass"})
+    assert response.status_code == 200
+
+
+def test_public_booking_reuses_the_existing_patient(client):
+    db = SessionLocal()
+    doctor = User(email="blind.doctor@example.com", full_name="Dr. Blind", is_medical_professional=True)
+    patient = Patient(full_name="Blind Booker", email="blind.booker@example.com")
+    db.add_all([doctor, patient])
+    db.commit()
+    doctor_id, patient_id = doctor.id, patient.id
+    db.close()
+
+    payload = {
+        "doctor_id": doctor_id,
+        "patient": {"full_name": "Blind Booker", "email": "BLIND.BOOKER@example.com"},
+        "specialty": "GP",
+        "scheduled_at": "2030-01-01T10:00:00",
+    }
+    response = client.post("/consultations/public/book", json=payload)
+    assert response.status_code == 200
+    assert response.json()["consultation"]["patient_id"] == patient_id
+
+
+def test_backfill_fills_missing_digests():
+    with engine.begin() as conn:
+        conn.execute(insert(Patient.__table__), [{"full_name": "Legacy", "email": "blind.legacy@example.com"}])
+        conn.execute(update(Patient.__table__).where(Patient.email.like("blind.%")).values(email_bidx=None))
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        assert backfill(conn, Patient.__table__, "email", "email_bidx") >= 4
+        assert backfill(conn, Patient.__table__, "email", "email_bidx") == 0
+        digest = conn.scalar(select(Patient.email_bidx).where(Patient.email == "blind.legacy@example.com"))
+    assert digest == blind_index("blind.legacy@example.com")
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from pydantic import EmailStr, TypeAdapter
+from sqlalchemy import func, select
+
+from app.db.blind_index import blind_index
+from app.db.dataset import DatasetSpec, generate, patient_rows
+from app.db.encrypted import decrypt_value
+from app.db.seed import COMPLAINTS
+from app.db.session import engine
+from app.models.consultation import Consultation, Payment
+from app.models.history import ClinicalRecord
+from app.models.user import Patient, User
+
+SPEC = DatasetSpec(
+    doctors=4,
+    patients=60,
+    records=150,
+    consultations=90,
+    seed=7,
+    until=datetime(2026, 1, 1),
+    batch_size=32,
+)
+TABLES = (User, Patient, ClinicalRecord, Consultation, Payment)
+
+
+def _counts(db):
+    return {m.__tablename__: db.scalar(select(func.count()).select_from(m)) for m in TABLES}
+
+
+def test_generated_rows_are_consistent_and_usable(db):
+    before = _counts(db)
+    first_patient = (db.scalar(select(func.max(Patient.id))) or 0) + 1
+
+    progress = []
+    counts = generate(engine, SPEC, on_progress=progress.append)
+    assert counts == {
+        "users": 4,
+        "patients": 60,
+        "clinical_records": 150,
+        "consultations": 90,
+        "payments": 90,
+    }
+    assert {t: n - before[t] for t, n in _counts(db).items()} == counts
+    # Batches of 32: the last progress report per table is the total
+    assert [p.written for p in progress if p.table == "patients"] == [32, 60]
+
+    # Children only reference generated parents
+    new_patients = select(Patient.id).where(Patient.id >= first_patient)
+    orphans = select(func.count()).select_from(ClinicalRecord).where(
+        ClinicalRecord.id > before["clinical_records"],
+        ClinicalRecord.patient_id.not_in(new_patients),
+    )
+    assert db.scalar(orphans) == 0
+    unpaid = select(func.count()).select_from(Consultation).where(
+        Consultation.patient_id.in_(new_patients), ~Consultation.payment.has()
+    )
+    assert db.scalar(unpaid) == 0
+
+    # Encrypted columns hold real tokens, lookups go through the blind index
+    record = db.scalars(select(ClinicalRecord).order_by(ClinicalRecord.id.desc())).first()
+    assert record.__dict__["_chief_complaint"].startswith("gAAAAA")
+    assert record.chief_complaint in COMPLAINTS
+    patient = db.get(Patient, first_patient)
+    assert patient.email_bidx == blind_index(patient.email)
+    # Response models validate emails: reserved TLDs would fail there
+    TypeAdapter(EmailStr).validate_python(patient.email)
+    assert decrypt_value(patient.__dict__["_phone"]).startswith("6")
+
+    # Sequences continue after the explicit ids
+    db.add(Patient(full_name="After Generation", email="after.generation@example.com"))
+    db.commit()
+
+
+def test_same_seed_same_data():
+    def plaintext(spec):
+        return [(row[1], row[2], row[5]) for row in patient_rows(spec, first_id=1)]
+
+    assert plaintext(SPEC) == plaintext(SPEC)
+    assert plaintext(SPEC) != plaintext(DatasetSpec(**{**SPEC.__dict__, "seed": 8}))
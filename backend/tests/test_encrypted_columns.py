@@ -0,0 +1,113 @@
+import pytest
+from cryptography.fernet import Fernet
+from sqlalchemy import select, text
+
+from app.api import doctor
+from app.core.metrics import FIELD_DECRYPTION_FAILURES, FIELD_DECRYPTIONS
+from app.db.encrypted import Ciphertext, DecryptionFailed, decrypt_loaded, decryption_scope
+from app.db.session import SessionLocal
+from app.models.history import ClinicalRecord
+from app.models.user import Patient, User
+
+
+@pytest.fixture(scope="module")
+def patient_id():
+    db = SessionLocal()
+    patient = Patient(full_name="Encrypted Patient", email="encrypted@example.com", phone="600 111 222")
+    db.add(patient)
+    db.flush()
+    db.add_all(
+        [
+            ClinicalRecord(patient_id=patient.id, chief_complaint="Migraña", allergies="Penicilina"),
+            ClinicalRecord(patient_id=patient.id, chief_complaint="Migraña", allergies="Penicilina"),
+        ]
+    )
+    db.flush()
+    # Written before encryption was enabled
+    db.execute(
+        text(
+            "INSERT INTO clinical_records (patient_id, chief_complaint, created_at) "
+            "VALUES (:pid, 'Dolor lumbar', CURRENT_TIMESTAMP)"
+        ),
+        {"pid": patient.id},
+    )
+    db.commit()
+    pid = patient.id
+    db.close()
+    return pid
+
+
+def test_values_are_stored_encrypted(patient_id):
+    db = SessionLocal()
+    phone = db.execute(text("SELECT phone FROM patients WHERE id = :id"), {"id": patient_id}).scalar()
+    complaints = db.execute(
+        text("SELECT chief_complaint FROM clinical_records WHERE patient_id = :id ORDER BY id"), {"id": patient_id}
+    ).scalars().all()
+    assert phone.startswith("gAAAAA") and "600" not in phone
+    # Fernet is randomized: equal plaintexts do not produce equal tokens
+    assert complaints[0] != complaints[1] and complaints[2] == "Dolor lumbar"
+    db.close()
+
+
+def test_attributes_decrypt_on_access_without_dirtying_the_row(patient_id):
+    db = SessionLocal()
+    patient = db.get(Patient, patient_id)
+    assert isinstance(patient.__dict__["_phone"], Ciphertext)
+    assert patient.phone == "600 111 222"
+    assert not db.is_modified(patient)
+
+    records = db.scalars(select(ClinicalRecord).where(ClinicalRecord.patient_id == patient_id)).all()
+    assert sorted(r.chief_complaint for r in records) == ["Dolor lumbar", "Migraña", "Migraña"]
+    db.close()
+
+
+def test_batch_decrypts_each_token_once_per_request(patient_id):
+    db = SessionLocal()
+    query = select(ClinicalRecord).where(ClinicalRecord.patient_id == patient_id)
+    with decryption_scope():
+        records = db.scalars(query).all()
+        batch = FIELD_DECRYPTIONS.value(path="batch")
+        decrypt_loaded(records)
+        # Two encrypted records with two non-null fields each, plus the legacy value
+        assert FIELD_DECRYPTIONS.value(path="batch") == batch + 5
+        assert [r.allergies for r in records].count("Penicilina") == 2
+
+        db.expire_all()
+        reloaded = db.scalars(query).all()
+        lazy = FIELD_DECRYPTIONS.value(path="lazy")
+        assert sorted(r.chief_complaint for r in reloaded) == ["Dolor lumbar", "Migraña", "Migraña"]
+        assert FIELD_DECRYPTIONS.value(path="lazy") == lazy  # served from the request cache
+    db.close()
+
+
+def test_history_endpoint_returns_plaintext(patient_id, api_client):
+    client = api_client(
+        doctor.router,
+        "/doctor",
+        User(id=0, email="enc-doctor@example.com", role="specialist", is_medical_professional=True),
+    )
+    history = client.get(f"/doctor/patients/{patient_id}/history").json()
+    detail = client.get(f"/doctor/patients/{patient_id}").json()
+    assert {r["chief_complaint"] for r in history} == {"Migraña", "Dolor lumbar"}
+    assert detail["phone"] == "600 111 222"
+
+
+def test_tokens_from_an_unknown_key_fail_instead_of_leaking_ciphertext(patient_id):
+    foreign = Fernet(Fernet.generate_key()).encrypt("600 999 000".encode()).decode()
+    failures = FIELD_DECRYPTION_FAILURES.value()
+    db = SessionLocal()
+    db.execute(text("UPDATE patients SET phone = :phone WHERE id = :id"), {"phone": foreign, "id": patient_id})
+    db.commit()
+    try:
+        patient = db.get(Patient, patient_id)
+        with decryption_scope():
+            with pytest.raises(DecryptionFailed):
+                decrypt_loaded([patient])
+            with pytest.raises(DecryptionFailed):
+                patient.phone
+        assert FIELD_DECRYPTION_FAILURES.value() == failures + 2
+    finally:
+        db.rollback()
+        patient.phone = "600 111 222"
+        db.commit()
+        db.close()
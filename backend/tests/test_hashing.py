@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.api import auth
+from app.core import hashing
+from app.core.metrics import PASSWORD_HASH_REJECTED
+from app.db.session import SessionLocal
+from app.models.user import User
+
+
+def test_hashes_with_other_rounds_are_flagged_for_upgrade():
+    old = hashing.build_context(1000).hash("secret")
+    ok, new_hash = hashing._verify_and_update("secret", old, hashing.PASSWORD_HASH_ROUNDS)
+    assert ok
+    assert f"${hashing.PASSWORD_HASH_ROUNDS}$" in new_hash
+
+    current = hashing.build_context(hashing.PASSWORD_HASH_ROUNDS).hash("secret")
+    assert hashing._verify_and_update("secret", current, hashing.PASSWORD_HASH_ROUNDS) == (True, None)
+
+
+def test_full_queue_rejects_immediately(monkeypatch):
+    monkeypatch.setattr(hashing, "HASH_POOL_WORKERS", 0)
+    monkeypatch.setattr(hashing, "HASH_QUEUE_LIMIT", 1)
+    rejected = PASSWORD_HASH_REJECTED.value()
+
+    async def burst():
+        return await asyncio.gather(
+            hashing.ahash("a"), hashing.ahash("b"), return_exceptions=True
+        )
+
+    first, second = asyncio.run(burst())
+    assert first.startswith("$pbkdf2-sha256$")
+    assert isinstance(second, hashing.HashingBusy)
+    assert PASSWORD_HASH_REJECTED.value() == rejected + 1
+
+
+@pytest.fixture
+def client(api_client):
+    yield api_client(auth.router, "/auth")
+    hashing.shutdown_pool()
+
+
+def test_login_rehashes_outdated_passwords(client):
+    db = SessionLocal()
+    user = User(email="rehash@example.com", hashed_password=hashing.build_context(1000).hash("pw-123456"))
+    db.add(user)
+    db.commit()
+
+    response = client.post("/auth/login", json={"email": "rehash@example.com", "password": "pw-123456"})
+    assert response.status_code == 200, response.text
+
+    db.refresh(user)
+    assert f"${hashing.PASSWORD_HASH_ROUNDS}$" in user.hashed_password
+    db.close()
@@ -0,0 +1,119 @@
+import pytest
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from sqlalchemy import Column, Integer, MetaData, Table, insert, select
+
+from app.core import security
+from app.db import key_rotation
+from app.db.encrypted import EncryptedText
+from app.db.key_rotation import rotate_table, rotation_status
+from app.db.session import engine
+from app.models.key_rotation import KeyRotationCheckpoint
+
+OLD_KEY, NEW_KEY = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+
+# A scratch table keeps the rest of the suite's rows on the default key
+notes = Table(
+    "rotation_test_notes",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("body", EncryptedText),
+    Column("summary", EncryptedText),
+)
+
+
+def _use_keys(monkeypatch, *keys):
+    monkeypatch.setattr(security, "ENCRYPTION_KEYS", list(keys))
+    monkeypatch.setattr(security, "ENCRYPTION_KEY", keys[0])
+    monkeypatch.setattr(security, "cipher_suite", MultiFernet([Fernet(k.encode()) for k in keys]))
+    monkeypatch.setattr(security, "primary_cipher", Fernet(keys[0].encode()))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture
+def table(monkeypatch):
+    notes.create(engine)
+    _use_keys(monkeypatch, OLD_KEY)
+    with engine.begin() as conn:
+        conn.execute(insert(notes), [{"body": f"note {i}", "summary": None if i % 2 else f"s{i}"} for i in range(7)])
+        # Written before encryption was enabled: raw Text, bypassing EncryptedText
+        conn.exec_driver_sql("INSERT INTO rotation_test_notes (body) VALUES ('legacy')")
+    _use_keys(monkeypatch, NEW_KEY, OLD_KEY)
+    yield notes
+    notes.drop(engine)
+    with engine.begin() as conn:
+        conn.execute(KeyRotationCheckpoint.__table__.delete().where(KeyRotationCheckpoint.table_name == notes.name))
+
+
+def _raw_values(table):
+    with engine.connect() as conn:
+        return [v for row in conn.exec_driver_sql(f"SELECT body, summary FROM {table.name} ORDER BY id") for v in row]
+
+
+def test_rotation_moves_every_value_to_the_new_key(table):
+    clock = FakeClock()
+    progress = rotate_table(
+        engine, table, [table.c.body, table.c.summary], batch_size=3, rows_per_second=2, sleep=clock.sleep, clock=clock
+    )
+    assert progress.finished and progress.rows_scanned == 8 and progress.rows_rewritten == 8
+    assert clock.slept == pytest.approx(8 / 2)  # throttled to 2 rows/s
+
+    new_only = Fernet(NEW_KEY.encode())
+    values = [v for v in _raw_values(table) if v is not None]
+    assert sorted(new_only.decrypt(v.encode()).decode() for v in values) == sorted(
+        [f"note {i}" for i in range(7)] + ["s0", "s2", "s4", "s6", "legacy"]
+    )
+    with pytest.raises(InvalidToken):
+        Fernet(OLD_KEY.encode()).decrypt(values[0].encode())
+
+    # Finished: a second run writes nothing
+    before = _raw_values(table)
+    assert rotate_table(engine, table, [table.c.body, table.c.summary]).rows_rewritten == 8
+    assert _raw_values(table) == before
+
+
+def test_interrupted_rotation_resumes_from_its_checkpoint(table):
+    class Interrupted(Exception):
+        pass
+
+    def stop_after_first_batch(progress):
+        raise Interrupted
+
+    columns = [table.c.body, table.c.summary]
+    with pytest.raises(Interrupted):
+        rotate_table(engine, table, columns, batch_size=3, rows_per_second=1e9, on_progress=stop_after_first_batch)
+
+    status = next(s for s in rotation_status(engine) if s["table_name"] == table.name)
+    assert status["last_id"] == 3 and status["finished_at"] is None
+
+    progress = rotate_table(engine, table, columns, batch_size=3, rows_per_second=1e9)
+    assert progress.finished and progress.rows_scanned == 8
+
+
+def test_concurrent_writes_are_not_overwritten(table, monkeypatch):
+    rekeyed = key_rotation._rekeyed
+
+    def app_writes_meanwhile(value):
+        # The app updates row 1 between the job's read and its UPDATE
+        with engine.begin() as conn:
+            conn.execute(table.update().where(table.c.id == 1).values(body="edited"))
+        monkeypatch.setattr(key_rotation, "_rekeyed", rekeyed)
+        return rekeyed(value)
+
+    monkeypatch.setattr(key_rotation, "_rekeyed", app_writes_meanwhile)
+    rotate_table(engine, table, [table.c.body, table.c.summary], rows_per_second=1e9)
+
+    with engine.connect() as conn:
+        body = conn.scalar(select(table.c.body).where(table.c.id == 1))
+    assert security.cipher_suite.decrypt(body.encode()).decode() == "edited"
@@ -0,0 +1,27 @@
+from app.core.metrics import Counter, Gauge, Histogram, render
+
+
+def test_histogram_renders_cumulative_buckets():
+    latency = Histogram("test_latency_seconds", "Test latency", ["route"], buckets=(0.1, 1.0))
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(5.0, route="/a")
+
+    text = render()
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{route="/a"} 3' in text
+
+
+def test_counter_and_callback_gauge():
+    ops = Counter("test_ops_total", "Test ops", ["operation"])
+    ops.inc(operation="hash")
+    ops.inc(2, operation="hash")
+    pool = Gauge("test_pool", "Test pool", ["state"], callback=lambda: {("size",): 5})
+
+    text = render()
+    assert 'test_ops_total{operation="hash"} 3' in text
+    assert 'test_pool{state="size"} 5' in text
+    assert pool.value(state="size") == 0
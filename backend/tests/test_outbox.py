@@ -0,0 +1,186 @@
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select, update
+
+from app.api import consultations
+from app.core import rate_limit
+from app.core.metrics import EMAIL_OUTBOX_DELIVERIES
+from app.core.rate_limit import MemoryBackend
+from app.db.session import SessionLocal, engine
+from app.models.outbox import EmailOutbox, OutboxStatus
+from app.models.user import User
+from app.services import outbox
+from app.services.email import EmailService
+from app.services.sendgrid_transport import SendGridTransport
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+from fake_sendgrid import FakeSendGrid  # noqa: E402
+
+pytestmark = pytest.mark.empty_tables("email_outbox")
+
+
+class FakeEmailService:
+    """Records sends; ``results`` are returned in turn (default: success)"""
+
+    def __init__(self, *results):
+        self.sent = []
+        self.results = list(results)
+
+    def _send(self, kind, to_email, **data):
+        self.sent.append((kind, to_email, data))
+        return self.results.pop(0) if self.results else {"success": True, "status_code": 202}
+
+    def send_consultation_confirmation(self, to_email, full_name, consultation):
+        return self._send("confirmation", to_email, full_name=full_name, specialty=consultation.specialty)
+
+    def send_doctor_notification(self, to_email, full_name, consultation):
+        return self._send("doctor", to_email, full_name=full_name)
+
+    def send_password_reset_email(self, to_email, full_name, reset_token):
+        return self._send("reset", to_email, reset_token=reset_token)
+
+
+@pytest.fixture(scope="module")
+def client(api_client):
+    rate_limit._backend = MemoryBackend()
+    return api_client(consultations.router, "/consultations")
+
+
+def _enqueue(db, n=1):
+    rows = [outbox.enqueue_email(db, "password_reset", f"outbox{i}@example.com", full_name="O", reset_token="t") for i in range(n)]
+    db.commit()
+    return [row.id for row in rows]
+
+
+def _make_due(db, row_id):
+    db.execute(update(EmailOutbox).where(EmailOutbox.id == row_id).values(next_attempt_at=datetime.utcnow()))
+    db.commit()
+
+
+def test_booking_commits_emails_and_workers_deliver_them(client, db):
+    doctor = User(email="outbox.doctor@example.com", full_name="Dr. Outbox", is_medical_professional=True)
+    db.add(doctor)
+    db.commit()
+
+    payload = {
+        "doctor_id": doctor.id,
+        "patient": {"full_name": "Outbox Patient", "email": "outbox.patient@example.com"},
+        "specialty": "Dermatology",
+        "scheduled_at": "2030-01-01T10:00:00",
+    }
+    response = client.post("/consultations/public/book", json=payload)
+    assert response.status_code == 200
+
+    rows = db.scalars(select(EmailOutbox).order_by(EmailOutbox.id)).all()
+    assert [(r.kind, r.to_email, r.status) for r in rows] == [
+        ("consultation_confirmation", "outbox.patient@example.com", OutboxStatus.PENDING),
+        ("doctor_notification", "outbox.doctor@example.com", OutboxStatus.PENDING),
+    ]
+    assert rows[0].__dict__["_payload"].startswith("gAAAAA")
+
+    sent_before = EMAIL_OUTBOX_DELIVERIES.value(kind="doctor_notification", outcome="sent")
+    service = FakeEmailService()
+    assert outbox.drain(service=service) == {"sent": 2}
+    assert service.sent == [
+        ("confirmation", "outbox.patient@example.com", {"full_name": "Outbox Patient", "specialty": "Dermatology"}),
+        ("doctor", "outbox.doctor@example.com", {"full_name": "Dr. Outbox"}),
+    ]
+    db.expire_all()
+    assert [(r.status, r.attempts, r.payload) for r in rows] == [(OutboxStatus.SENT, 1, None)] * 2
+    assert EMAIL_OUTBOX_DELIVERIES.value(kind="doctor_notification", outcome="sent") == sent_before + 1
+
+
+def test_failures_back_off_then_dead_letter(db, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    (row_id,) = _enqueue(db)
+    service = FakeEmailService({"success": False, "error": "timeout"}, {"success": False, "error": "503"})
+
+    assert outbox.drain(service=service) == {"retry": 1}
+    row = db.get(EmailOutbox, row_id)
+    assert row.status == OutboxStatus.PENDING and row.last_error == "timeout"
+    assert row.next_attempt_at > datetime.utcnow() + timedelta(seconds=outbox.OUTBOX_BACKOFF_SECONDS / 2 - 1)
+    # Not due yet: nothing to do
+    assert outbox.drain(service=service) == {}
+
+    _make_due(db, row_id)
+    assert outbox.drain(service=service) == {"dead": 1}
+    db.refresh(row)
+    assert (row.status, row.attempts, row.last_error) == (OutboxStatus.DEAD, 2, "503")
+    assert row.payload is not None  # kept so it can be requeued
+
+    assert outbox.requeue_dead(db) == 1
+    assert outbox.drain(service=service) == {"sent": 1}
+    assert outbox.status_counts(db) == {"sent": 1}
+
+
+def test_rejected_messages_are_not_retried(db):
+    _enqueue(db)
+    service = FakeEmailService({"success": False, "error": "Bad Request", "status_code": 400})
+    assert outbox.drain(service=service) == {"dead": 1}
+
+    # A kind the configured service cannot send is dead at once too
+    db.add(EmailOutbox(kind="welcome", to_email="outbox.welcome@example.com", payload="{}"))
+    db.commit()
+    assert outbox.drain(service=FakeEmailService()) == {"dead": 1}
+
+
+def test_email_service_gets_the_claimed_rows_as_one_batch(db):
+    for address in ("batch1@example.com", "batch2@invalid.example", "batch3@example.com"):
+        outbox.enqueue_email(db, "password_reset", address, full_name="B", reset_token="t")
+    db.commit()
+
+    with FakeSendGrid() as fake:
+        outcomes = outbox.drain(service=EmailService(SendGridTransport("key", base_url=fake.url)))
+    assert outcomes == {"sent": 2, "dead": 1}
+    # The rejected batch of 3 was split to isolate the invalid address
+    assert sorted(m["to"] for m in fake.messages) == ["batch1@example.com", "batch3@example.com"]
+    dead = db.scalars(select(EmailOutbox).where(EmailOutbox.status == OutboxStatus.DEAD)).one()
+    assert dead.to_email == "batch2@invalid.example" and "HTTP 400" in dead.last_error
+
+
+def test_expired_lease_is_reclaimed_and_the_late_result_ignored(db):
+    _enqueue(db)
+    (first,) = outbox.claim(db)
+    assert outbox.claim(db) == []  # leased
+
+    later = datetime.utcnow() + timedelta(seconds=outbox.OUTBOX_LEASE_SECONDS + 1)
+    (second,) = outbox.claim(db, now=later)
+    assert (second.id, second.attempts) == (first.id, 2)
+    assert outbox.record(db, first, None) == "stale"
+    assert outbox.record(db, second, None) == "sent"
+    db.commit()
+
+
+def test_backoff_grows_exponentially_with_jitter_and_a_cap():
+    class Fixed:
+        def __init__(self, value):
+            self.value = value
+
+        def random(self):
+            return self.value
+
+    base = outbox.OUTBOX_BACKOFF_SECONDS
+    assert outbox.backoff(1, Fixed(1.0)) == base
+    assert outbox.backoff(3, Fixed(1.0)) == 4 * base
+    assert outbox.backoff(3, Fixed(0.0)) == 2 * base
+    assert outbox.backoff(50, Fixed(1.0)) == outbox.OUTBOX_BACKOFF_MAX_SECONDS
+
+
+@pytest.mark.skipif(engine.dialect.name == "sqlite", reason="SQLite has no row locks")
+def test_concurrent_claims_skip_locked_rows(db):
+    ids = _enqueue(db, 4)
+    holder = SessionLocal()
+    try:
+        locked = holder.scalars(
+            select(EmailOutbox.id).where(EmailOutbox.id.in_(ids[:2])).with_for_update()
+        ).all()
+        # Returns at once with the other rows instead of waiting on the lock
+        assert sorted(e.id for e in outbox.claim(db)) == ids[2:]
+        assert sorted(locked) == ids[:2]
+    finally:
+        holder.rollback()
+        holder.close()
+    assert sorted(e.id for e in outbox.claim(db)) == ids[:2]
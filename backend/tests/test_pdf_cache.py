@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import pdf_clinica
+from app.models.history import ClinicalRecord
+from app.models.user import Patient, User
+from app.services.pdf_cache import PdfCache, cache_key
+
+
+class Renders:
+    """Stands in for WeasyPrint's write_pdf and counts renders"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.count = 0
+        self.html = None
+        self.lock = threading.Lock()
+
+    def __call__(self, html_content):
+        with self.lock:
+            self.count += 1
+            self.html = html_content
+        time.sleep(self.delay)
+        return b"%PDF-1.7 " + str(self.count).encode()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = PdfCache(tmp_path / "pdfs", max_bytes=1024 * 1024)
+    monkeypatch.setattr(pdf_clinica, "get_pdf_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    renders = Renders()
+    monkeypatch.setattr(pdf_clinica, "_write_pdf", renders)
+    return renders
+
+
+@pytest.fixture
+def patient(db):
+    patient = Patient(full_name="Pdf Patient", email="pdf.patient@example.com", phone="600000000")
+    db.add(patient)
+    db.flush()
+    db.add_all(
+        [
+            ClinicalRecord(patient_id=patient.id, chief_complaint="Migraña", plan="Reposo"),
+            ClinicalRecord(patient_id=patient.id, chief_complaint="Dolor lumbar", plan="Fisioterapia"),
+        ]
+    )
+    db.commit()
+    return patient.id
+
+
+@pytest.fixture
+def client(api_client):
+    doctor = User(email="pdf.doctor@example.com", full_name="Dr. Pdf", role="specialist", is_medical_professional=True)
+    return api_client(pdf_clinica.router, "/pdf", doctor)
+
+
+def test_history_pdf_is_rendered_once_and_revalidated(client, cache, renders, patient, db):
+    url = f"/pdf/patients/{patient}/history/pdf"
+    first = client.get(url)
+    assert first.status_code == 200 and first.content == b"%PDF-1.7 1"
+    assert first.headers["content-type"] == "application/pdf"
+    assert first.headers["cache-control"] == "private, no-cache"
+    etag = first.headers["etag"]
+
+    again = client.get(url)
+    assert (again.content, again.headers["etag"], renders.count) == (first.content, etag, 1)
+
+    not_modified = client.get(url, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert renders.count == 1
+
+    # Editing a note changes the key: the old ETag no longer matches
+    record = db.query(ClinicalRecord).filter(ClinicalRecord.patient_id == patient).first()
+    record.plan = "Reposo y analgesia"
+    db.commit()
+    edited = client.get(url, headers={"If-None-Match": etag})
+    assert edited.status_code == 200 and edited.headers["etag"] != etag
+    assert renders.count == 2
+
+
+def test_cached_pdfs_are_dated_by_their_data_not_the_render(client, cache, renders, patient, db):
+    record = db.query(ClinicalRecord).filter(ClinicalRecord.patient_id == patient).first()
+    record.updated_at = datetime(2031, 3, 2, 10, 30)
+    db.commit()
+    assert client.get(f"/pdf/patients/{patient}/history/pdf").status_code == 200
+    assert "Datos actualizados el 02/03/2031 a las 10:30" in renders.html
+    assert "generado" not in renders.html.lower()
+
+
+def test_complaint_pdfs_are_keyed_by_complaint(client, cache, renders, patient):
+    base = f"/pdf/patients/{patient}/complaint"
+    migraine = client.get(f"{base}/migraña/pdf")
+    back = client.get(f"{base}/lumbar/pdf")
+    assert migraine.status_code == back.status_code == 200
+    assert migraine.headers["etag"] != back.headers["etag"]
+    assert client.get(f"{base}/MIGRAÑA/pdf").headers["etag"] == migraine.headers["etag"]
+    assert renders.count == 2
+
+    # Nothing to render is not cached
+    assert client.get(f"{base}/fiebre/pdf").status_code == 404
+    assert client.get(f"{base}/fiebre/pdf").status_code == 404
+    assert len(os.listdir(cache.directory)) == 2
+
+
+def test_concurrent_identical_requests_share_one_render(cache):
+    renders = Renders(delay=0.2)
+    results = []
+
+    def request():
+        results.append(cache.get_or_render("k", lambda: renders("<html>")))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert renders.count == 1
+    assert sorted(outcome for _, outcome in results) == ["miss"] + ["shared"] * 7
+    assert {path for path, _ in results} == {cache.path("k")}
+
+
+def test_a_failed_render_reaches_every_waiter_and_is_retried(cache):
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise HTTPException(status_code=404)
+
+    errors = []
+
+    def follower():
+        started.wait()
+        try:
+            cache.get_or_render("k", lambda: b"never")
+        except HTTPException as e:
+            errors.append(e.status_code)
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    with pytest.raises(HTTPException):
+        cache.get_or_render("k", failing)
+    thread.join()
+    assert errors == [404]
+    assert cache.get_or_render("k", lambda: b"%PDF") == (cache.path("k"), "miss")
+
+
+def test_least_recently_used_pdfs_are_evicted(tmp_path):
+    cache = PdfCache(tmp_path, max_bytes=350)
+    for i, key in enumerate("abc"):
+        cache.put(key, b"x" * 100)
+        os.utime(cache.path(key), (1000 + i, 1000 + i))
+    cache._rescan()
+    assert cache.get("a") is not None  # now the most recently used
+
+    cache.put("d", b"x" * 100)
+    assert sorted(p.stem for p in tmp_path.glob("*.pdf")) == ["a", "c", "d"]
+    assert cache.get("b") is None
+
+    # A new worker picks up what is on disk
+    assert PdfCache(tmp_path, max_bytes=350).get("d") == cache.path("d")
+
+
+def test_keys_change_with_any_input():
+    key = cache_key("v1", "history", 1, None, [[1, "2030-01-01 00:00:00"]])
+    assert key == cache_key("v1", "history", 1, None, [[1, "2030-01-01 00:00:00"]])
+    assert key != cache_key("v2", "history", 1, None, [[1, "2030-01-01 00:00:00"]])
+    assert key != cache_key("v1", "history", 1, None, [[1, "2030-01-01 00:00:01"]])
+    assert key != cache_key("v1", "history", 1, None, [[1, "2030-01-01 00:00:00"], [2, None]])
@@ -0,0 +1,113 @@
+import io
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api import pdf_clinica
+from app.db.query_stats import capture_queries
+from app.models.history import ClinicalRecord
+from app.models.pdf_export import ExportStatus
+from app.models.user import Patient, User
+from app.services import pdf_exports, pdf_render
+from app.services.pdf_cache import PdfCache
+
+pypdf = pytest.importorskip("pypdf")
+
+
+def _write(path, texts):
+    """A PDF with one page per text, drawn as a text operator we can find again"""
+    writer = pypdf.PdfWriter()
+    for text in texts:
+        page = writer.add_blank_page(595, 842)
+        stream = pypdf.generic.DecodedStreamObject()
+        stream.set_data(f"BT ({text}) Tj ET".encode())
+        page.replace_contents(stream)
+    writer.write(path)
+    return len(texts)
+
+
+class FakeWeasyPrint:
+    """Lays out one page per note, or one footer per page of the footer document"""
+
+    def __init__(self):
+        self.documents = []
+
+    def __call__(self, html_content, path):
+        self.documents.append(html_content)
+        notes = re.findall(r"Nota Clínica #(\d+)", html_content)
+        if notes:
+            return _write(path, [f"note {n}" for n in notes])
+        pages = html_content.count("break-after: page") + 1
+        return _write(path, [f"footer {i} of {pages}" for i in range(1, pages + 1)])
+
+
+@pytest.fixture
+def weasyprint(tmp_path, monkeypatch):
+    fake = FakeWeasyPrint()
+    monkeypatch.setattr(pdf_clinica, "render_pdf_to", fake)
+    monkeypatch.setattr(pdf_clinica, "get_pdf_cache", lambda: PdfCache(tmp_path))
+    monkeypatch.setattr(pdf_render, "PDF_RENDER_WORKERS", 0)
+    # Two empty notes per chunk
+    monkeypatch.setattr(pdf_clinica, "PDF_CHUNK_CHARS", 2 * pdf_clinica.NOTE_OVERHEAD_CHARS)
+    return fake
+
+
+@pytest.fixture
+def long_history(db):
+    patient = Patient(full_name="Long History", email="long.history@example.com")
+    db.add(patient)
+    db.flush()
+    start = datetime(2030, 1, 1)
+    db.add_all(ClinicalRecord(patient_id=patient.id, created_at=start + timedelta(days=i)) for i in range(5))
+    db.commit()
+    return patient.id
+
+
+def test_long_histories_are_rendered_in_chunks_with_continuous_page_numbers(weasyprint, long_history, tmp_path, api_client):
+    client = api_client(pdf_clinica.router, "/pdf", User(role="specialist", is_medical_professional=True))
+    response = client.get(f"/pdf/patients/{long_history}/history/pdf")
+    assert response.status_code == 200
+
+    chunks, footer = weasyprint.documents[:-1], weasyprint.documents[-1]
+    assert len(chunks) == 3
+    # Patient card and title once, on the first page; no per-chunk page numbers
+    assert ["Información del Paciente" in html for html in chunks] == [True, False, False]
+    assert not any("counter(pages)" in html for html in chunks)
+    assert "counter(pages)" in footer
+
+    pages = [page.get_contents().get_data() for page in pypdf.PdfReader(io.BytesIO(response.content)).pages]
+    assert len(pages) == 5
+    for n, content in enumerate(pages, 1):
+        assert f"(note {n})".encode() in content
+        assert f"(footer {n} of 5)".encode() in content
+    # Chunk files are cleaned up; only the joined PDF stays in the cache
+    assert [p.suffix for p in tmp_path.iterdir()] == [".pdf"]
+
+
+def test_export_progress_does_not_reload_the_notes_being_rendered(weasyprint, long_history, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_exports, "get_pdf_cache", lambda: PdfCache(tmp_path))
+    monkeypatch.setattr(pdf_exports, "PDF_EXPORT_DIR", str(tmp_path / "exports"))
+    doctor = User(email="chunked.exports@example.com", role="specialist", is_medical_professional=True)
+    db.add(doctor)
+    db.flush()
+    job = pdf_exports.create_job(db, "history", long_history, doctor.id)
+    db.commit()
+    with capture_queries() as stats:
+        assert pdf_exports.process_one() == "done"
+    record_loads = [shape for shape in stats.shapes.elements() if "FROM clinical_records" in shape]
+    # The stamps for the cache key and the notes themselves, each in one query
+    assert len(record_loads) == 2, stats.report()
+    db.refresh(job)
+    assert (job.status, job.progress) == (ExportStatus.DONE, 100)
+
+
+def test_notes_are_grouped_into_bounded_chunks():
+    def note(text):
+        return ClinicalRecord(plan=text)
+
+    records = [note("x" * 3000), note(""), note(""), note("x" * 9000), note("")]
+    chunks = pdf_clinica._chunk_records(records, 6000)
+    assert [len(chunk) for chunk in chunks] == [2, 1, 1, 1]
+    # A note bigger than a chunk gets a chunk of its own
+    assert chunks[2] == [records[3]]
@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api import pdf_clinica, pdf_exports as pdf_exports_api
+from app.models.history import ClinicalRecord
+from app.models.pdf_export import ExportStatus, PdfExportJob
+from app.models.user import Patient, User
+from app.services import pdf_exports
+from app.services.pdf_cache import PdfCache
+from app.services.pdf_render import PdfRenderBusy
+
+pytestmark = pytest.mark.empty_tables("pdf_export_jobs")
+
+
+@pytest.fixture
+def renders(tmp_path, monkeypatch):
+    rendered = []
+
+    def write_pdf(html_content):
+        rendered.append(html_content)
+        return b"%PDF-1.7 export"
+
+    monkeypatch.setattr(pdf_clinica, "_write_pdf", write_pdf)
+    monkeypatch.setattr(pdf_exports, "get_pdf_cache", lambda: PdfCache(tmp_path / "cache"))
+    monkeypatch.setattr(pdf_exports, "PDF_EXPORT_DIR", str(tmp_path / "exports"))
+    return rendered
+
+
+@pytest.fixture
+def people(db):
+    doctor = User(email="exports.doctor@example.com", full_name="Dr. Export", role="specialist", is_medical_professional=True)
+    other = User(email="exports.other@example.com", full_name="Dr. Other", role="specialist", is_medical_professional=True)
+    patient = Patient(full_name="Export Patient", email="export.patient@example.com")
+    db.add_all([doctor, other, patient])
+    db.flush()
+    db.add(ClinicalRecord(patient_id=patient.id, chief_complaint="Cefalea", plan="Control"))
+    db.commit()
+    return doctor, other, patient
+
+
+@pytest.fixture
+def as_user(api_client):
+    return lambda user: api_client(pdf_exports_api.router, "/pdf", user)
+
+
+def test_export_job_lifecycle(db, people, renders, as_user):
+    doctor, other, patient = people
+    client = as_user(doctor)
+    created = client.post(f"/pdf/patients/{patient.id}/history/exports")
+    assert created.status_code == 202
+    job = created.json()
+    assert (job["status"], job["progress"], job["download_url"]) == ("queued", 0, None)
+    assert created.headers["location"].endswith(f"/pdf/exports/{job['id']}")
+    assert client.get(f"/pdf/exports/{job['id']}/download").status_code == 409
+
+    assert pdf_exports.drain() == {"done": 1}
+    assert len(renders) == 1
+
+    polled = client.get(f"/pdf/exports/{job['id']}").json()
+    assert (polled["status"], polled["progress"]) == ("done", 100)
+    download = client.get(polled["download_url"])
+    assert download.status_code == 200 and download.content == b"%PDF-1.7 export"
+    assert "Export%20Patient" in download.headers["content-disposition"]
+    # The file name holds the patient's name: stored encrypted
+    assert "Export Patient" not in db.get(PdfExportJob, job["id"])._filename
+
+    # Another doctor cannot see or fetch it
+    assert as_user(other).get(f"/pdf/exports/{job['id']}").status_code == 404
+    assert as_user(other).get(f"/pdf/exports/{job['id']}/download").status_code == 404
+
+
+def test_finished_exports_expire(db, people, renders, as_user):
+    doctor, _, patient = people
+    client = as_user(doctor)
+    job_id = client.post(f"/pdf/patients/{patient.id}/history/exports").json()["id"]
+    pdf_exports.drain()
+    assert pdf_exports.export_path(job_id).exists()
+
+    assert pdf_exports.expire(db, now=datetime.utcnow() + timedelta(seconds=pdf_exports.PDF_EXPORT_TTL_SECONDS + 1)) == 1
+    assert not pdf_exports.export_path(job_id).exists()
+    assert client.get(f"/pdf/exports/{job_id}").json()["status"] == "expired"
+    assert client.get(f"/pdf/exports/{job_id}/download").status_code == 410
+
+
+def test_exports_with_nothing_to_render_fail_without_retrying(db, people, renders, as_user):
+    doctor, _, patient = people
+    client = as_user(doctor)
+    assert client.post("/pdf/patients/999999/history/exports").status_code == 404
+
+    job_id = client.post(f"/pdf/patients/{patient.id}/complaint/fiebre/exports").json()["id"]
+    assert pdf_exports.drain() == {"failed": 1}
+    job = client.get(f"/pdf/exports/{job_id}").json()
+    assert job["status"] == "failed"
+    assert job["error"] == "No records found for this complaint"
+    assert renders == []
+
+
+def test_busy_render_pool_requeues_without_spending_an_attempt(db, people, renders, monkeypatch):
+    doctor, _, patient = people
+    job = pdf_exports.create_job(db, "history", patient.id, doctor.id)
+    db.commit()
+
+    def busy(html_content):
+        raise PdfRenderBusy()
+
+    monkeypatch.setattr(pdf_clinica, "_write_pdf", busy)
+    assert pdf_exports.process_one() == "busy"
+    db.refresh(job)
+    assert (job.status, job.attempts) == (ExportStatus.QUEUED, 0)
+    assert job.next_attempt_at > datetime.utcnow()
+
+
+def test_a_job_whose_lease_ran_out_is_run_again(db, people, renders):
+    doctor, _, patient = people
+    job = pdf_exports.create_job(db, "history", patient.id, doctor.id)
+    db.commit()
+
+    first = pdf_exports.claim(db)
+    # The first worker stalls past its lease; another one takes the job over
+    later = datetime.utcnow() + timedelta(seconds=pdf_exports.PDF_EXPORT_LEASE_SECONDS + 1)
+    assert pdf_exports.claim(db, now=datetime.utcnow()) is None
+    second = pdf_exports.claim(db, now=later)
+    assert (second.id, second.attempts) == (first.id, 2)
+
+    assert pdf_exports.run_job(db, first) == "stale"
+    assert pdf_exports.run_job(db, second) == "done"
+    db.refresh(job)
+    assert (job.status, job.attempts) == (ExportStatus.DONE, 2)
+
+
+def test_a_job_that_keeps_losing_its_worker_fails(db, people, renders):
+    doctor, _, patient = people
+    lost = pdf_exports.create_job(db, "history", patient.id, doctor.id)
+    db.commit()
+
+    now = datetime.utcnow()
+    for attempt in range(1, pdf_exports.PDF_EXPORT_MAX_ATTEMPTS + 1):
+        assert (pdf_exports.claim(db, now=now).id, attempt) == (lost.id, attempt)
+        # The worker dies mid-render: the job stays running until its lease runs out
+        now += timedelta(seconds=pdf_exports.PDF_EXPORT_LEASE_SECONDS + 1)
+
+    assert pdf_exports.claim(db, now=now) is None
+    db.refresh(lost)
+    assert (lost.status, lost.attempts, lost.error) == (ExportStatus.FAILED, pdf_exports.PDF_EXPORT_MAX_ATTEMPTS, "worker lost")
+
+
+def test_unexpected_failures_are_not_shown_to_clients(db, people, renders, monkeypatch, as_user):
+    doctor, _, patient = people
+    job_id = as_user(doctor).post(f"/pdf/patients/{patient.id}/history/exports").json()["id"]
+
+    def broken(html_content):
+        raise RuntimeError("SELECT phone FROM patients WHERE id = 1: /srv/telemed/secret")
+
+    monkeypatch.setattr(pdf_clinica, "_write_pdf", broken)
+    assert pdf_exports.process_one() == "retry"
+    job = as_user(doctor).get(f"/pdf/exports/{job_id}").json()
+    assert (job["status"], job["error"]) == ("queued", "internal error")
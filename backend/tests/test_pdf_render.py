@@ -0,0 +1,98 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from app import main
+from app.api import pdf_clinica
+from app.core.metrics import PDF_RENDER_FAILURES, PDF_RENDER_REJECTED
+from app.models.user import Patient, User
+from app.services import pdf_render
+from app.services.pdf_cache import PdfCache
+from app.services.pdf_render import PdfRenderBusy, PdfRenderFailed
+
+
+def _ignore_timer_and_sleep(seconds):
+    """A render stuck where the worker's timer cannot reach it (native code)"""
+    signal.signal(signal.SIGALRM, signal.SIG_IGN)
+    time.sleep(seconds)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(pdf_render, "PDF_RENDER_WORKERS", 1)
+    monkeypatch.setattr(pdf_render, "PDF_RENDER_MAX_MEMORY_MB", 512)
+    monkeypatch.setattr(pdf_render, "PDF_RENDER_MAX_TASKS", 3)
+    pdf_render.shutdown_pool()
+    yield pdf_render
+    pdf_render.shutdown_pool()
+
+
+def test_renders_run_in_recycled_worker_processes(pool):
+    pids = [pool.run(os.getpid) for _ in range(4)]
+    assert os.getpid() not in pids
+    # A fresh worker after PDF_RENDER_MAX_TASKS renders
+    assert pids[0] == pids[1] == pids[2] != pids[3]
+
+
+def test_slow_renders_time_out_and_the_worker_is_reused(pool):
+    failures = PDF_RENDER_FAILURES.value(reason="timeout")
+    pid = pool.run(os.getpid)
+    start = time.monotonic()
+    with pytest.raises(PdfRenderFailed) as excinfo:
+        pool.run(time.sleep, 30, timeout=0.3)
+    assert excinfo.value.reason == "timeout"
+    assert time.monotonic() - start < 5
+    assert PDF_RENDER_FAILURES.value(reason="timeout") == failures + 1
+    assert pool.run(os.getpid) == pid
+
+
+def test_a_worker_ignoring_its_timer_is_killed(pool, monkeypatch):
+    monkeypatch.setattr(pdf_render, "KILL_GRACE_SECONDS", 0.5)
+    pid = pool.run(os.getpid)
+    with pytest.raises(PdfRenderFailed):
+        pool.run(_ignore_timer_and_sleep, 30, timeout=0.3)
+    # The next render gets a new pool
+    assert pool.run(os.getpid) != pid
+
+
+def test_renders_over_the_memory_cap_fail_without_growing_the_host(pool):
+    with pytest.raises(PdfRenderFailed) as excinfo:
+        pool.run(bytearray, 1024 * 1024 * 1024)
+    assert excinfo.value.reason == "memory"
+    assert pool.run(len, b"ok") == 2
+
+
+@pytest.fixture
+def client(api_client):
+    doctor = User(email="render.doctor@example.com", full_name="Dr. Render", role="specialist", is_medical_professional=True)
+    return api_client(pdf_clinica.router, "/pdf", doctor, exception_handlers={PdfRenderBusy: main.pdf_render_busy_handler})
+
+
+def test_full_render_queue_answers_503_at_once(client, db, monkeypatch, tmp_path):
+    monkeypatch.setattr(pdf_render, "PDF_RENDER_WORKERS", 0)
+    monkeypatch.setattr(pdf_render, "PDF_RENDER_QUEUE_LIMIT", 1)
+    monkeypatch.setattr(pdf_clinica, "get_pdf_cache", lambda: PdfCache(tmp_path))
+    patient = Patient(full_name="Render Patient", email="render.patient@example.com")
+    db.add(patient)
+    db.commit()
+    rejected = PDF_RENDER_REJECTED.value()
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    holder = threading.Thread(target=pdf_render.run, args=(hold,))
+    holder.start()
+    started.wait(5)
+    try:
+        response = client.get(f"/pdf/patients/{patient.id}/history/pdf")
+    finally:
+        release.set()
+        holder.join()
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(pdf_render.PDF_RENDER_RETRY_AFTER_SECONDS)
+    assert PDF_RENDER_REJECTED.value() == rejected + 1
@@ -0,0 +1,123 @@
+from datetime import timedelta
+
+import pytest
+
+from app.api import admin, auth
+from app.core.metrics import PRINCIPAL_CACHE_REQUESTS
+from app.core.principal_cache import PrincipalCache, principal_cache
+from app.core.security import create_access_token, get_password_hash, verify_password
+from app.db.session import SessionLocal
+from app.models.user import User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_and_evict_least_recently_used():
+    clock = FakeClock()
+    cache = PrincipalCache(maxsize=2, ttl=10, clock=clock)
+    cache.put(1, 100, {"id": 1})
+    cache.put(2, 100, {"id": 2})
+    assert cache.get(1, 100) == {"id": 1}
+
+    cache.put(3, 100, {"id": 3})  # evicts user 2, the least recently used
+    assert cache.get(2, 100) is None
+    assert cache.get(1, 100) == {"id": 1}
+
+    clock.now = 11
+    assert cache.get(1, 100) is None
+    assert len(cache) == 1
+
+
+def test_invalidate_drops_every_token_of_the_user():
+    cache = PrincipalCache(maxsize=10, ttl=10)
+    cache.put(1, 100, {"id": 1})
+    cache.put(1, 200, {"id": 1})
+    cache.put(2, 100, {"id": 2})
+    cache.invalidate(1)
+    assert cache.get(1, 100) is None and cache.get(1, 200) is None
+    assert cache.get(2, 100) == {"id": 2}
+
+
+@pytest.fixture(scope="module")
+def users():
+    db = SessionLocal()
+    it_admin = User(email="cache-it@example.com", role="it_admin", hashed_password="x")
+    doctor = User(
+        email="cache-doctor@example.com",
+        role="specialist",
+        is_medical_professional=True,
+        is_first_login=False,
+        hashed_password=get_password_hash("old-password"),
+    )
+    db.add_all([it_admin, doctor])
+    db.commit()
+    ids = it_admin.id, doctor.id
+    db.close()
+    return ids
+
+
+@pytest.fixture(scope="module")
+def client(users, api_client):
+    principal_cache.clear()
+    return api_client(auth.router, "/auth", mounts={"/admin": admin.router})
+
+
+def _bearer(user_id):
+    token = create_access_token({"sub": str(user_id)}, expires_delta=timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_repeat_requests_skip_the_user_lookup(client, users, query_budget):
+    _, doctor_id = users
+    headers = _bearer(doctor_id)
+    misses = PRINCIPAL_CACHE_REQUESTS.value(result="miss")
+
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    assert PRINCIPAL_CACHE_REQUESTS.value(result="miss") == misses + 1
+
+    hits = PRINCIPAL_CACHE_REQUESTS.value(result="hit")
+    with query_budget(0):
+        response = client.get("/auth/me", headers=headers)
+    assert response.json()["email"] == "cache-doctor@example.com"
+    assert PRINCIPAL_CACHE_REQUESTS.value(result="hit") == hits + 1
+
+
+def test_cached_principal_can_still_be_modified(client, users):
+    _, doctor_id = users
+    headers = _bearer(doctor_id)
+    client.get("/auth/me", headers=headers)  # warm the cache
+
+    response = client.post(
+        "/auth/change-password",
+        headers=headers,
+        json={"current_password": "old-password", "new_password": "new-password"},
+    )
+    assert response.status_code == 200, response.text
+
+    db = SessionLocal()
+    assert verify_password("new-password", db.get(User, doctor_id).hashed_password)
+    db.close()
+
+    misses = PRINCIPAL_CACHE_REQUESTS.value(result="miss")
+    client.get("/auth/me", headers=headers)
+    assert PRINCIPAL_CACHE_REQUESTS.value(result="miss") == misses + 1
+
+
+def test_deactivation_takes_effect_immediately(client, users):
+    it_admin_id, doctor_id = users
+    doctor_headers = _bearer(doctor_id)
+    assert client.get("/auth/me", headers=doctor_headers).status_code == 200
+
+    response = client.patch(
+        f"/admin/medical-professionals/{doctor_id}",
+        headers=_bearer(it_admin_id),
+        json={"is_active": False},
+    )
+    assert response.status_code == 200, response.text
+    assert client.get("/auth/me", headers=doctor_headers).status_code == 401
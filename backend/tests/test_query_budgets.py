@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import admin, consultations, doctor, payments
+from app.db.session import SessionLocal
+from app.models.consultation import Consultation, Payment
+from app.models.history import ClinicalRecord
+from app.models.user import Patient, User
+
+PATIENTS = 20
+
+
+@pytest.fixture(scope="module")
+def current_user():
+    db = SessionLocal()
+    user = User(
+        email="budget-doctor@example.com",
+        full_name="Budget Doctor",
+        role="specialist",
+        is_superuser=True,
+        is_medical_professional=True,
+    )
+    db.add(user)
+    db.flush()
+    start = datetime(2030, 1, 1, 9, 0)
+    for i in range(PATIENTS):
+        patient = Patient(full_name=f"Patient {i}", email=f"budget-{i}@example.com")
+        db.add(patient)
+        db.flush()
+        c = Consultation(
+            patient_id=patient.id,
+            doctor_id=user.id,
+            specialty="GP",
+            scheduled_at=start + timedelta(hours=i),
+            status="confirmed",
+        )
+        db.add(c)
+        db.flush()
+        db.add(Payment(consultation_id=c.id, amount=50, status="completed"))
+        for day in range(i % 3):
+            db.add(
+                ClinicalRecord(
+                    patient_id=patient.id,
+                    chief_complaint=f"Visit {day}",
+                    created_at=start + timedelta(days=day),
+                )
+            )
+    db.commit()
+    db.refresh(user)
+    db.expunge(user)
+    db.close()
+    return user
+
+
+@pytest.fixture(scope="module")
+def client(current_user, api_client):
+    return api_client(
+        admin.router,
+        "/admin",
+        current_user,
+        mounts={"/consultations": consultations.router, "/doctor": doctor.router, "/payments": payments.router},
+    )
+
+
+@pytest.mark.parametrize(
+    "path, budget",
+    [
+        ("/payments/doctor/payments", 1),
+        ("/doctor/consultations", 1),
+        ("/consultations/me", 1),
+        ("/admin/consultations", 1),
+        ("/admin/patients", 1),
+        ("/doctor/patients?limit=100", 1),
+    ],
+)
+def test_list_endpoints_do_not_scale_queries_with_rows(client, query_budget, path, budget):
+    with query_budget(budget) as stats:
+        response = client.get(path)
+    assert response.status_code == 200, response.text
+    assert stats.count >= 1
+    assert len(response.json()) >= PATIENTS
+
+
+def test_budget_failure_reports_repeated_statements(query_budget):
+    db = SessionLocal()
+    try:
+        with pytest.raises(AssertionError, match=r"x3: SELECT"):
+            with query_budget(2):
+                for i in range(3):
+                    db.query(Patient).filter(Patient.id == i).first()
+    finally:
+        db.close()
+
+
+def test_doctor_patients_pages_filters_and_summarizes(client, query_budget):
+    with query_budget(1):
+        response = client.get("/doctor/patients", params={"q": "budget-1", "limit": 3})
+    assert response.status_code == 200, response.text
+    page = response.json()
+    # budget-1@ and budget-10@..budget-19@
+    assert response.headers["X-Total-Count"] == "11"
+    assert 'rel="next"' in response.headers["Link"]
+    assert [p["full_name"] for p in page] == ["Patient 1", "Patient 10", "Patient 11"]
+    assert [p["records_count"] for p in page] == [1, 1, 2]
+    assert page[2]["latest_record"]["chief_complaint"] == "Visit 1"
+
+    response = client.get("/doctor/patients", params={"sort": "latest_record", "order": "desc", "limit": 100})
+    dates = [p["latest_record_date"] for p in response.json()]
+    assert dates[0] is not None and dates[-1] is None
+
+    patient_id = page[0]["id"]
+    response = client.get(f"/doctor/patients/{patient_id}")
+    assert response.status_code == 200
+    assert response.json()["records_count"] == 1
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/payments/doctor/payments",
+        "/doctor/consultations",
+        "/consultations/me",
+        "/admin/consultations",
+        "/admin/patients",
+    ],
+)
+def test_cursor_pages_cover_every_row_once(client, query_budget, path):
+    seen = []
+    url = f"{path}?limit=7"
+    while url:
+        with query_budget(1):
+            response = client.get(url)
+        assert response.status_code == 200, response.text
+        seen.extend(item["id"] for item in response.json())
+        link = response.headers.get("Link")
+        url = link[1 : link.index(">")] if link else None
+        assert bool(url) == ("X-Next-Cursor" in response.headers)
+    assert len(seen) == len(set(seen))
+    assert len(seen) == len(client.get(path).json())
+
+
+def test_malformed_cursor_is_rejected(client):
+    response = client.get("/admin/patients", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_paging_headers_are_readable_cross_origin():
+    from app import main
+
+    response = TestClient(main.app).get("/api/health", headers={"Origin": "http://localhost:3000"})
+    exposed = {h.strip().lower() for h in response.headers["access-control-expose-headers"].split(",")}
+    assert {"x-next-cursor", "link", "x-total-count"} <= exposed
+
+
+def test_consultations_since_skips_earlier_ones(client):
+    # Fixture consultations start 2030-01-01 09:00, one per hour
+    rows = client.get("/consultations/me", params={"since": "2030-01-01T12:00:00Z", "limit": 3}).json()
+    assert [row["scheduled_at"] for row in rows] == [
+        "2030-01-01T12:00:00",
+        "2030-01-01T13:00:00",
+        "2030-01-01T14:00:00",
+    ]
+
+
+def test_payment_summary_aggregates_every_page(client):
+    summary = client.get("/payments/doctor/payments/summary").json()
+    assert (summary["total_count"], summary["completed_count"], summary["pending_count"]) == (PATIENTS, PATIENTS, 0)
+    assert float(summary["completed_amount"]) == 50 * PATIENTS
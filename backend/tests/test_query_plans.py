@@ -0,0 +1,200 @@
+"""EXPLAIN every statement the routers issue and fail on sequential scans of hot tables
+
+PostgreSQL only: run with ``TEST_DATABASE_URL=postgresql://...``. Seq scans
+are disabled for the EXPLAIN session (``enable_seqscan = off``), so on a
+small seeded database a Seq Scan node only survives when no index can serve
+the query, which is exactly the regression this guards against.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import asyncpg
+import pytest
+from sqlalchemy import event, insert, text
+
+from app.api import admin, auth, consultations, doctor, payments, templates
+from app.db.session import SessionLocal, async_engine, engine
+from app.models.consultation import Consultation, Payment
+from app.models.history import ClinicalRecord
+from app.models.template import ClinicalTemplate
+from app.models.user import Patient, User
+
+pytestmark = pytest.mark.skipif(
+    engine.dialect.name != "postgresql", reason="EXPLAIN harness needs TEST_DATABASE_URL=postgresql://..."
+)
+
+HOT_TABLES = {"patients", "consultations", "payments", "clinical_records", "users"}
+
+PATIENTS = 2000
+RECORDS_PER_PATIENT = 3
+
+# (method, path, kwargs, tables a seq scan is acceptable on)
+REQUESTS = [
+    ("get", "/admin/patients", {}, set()),
+    ("get", "/admin/patients", {"params": {"q": "patient 12"}}, set()),
+    ("get", "/admin/consultations", {}, set()),
+    ("get", "/admin/consultations", {"params": {"day": "2030-01-02", "status_filter": "confirmed"}}, set()),
+    ("get", "/doctor/consultations", {}, set()),
+    ("get", "/doctor/consultations", {"params": {"day": "2030-01-02"}}, set()),
+    ("get", "/doctor/patients/{patient_id}/history", {}, set()),
+    ("get", "/doctor/patients/{patient_id}", {}, set()),
+    ("get", "/consultations/me", {}, set()),
+    ("get", "/payments/doctor/payments", {}, set()),
+    # The staff directory is small and unindexed by design
+    ("get", "/consultations/public/doctors", {}, {"users"}),
+    ("post", "/auth/reset-password", {"json": {"email": "nobody@example.com"}}, set()),
+    ("post", "/auth/reset-password-confirm", {"json": {"token": "missing", "new_password": "x" * 12}}, set()),
+]
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    db = SessionLocal()
+    doctor_user = User(
+        email="plans-doctor@example.com",
+        full_name="Plans Doctor",
+        role="specialist",
+        is_superuser=True,
+        is_medical_professional=True,
+    )
+    db.add(doctor_user)
+    db.flush()
+
+    start = datetime(2030, 1, 1, 8, 0)
+    db.execute(
+        insert(Patient),
+        [
+            {"full_name": f"Patient {i}", "email": f"plans-{i}@example.com", "created_at": start + timedelta(minutes=i)}
+            for i in range(PATIENTS)
+        ],
+    )
+    patient_ids = [row.id for row in db.execute(text("SELECT id FROM patients ORDER BY id"))]
+    db.execute(
+        insert(Consultation),
+        [
+            {
+                "patient_id": pid,
+                "doctor_id": doctor_user.id,
+                "specialty": "GP",
+                "scheduled_at": start + timedelta(minutes=30 * i),
+                "status": "confirmed",
+            }
+            for i, pid in enumerate(patient_ids)
+        ],
+    )
+    consultation_ids = [row.id for row in db.execute(text("SELECT id FROM consultations ORDER BY id"))]
+    db.execute(
+        insert(Payment),
+        [{"consultation_id": cid, "amount": 50, "status": "completed"} for cid in consultation_ids],
+    )
+    db.execute(
+        insert(ClinicalRecord.__table__),
+        [
+            {"patient_id": pid, "chief_complaint": "Check-up", "created_at": start + timedelta(days=n)}
+            for pid in patient_ids
+            for n in range(RECORDS_PER_PATIENT)
+        ],
+    )
+    db.add(ClinicalTemplate(name="General", created_at=start))
+    db.commit()
+    db.refresh(doctor_user)
+    db.expunge(doctor_user)
+    db.close()
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+    return doctor_user, patient_ids[len(patient_ids) // 2]
+
+
+@pytest.fixture(scope="module")
+def client(seeded, api_client):
+    doctor_user, _ = seeded
+    mounts = {
+        "/auth": auth.router,
+        "/consultations": consultations.router,
+        "/doctor": doctor.router,
+        "/payments": payments.router,
+        "/templates": templates.router,
+    }
+    return api_client(admin.router, "/admin", doctor_user, mounts=mounts)
+
+
+class _StatementRecorder:
+    """Keep every SELECT sent through the sync and async engines, with its parameters"""
+
+    def __init__(self):
+        self.statements: list[tuple[str, str, object]] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.statements.append((conn.dialect.driver, statement, parameters))
+
+    def __enter__(self):
+        for target in (engine, async_engine.sync_engine):
+            event.listen(target, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        for target in (engine, async_engine.sync_engine):
+            event.remove(target, "before_cursor_execute", self)
+
+
+def _explain(driver: str, statement: str, parameters) -> dict:
+    """EXPLAIN through the driver that ran the statement, so its paramstyle still applies"""
+    sql = f"EXPLAIN (FORMAT JSON) {statement}"
+    if driver == "asyncpg":
+
+        # A fresh connection: pooled asyncpg connections belong to the TestClient's loop
+        async def run():
+            dsn = async_engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+            conn = await asyncpg.connect(dsn)
+            try:
+                await conn.execute("SET enable_seqscan = off")
+                return await conn.fetchval(sql, *parameters)
+            finally:
+                await conn.close()
+
+        plan = asyncio.run(run())
+    else:
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(sql, parameters)
+            plan = cursor.fetchone()[0]
+            raw.rollback()
+        finally:
+            raw.close()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def _seq_scans(plan: dict) -> set[str]:
+    found = set()
+    if plan.get("Node Type") == "Seq Scan":
+        found.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found |= _seq_scans(child)
+    return found
+
+
+def _request_id(request):
+    method, path, kwargs, _ = request
+    params = "&".join(f"{k}={v}" for k, v in kwargs.get("params", {}).items())
+    return f"{method} {path}?{params}" if params else f"{method} {path}"
+
+
+@pytest.mark.parametrize("method, path, kwargs, allowed", REQUESTS, ids=[_request_id(r) for r in REQUESTS])
+def test_hot_queries_use_indexes(client, seeded, method, path, kwargs, allowed):
+    _, patient_id = seeded
+    with _StatementRecorder() as recorder:
+        response = getattr(client, method)(path.format(patient_id=patient_id), **kwargs)
+    assert response.status_code < 500, response.text
+    assert recorder.statements, "request issued no SELECT"
+
+    for driver, statement, parameters in recorder.statements:
+        scans = _seq_scans(_explain(driver, statement, parameters)) & (HOT_TABLES - allowed)
+        assert not scans, f"Seq Scan on {sorted(scans)} for {method.upper()} {path}:\n{statement}"
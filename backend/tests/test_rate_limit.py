@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.api import auth, consultations
+from app.core import rate_limit
+from app.core.metrics import RATE_LIMIT_DECISIONS
+from app.core.rate_limit import MemoryBackend, Rate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_parsing():
+    assert Rate.parse("10/minute") == Rate(10, 10 / 60)
+    assert Rate.parse("3 / hours") == Rate(3, 3 / 3600)
+    for spec in ("10", "ten/minute", "0/second", "5/fortnight"):
+        with pytest.raises(ValueError):
+            Rate.parse(spec)
+
+
+def test_bucket_allows_bursts_then_refills():
+    clock = FakeClock()
+    backend = MemoryBackend(maxsize=10, clock=clock)
+    rate = Rate.parse("2/minute")
+
+    async def take():
+        return await backend.take("k", rate)
+
+    assert asyncio.run(take()) == 0
+    assert asyncio.run(take()) == 0
+    assert asyncio.run(take()) == pytest.approx(30)  # one token every 30s
+
+    clock.now = 30
+    assert asyncio.run(take()) == 0
+    assert asyncio.run(take()) > 0
+
+
+def test_least_recently_used_buckets_are_dropped():
+    backend = MemoryBackend(maxsize=2, clock=FakeClock())
+    rate = Rate.parse("1/hour")
+    for key in ("a", "b", "c"):
+        asyncio.run(backend.take(key, rate))
+    # "a" was evicted, so it starts again from a full bucket
+    assert asyncio.run(backend.take("a", rate)) == 0
+    assert asyncio.run(backend.take("c", rate)) > 0
+
+
+@pytest.fixture(scope="module")
+def app_client(api_client):
+    return api_client(auth.router, "/auth", mounts={"/consultations": consultations.router})
+
+
+@pytest.fixture
+def client(app_client, monkeypatch):
+    monkeypatch.setattr(rate_limit, "_backend", MemoryBackend())
+    return app_client
+
+
+def test_login_is_limited_per_account(client, monkeypatch):
+    monkeypatch.setattr(auth.login_rate_limit, "per_ip", None)
+    monkeypatch.setattr(auth.login_rate_limit, "per_account", Rate.parse("2/minute"))
+    rejected = RATE_LIMIT_DECISIONS.value(scope="login", bucket="account", outcome="rejected")
+
+    credentials = {"email": "Target@example.com", "password": "guess"}
+    for _ in range(2):
+        # The body is still parsed by the route after the limiter read it
+        assert client.post("/auth/login", json=credentials).status_code == 401
+
+    response = client.post("/auth/login", json={**credentials, "email": "target@example.com"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+    assert RATE_LIMIT_DECISIONS.value(scope="login", bucket="account", outcome="rejected") == rejected + 1
+
+    other = client.post("/auth/login", json={"email": "other@example.com", "password": "guess"})
+    assert other.status_code == 401
+
+
+def test_reset_password_is_limited_per_ip(client, monkeypatch):
+    monkeypatch.setattr(auth.reset_password_rate_limit, "per_ip", Rate.parse("2/minute"))
+    monkeypatch.setattr(auth.reset_password_rate_limit, "per_account", None)
+
+    statuses = [
+        client.post("/auth/reset-password", json={"email": f"user{i}@example.com"}).status_code
+        for i in range(3)
+    ]
+    assert statuses == [200, 200, 429]
+
+    # Another client behind the proxy has its own bucket
+    response = client.post(
+        "/auth/reset-password", json={"email": "user9@example.com"}, headers={"X-Real-IP": "203.0.113.7"}
+    )
+    assert response.status_code == 200
+
+
+def test_public_booking_keys_on_the_patient_email(client, monkeypatch):
+    limit = consultations.public_book_rate_limit
+    monkeypatch.setattr(limit, "per_ip", None)
+    monkeypatch.setattr(limit, "per_account", Rate.parse("1/hour"))
+
+    payload = {
+        "doctor_id": 999999,
+        "patient": {"full_name": "Rate Limited", "email": "booker@example.com"},
+        "specialty": "GP",
+        "scheduled_at": "2030-01-01T10:00:00",
+    }
+    assert client.post("/consultations/public/book", json=payload).status_code == 400  # unknown doctor
+    response = client.post("/consultations/public/book", json=payload)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) == 3600
@@ -0,0 +1,130 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, text
+
+from app.db.session import SessionLocal, engine
+from app.models.consultation import Consultation, ConsultationStatus
+from app.models.outbox import EmailOutbox
+from app.models.user import Patient, User
+from app.services import reminders
+
+# Far from any other test's consultations
+NOW = datetime(2041, 3, 1, 9, 0)
+
+
+pytestmark = pytest.mark.empty_tables("email_outbox")
+
+
+@pytest.fixture
+def book(db):
+    doctor = User(email="reminders.doctor@example.com", full_name="Dr. Reminder", is_medical_professional=True)
+    db.add(doctor)
+    db.commit()
+
+    def book(name, starts_in, status=ConsultationStatus.CONFIRMED, email=True):
+        patient = Patient(full_name=name, email=f"{name.lower()}@example.com" if email else None)
+        db.add(patient)
+        db.flush()
+        consultation = Consultation(
+            patient_id=patient.id,
+            doctor_id=doctor.id,
+            specialty="Cardiology",
+            scheduled_at=NOW + starts_in,
+            status=status,
+            jitsi_room_url=f"https://meet.example/{name}",
+            created_at=NOW - timedelta(days=3),
+        )
+        db.add(consultation)
+        db.commit()
+        return consultation
+
+    return book
+
+
+def _reminded(db):
+    rows = db.scalars(select(EmailOutbox).where(EmailOutbox.kind == "consultation_reminder").order_by(EmailOutbox.id))
+    return [row.to_email for row in rows]
+
+
+def test_each_window_reminds_once(db, book):
+    soon = book("Soon", timedelta(minutes=30))
+    today = book("Today", timedelta(hours=5))
+    book("Later", timedelta(days=2))
+    book("Past", -timedelta(hours=1))
+    book("Cancelled", timedelta(hours=5), status=ConsultationStatus.CANCELLED)
+    book("Noemail", timedelta(hours=5), email=False)
+
+    # "Noemail" is handled (nothing to send), past and cancelled ones are not due
+    assert reminders.run_once(now=NOW) == {"1h": 1, "24h": 2}
+    # Booked inside the 1 h window: only that reminder, not the 24 h one too
+    assert _reminded(db) == ["soon@example.com", "today@example.com"]
+    row = db.scalars(select(EmailOutbox).where(EmailOutbox.to_email == "today@example.com")).one()
+    payload = json.loads(row.payload)
+    assert payload["full_name"] == "Today"
+    assert payload["consultation"]["jitsi_room_url"] == "https://meet.example/Today"
+
+    assert reminders.run_once(now=NOW + timedelta(minutes=5)) == {}
+    db.expire_all()
+    assert (soon.reminders_sent, today.reminders_sent) == (2, 1)
+
+    # Five hours later the 1 h window of "Today" opens
+    assert reminders.run_once(now=NOW + timedelta(hours=4, minutes=30)) == {"1h": 2}
+    assert _reminded(db) == ["soon@example.com", "today@example.com", "today@example.com"]
+
+
+def test_rescheduling_starts_reminders_over(db, book):
+    consultation = book("Moved", timedelta(hours=2))
+    original_updated_at = consultation.updated_at
+    reminders.run_once(now=NOW)
+    db.refresh(consultation)
+    assert consultation.reminders_sent == 1
+    # Marking reminders is not an edit of the consultation
+    assert consultation.updated_at == original_updated_at
+
+    # Updates that echo the same time back do not resend anything
+    consultation.scheduled_at = consultation.scheduled_at
+    db.commit()
+    assert consultation.reminders_sent == 1
+
+    consultation.scheduled_at = NOW + timedelta(hours=3)
+    db.commit()
+    assert consultation.reminders_sent == 0
+    assert reminders.run_once(now=NOW) == {"24h": 1}
+
+
+def test_batches_cover_the_whole_window(db, book):
+    for i in range(5):
+        book(f"Batch{i}", timedelta(hours=10 + i))
+    assert reminders.run_once(batch_size=2, now=NOW) == {"24h": 5}
+    assert len(_reminded(db)) == 5
+
+
+@pytest.mark.skipif(engine.dialect.name == "sqlite", reason="SQLite has no row locks")
+def test_concurrent_schedulers_skip_locked_consultations(db, book):
+    held = book("Held", timedelta(hours=3))
+    book("Free", timedelta(hours=4))
+    holder = SessionLocal()
+    try:
+        holder.execute(select(Consultation.id).where(Consultation.id == held.id).with_for_update()).all()
+        # Returns at once with the other consultation instead of waiting on the lock
+        assert reminders.run_once(now=NOW) == {"24h": 1}
+        assert _reminded(db) == ["free@example.com"]
+    finally:
+        holder.rollback()
+        holder.close()
+    assert reminders.run_once(now=NOW) == {"24h": 1}
+    assert _reminded(db) == ["free@example.com", "held@example.com"]
+
+
+@pytest.mark.skipif(engine.dialect.name != "postgresql", reason="EXPLAIN needs PostgreSQL")
+@pytest.mark.parametrize("stage, hours", [(1, 24.0), (2, 1.0)])
+def test_due_scan_is_an_index_range_scan(db, stage, hours):
+    query = reminders.due_query(stage, hours, NOW, reminders.REMINDER_BATCH_SIZE)
+    compiled = query.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        conn.execute(text("SET enable_seqscan = off"))
+        plan = "\n".join(row[0] for row in conn.execute(text(f"EXPLAIN {compiled}")))
+    assert "Seq Scan on consultations" not in plan
+    assert "scheduled_at >" in plan  # the window bounds the index scan
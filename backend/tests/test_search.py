@@ -0,0 +1,49 @@
+import pytest
+
+from app.api import admin
+from app.db.search import normalize_search_text, word_similarity
+from app.db.session import SessionLocal
+from app.models.user import Patient, User
+
+NAMES = ["José Álvarez Núñez", "María Gómez", "Joaquín Alvarado", "Lucía Pérez"]
+
+
+@pytest.fixture(scope="module")
+def client(api_client):
+    db = SessionLocal()
+    db.add_all(
+        Patient(full_name=name, email=f"search-{i}@example.com") for i, name in enumerate(NAMES)
+    )
+    db.commit()
+    db.close()
+    return api_client(admin.router, "/admin", User(email="search-admin@example.com", is_superuser=True))
+
+
+def _search(client, q):
+    response = client.get("/admin/patients", params={"q": q})
+    assert response.status_code == 200, response.text
+    return [p["full_name"] for p in response.json()]
+
+
+def test_word_similarity_matches_pg_trgm():
+    # Reference values from PostgreSQL's pg_trgm
+    assert word_similarity("word", "two words") == pytest.approx(0.8)
+    assert word_similarity("word", "word") == 1.0
+    assert word_similarity("xyz", "two words") == 0.0
+    assert normalize_search_text("Núñez ÁLVAREZ") == "nunez alvarez"
+
+
+def test_search_ignores_accents_and_case(client):
+    # "Alvarado" is close enough to count as a fuzzy match, but ranks second
+    assert _search(client, "ALVAREZ") == ["José Álvarez Núñez", "Joaquín Alvarado"]
+    assert _search(client, "nunez") == ["José Álvarez Núñez"]
+    assert _search(client, "search-3@") == ["Lucía Pérez"]
+
+
+def test_search_tolerates_typos_and_ranks_best_match_first(client):
+    assert _search(client, "gomes") == ["María Gómez"]
+    assert _search(client, "alvarad")[0] == "Joaquín Alvarado"
+
+
+def test_like_wildcards_in_query_are_literal(client):
+    assert _search(client, "%") == []
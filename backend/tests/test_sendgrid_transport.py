@@ -0,0 +1,125 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.services.email import EmailService
+from app.services.sendgrid_transport import SendGridTransport, TemplateEmail
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+from fake_sendgrid import FakeSendGrid  # noqa: E402
+
+SENDER = ("noreply@example.com", "Clinic")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake():
+    with FakeSendGrid() as fake:
+        yield fake
+
+
+def _emails(template, *addresses):
+    return [TemplateEmail(a, template, {"full_name": a}, "test") for a in addresses]
+
+
+def test_batches_by_template_over_one_kept_alive_connection(fake):
+    transport = SendGridTransport("key", base_url=fake.url, batch_size=2)
+    emails = _emails("d-a", "a1@example.com", "a2@example.com", "a3@example.com") + _emails("d-b", "b1@example.com")
+    results = transport.send_many(SENDER, emails)
+
+    assert [r["status_code"] for r in results] == [202] * 4
+    # d-a: 2 + 1 recipients, d-b: 1
+    assert fake.batches == [2, 1, 1]
+    assert fake.connections == 1
+    assert [m["to"] for m in fake.messages] == ["a1@example.com", "a2@example.com", "a3@example.com", "b1@example.com"]
+    assert fake.messages[0]["data"] == {"full_name": "a1@example.com"}
+
+
+def test_a_connection_closed_by_the_server_is_replaced(fake):
+    transport = SendGridTransport("key", base_url=fake.url)
+    assert transport.send_many(SENDER, _emails("d-a", "first@example.com"))[0]["success"]
+    fake.drop_connections()
+    assert transport.send_many(SENDER, _emails("d-a", "second@example.com"))[0]["success"]
+    assert fake.connections == 2 and len(fake.messages) == 2
+
+
+def test_a_rejected_batch_only_fails_the_invalid_recipient(fake):
+    transport = SendGridTransport("key", base_url=fake.url)
+    emails = _emails("d-a", "ok1@example.com", "bad@invalid.example", "ok2@example.com", "ok3@example.com")
+    results = transport.send_many(SENDER, emails)
+
+    assert [r["success"] for r in results] == [True, False, True, True]
+    assert results[1]["status_code"] == 400
+    assert sorted(m["to"] for m in fake.messages) == ["ok1@example.com", "ok2@example.com", "ok3@example.com"]
+    # Rejections mean SendGrid is up: they never open the circuit
+    assert transport.breaker.state == "closed"
+
+
+def test_breaker_opens_on_outages_then_probes(fake):
+    clock = Clock()
+    breaker = CircuitBreaker("sendgrid-test", failure_threshold=2, reset_seconds=30, clock=clock)
+    transport = SendGridTransport("key", base_url=fake.url, breaker=breaker)
+    email = _emails("d-a", "a@example.com")
+
+    fake.fail_next(503, 429)
+    assert transport.send_many(SENDER, email)[0]["status_code"] == 503
+    assert transport.send_many(SENDER, email)[0]["status_code"] == 429
+    assert breaker.state == "open"
+
+    # Fails fast: SendGrid is not called
+    requests = fake.requests
+    assert transport.send_many(SENDER, email)[0] == {"success": False, "status_code": None, "error": "SendGrid circuit open"}
+    assert fake.requests == requests
+
+    clock.now = 31
+    fake.fail_next(500)
+    assert transport.send_many(SENDER, email)[0]["status_code"] == 500
+    assert breaker.state == "open"
+    clock.now = 62
+    assert transport.send_many(SENDER, email)[0]["success"]
+    assert breaker.state == "closed"
+
+
+def test_timeouts_are_failures():
+    with FakeSendGrid(latency=0.5) as fake:
+        transport = SendGridTransport("key", base_url=fake.url, timeout=0.1)
+        (result,) = transport.send_many(SENDER, _emails("d-a", "slow@example.com"))
+    assert not result["success"] and result["status_code"] is None
+    assert "timed out" in result["error"]
+
+
+def test_half_open_lets_a_single_probe_through():
+    clock = Clock()
+    breaker = CircuitBreaker("probe-test", failure_threshold=1, reset_seconds=10, clock=clock)
+    breaker.record_failure()
+    assert not breaker.allow()
+    clock.now = 10
+    assert breaker.allow()
+    assert not breaker.allow()  # the probe is in flight
+    breaker.record_success()
+    assert breaker.allow() and breaker.state == "closed"
+
+
+def test_email_service_sends_a_mixed_batch(fake):
+    service = EmailService(SendGridTransport("key", base_url=fake.url))
+    consultation = type("C", (), {"scheduled_at": "2030-01-01T10:00:00", "specialty": "GP", "jitsi_room_url": "u"})
+    emails = [
+        service.message("consultation_confirmation", "p1@example.com", full_name="P1", consultation=consultation),
+        service.message("password_reset", "u1@example.com", full_name="U1", reset_token="tok"),
+        service.message("consultation_confirmation", "p2@example.com", full_name="P2", consultation=consultation),
+    ]
+    assert all(r["success"] for r in service.send_many(emails))
+    assert fake.batches == [2, 1]
+    reset = next(m for m in fake.messages if m["to"] == "u1@example.com")
+    assert reset["template_id"] == "d-password-reset-template"
+    assert reset["data"]["reset_url"].endswith("token=tok")
+    assert service.send_welcome_email("w@example.com", "W")["status_code"] == 202
@@ -0,0 +1,144 @@
+import sys
+from email import message_from_bytes
+from email.policy import default
+from pathlib import Path
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.db.session import SessionLocal
+from app.models.outbox import EmailOutbox, OutboxStatus
+from app.services import outbox
+from app.services.email import SmtpEmailService
+from app.services.smtp_transport import SmtpPool, SmtpTransport
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+from smtp_sink import SmtpSink  # noqa: E402
+
+
+@pytest.fixture
+def sink():
+    with SmtpSink(username="clinic", password="secret") as sink:
+        yield sink
+
+
+def _service(sink, **pool_options):
+    pool = SmtpPool("127.0.0.1", sink.port, "none", "clinic", "secret", **pool_options)
+    return SmtpEmailService(SmtpTransport(pool))
+
+
+def _resets(service, *addresses):
+    return [service.message("password_reset", a, full_name="Ana Pérez", reset_token="tok") for a in addresses]
+
+
+def test_one_authenticated_session_is_reused_across_batches(sink):
+    service = _service(sink)
+    for batch in range(3):
+        results = service.send_many(_resets(service, f"p{batch}a@example.com", f"p{batch}b@example.com"))
+        assert [r["status_code"] for r in results] == [250, 250]
+
+    assert (sink.connections, sink.logins) == (1, 1)
+    assert [recipients for _, recipients, _ in sink.messages] == [
+        [f"p{b}{s}@example.com"] for b in range(3) for s in "ab"
+    ]
+    sender, _, raw = sink.messages[0]
+    message = message_from_bytes(raw, policy=default)
+    assert sender == service.from_email
+    assert message["Subject"] == "Restablece tu contraseña"
+    assert "Hola Ana Pérez" in message.get_content()
+    assert "reset-password?token=tok" in message.get_content()
+
+
+def test_pipelining_takes_one_round_trip_per_message(sink):
+    service = _service(sink)
+    service.send(_resets(service, "warmup@example.com")[0])  # connect, EHLO, AUTH
+
+    flights = sink.flights
+    service.send_many(_resets(service, *[f"p{i}@example.com" for i in range(20)]))
+    pipelined = sink.flights - flights
+
+    sink.pipelining = False
+    lockstep_service = _service(sink)
+    lockstep_service.send(_resets(lockstep_service, "warmup@example.com")[0])
+    flights = sink.flights
+    lockstep_service.send_many(_resets(lockstep_service, *[f"l{i}@example.com" for i in range(20)]))
+    lockstep = sink.flights - flights
+
+    # MAIL, RCPT, DATA and the content each wait for a reply in lock-step
+    assert pipelined <= 21
+    assert lockstep >= 4 * 20
+    assert len(sink.messages) == 42
+
+
+@pytest.mark.parametrize("pipelining", [True, False])
+def test_refused_recipient_fails_only_its_message(sink, pipelining):
+    sink.pipelining = pipelining
+    service = _service(sink)
+    results = service.send_many(_resets(service, "ok1@example.com", "nobody@invalid.example", "ok2@example.com"))
+
+    assert [r["success"] for r in results] == [True, False, True]
+    assert results[1]["status_code"] == 550 and results[1]["permanent"] is True
+    assert [recipients for _, recipients, _ in sink.messages] == [["ok1@example.com"], ["ok2@example.com"]]
+    assert sink.connections == 1
+
+
+def test_sessions_are_recycled_after_max_messages(sink):
+    service = _service(sink, max_messages=4)
+    results = service.send_many(_resets(service, *[f"r{i}@example.com" for i in range(10)]))
+
+    assert all(r["success"] for r in results)
+    assert (sink.connections, sink.logins) == (3, 3)
+
+
+def test_reused_session_only_sends_up_to_max_messages(sink):
+    service = _service(sink, max_messages=4)
+    service.send_many(_resets(service, *[f"a{i}@example.com" for i in range(3)]))
+
+    # One more fits in the idle session; the rest go through a new one
+    results = service.send_many(_resets(service, *[f"b{i}@example.com" for i in range(3)]))
+    assert all(r["success"] for r in results)
+    assert sink.connections == 2
+    (idle,) = service.transport.pool._idle
+    assert idle.sent == 2
+
+    service.send_many(_resets(service, "c0@example.com", "c1@example.com"))
+    assert (sink.connections, len(sink.messages)) == (2, 8)
+    assert service.transport.pool._idle == []
+
+
+def test_session_closed_by_the_server_is_replaced(sink):
+    service = _service(sink)
+    service.send(_resets(service, "before@example.com")[0])
+    sink.drop_connections()
+
+    results = service.send_many(_resets(service, "after1@example.com", "after2@example.com"))
+    assert all(r["success"] for r in results)
+    assert (sink.connections, sink.logins) == (2, 2)
+    assert len(sink.messages) == 3
+
+
+def test_unreachable_server_fails_the_batch_without_raising(sink):
+    port = sink.port
+    sink.stop()
+    pool = SmtpPool("127.0.0.1", port, "none", timeout=1)
+    service = SmtpEmailService(SmtpTransport(pool))
+    results = service.send_many(_resets(service, "a@example.com", "b@example.com"))
+
+    assert [r["success"] for r in results] == [False, False]
+    assert "permanent" not in results[0]
+
+
+def test_outbox_drains_through_smtp(sink):
+    db = SessionLocal()
+    try:
+        db.execute(delete(EmailOutbox))
+        for address in ("smtp1@example.com", "smtp2@invalid.example"):
+            outbox.enqueue_email(db, "welcome", address, full_name="Smtp")
+        db.commit()
+
+        assert outbox.drain(service=_service(sink)) == {"sent": 1, "dead": 1}
+        dead = db.scalars(select(EmailOutbox).where(EmailOutbox.status == OutboxStatus.DEAD)).one()
+        assert dead.to_email == "smtp2@invalid.example" and "SMTP 550" in dead.last_error
+    finally:
+        db.close()
+    assert [recipients for _, recipients, _ in sink.messages] == [["smtp1@example.com"]]
@@ -0,0 +1,96 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import func, select, text
+
+from app import main
+from app.db import migrations
+from app.db.migrations import head_revisions, schema_is_current
+from app.db.seed import seed_demo
+from app.db.session import SessionLocal, engine
+from app.models.history import ClinicalRecord
+from app.models.user import Patient
+
+
+def test_boot_does_not_import_optional_sdks():
+    code = "import sys, app.main; print(sorted(m for m in ('stripe', 'sendgrid', 'weasyprint') if m in sys.modules))"
+    out = subprocess.run(
+        [sys.executable, "-c", code], env=os.environ, check=True, capture_output=True, text=True
+    )
+    assert out.stdout.strip() == "[]"
+
+
+@pytest.fixture
+def stamped():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)"))
+        for revision in head_revisions():
+            conn.execute(text("INSERT INTO alembic_version VALUES (:v)"), {"v": revision})
+    yield
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE alembic_version"))
+
+
+def test_startup_skips_create_all_on_a_migrated_database(stamped, monkeypatch):
+    calls = []
+    monkeypatch.setattr(main.Base.metadata, "create_all", lambda **kwargs: calls.append(kwargs))
+    assert schema_is_current(engine)
+    main.startup_event()
+    assert calls == []
+
+    # Behind the scripts (e.g. a deploy before `alembic upgrade`): not current
+    monkeypatch.setattr(migrations, "head_revisions", lambda: frozenset({"a_newer_revision"}))
+    main.startup_event()
+    assert len(calls) == 1
+
+
+def test_unstamped_database_is_not_current():
+    assert not schema_is_current(engine)
+
+
+def test_demo_seed_tops_up_patients_and_is_idempotent():
+    db = SessionLocal()
+    existing = db.scalar(select(func.count()).select_from(Patient))
+    records = db.scalar(select(func.count()).select_from(ClinicalRecord))
+
+    result = seed_demo(db, existing + 3)
+    assert result.patients_created == 3
+    assert db.scalar(select(func.count()).select_from(Patient)) == existing + 3
+    assert 3 <= db.scalar(select(func.count()).select_from(ClinicalRecord)) - records <= 9
+
+    again = seed_demo(db, existing + 3)
+    assert again.doctor_id == result.doctor_id
+    assert again.patients_created == 0 and again.templates_created == 0
+    db.close()
+
+
+def test_production_refuses_keys_derived_from_secret_key():
+    env = {k: v for k, v in os.environ.items() if k not in ("ENCRYPTION_KEYS", "ENCRYPTION_KEY", "BLIND_INDEX_KEY")}
+    env["ENVIRONMENT"] = "production"
+    out = subprocess.run([sys.executable, "-c", "import app.core.security"], env=env, capture_output=True, text=True)
+    assert out.returncode != 0 and "ENCRYPTION_KEYS must be set in production" in out.stderr
+
+    env["ENCRYPTION_KEYS"] = "tmlsfk7cs8Wq3GgnsQvG6cGYlEFIZIA7zrGTWp1AcWY="
+    out = subprocess.run([sys.executable, "-c", "import app.core.security"], env=env, capture_output=True, text=True)
+    assert out.returncode != 0 and "BLIND_INDEX_KEY must be set in production" in out.stderr
+
+    env["BLIND_INDEX_KEY"] = "explicit-blind-index-key"
+    subprocess.run([sys.executable, "-c", "import app.core.security"], env=env, check=True)
+
+
+def test_an_async_replica_alone_enables_replica_reads(tmp_path):
+    code = (
+        "from app.core.metrics import DB_POOL_CONNECTIONS; from app.db import session; "
+        "print(session.replica_enabled, len(DB_POOL_CONNECTIONS._callbacks))"
+    )
+    env = {k: v for k, v in os.environ.items() if "REPLICA" not in k}
+    env["DATABASE_URL"] = f"sqlite:///{tmp_path / 'primary.db'}"
+    out = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True)
+    assert out.stdout.split() == ["False", "2"]
+
+    env["ASYNC_DATABASE_REPLICA_URL"] = f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"
+    out = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True)
+    # Sticky primary reads apply, and the async replica pool reports its gauges
+    assert out.stdout.split() == ["True", "3"]
@@ -0,0 +1,31 @@
+import threading
+
+from app.core.workers import BackgroundWorkers
+
+
+def test_idle_workers_wake_on_notify_and_survive_failures():
+    calls, ran = [], threading.Event()
+
+    def step():
+        calls.append(threading.current_thread().name)
+        ran.set()
+        if len(calls) == 2:
+            raise RuntimeError("database down")
+        return len(calls) < 2
+
+    workers = BackgroundWorkers("test-workers", step, poll_seconds=60)
+    workers.start(1)
+    try:
+        # Busy once, then it fails and goes idle for a whole poll
+        assert ran.wait(5)
+        for _ in range(50):
+            if len(calls) == 2:
+                break
+            threading.Event().wait(0.05)
+        assert len(calls) == 2
+        ran.clear()
+        workers.notify()
+        assert ran.wait(5)
+    finally:
+        workers.stop(timeout=5)
+    assert calls[0] == "test-workers-0" and len(calls) == 3
@@ -3,6 +3,7 @@
 import Link from 'next/link'
 import { useEffect, useMemo, useState } from 'react'
 import { useRouter } from 'next/navigation'
+import { fetchPage } from '@/lib/pagination'
 
 type Patient = {
   id: number
@@ -48,22 +49,28 @@ export default function AdminConsultationsPage() {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const [items, setItems] = useState<Consultation[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
-  const load = async () => {
+  // Without a cursor: the first page, replacing the list; with one: the next page, appended
+  const load = async (cursor?: string | null) => {
     const token = localStorage.getItem('admin_token')
     if (!token) {
       router.push('/')
       return
     }
 
-    setLoading(true)
+    if (cursor) setLoadingMore(true)
+    else setLoading(true)
     setError(null)
     try {
       const url = new URL(`${apiBase}/admin/consultations`)
       if (day) url.searchParams.set('day', day)
-      const res = await fetch(url.toString(), {
-        headers: { Authorization: `Bearer ${token}` },
-      })
+      const { res, items: data, nextCursor } = await fetchPage<Consultation>(
+        url.toString(),
+        { headers: { Authorization: `Bearer ${token}` } },
+        cursor
+      )
       if (res.status === 401) {
         localStorage.removeItem('admin_token')
         router.push('/')
@@ -73,11 +80,13 @@ export default function AdminConsultationsPage() {
         const detail = await res.text()
         throw new Error(detail || 'Error cargando consultas')
       }
-      setItems((await res.json()) as Consultation[])
+      setItems((prev) => (cursor ? [...prev, ...data] : data))
+      setNextCursor(nextCursor)
     } catch (e: any) {
       setError(e?.message || 'Error cargando consultas')
     } finally {
       setLoading(false)
+      setLoadingMore(false)
     }
   }
 
@@ -110,7 +119,8 @@ export default function AdminConsultationsPage() {
         throw new Error(detail || 'Error actualizando')
       }
 
-      await load()
+      // In place: reloading would drop the pages loaded so far
+      setItems((prev) => prev.map((c) => (c.id === id ? { ...c, status } : c)))
     } catch (e: any) {
       setError(e?.message || 'Error actualizando')
     }
@@ -152,7 +162,7 @@ export default function AdminConsultationsPage() {
             <div>
               <button
                 type="button"
-                onClick={load}
+                onClick={() => load()}
                 className="px-4 py-2 rounded-md bg-primary text-white hover:bg-opacity-90"
               >
                 Cargar
@@ -224,6 +234,18 @@ export default function AdminConsultationsPage() {
                     })}
                   </tbody>
                 </table>
+                {nextCursor && (
+                  <div className="mt-4 text-center">
+                    <button
+                      type="button"
+                      onClick={() => load(nextCursor)}
+                      disabled={loadingMore}
+                      className="px-4 py-2 rounded-md border text-sm text-gray-700 hover:bg-gray-50 disabled:opacity-50"
+                    >
+                      {loadingMore ? 'Cargando…' : 'Cargar más'}
+                    </button>
+                  </div>
+                )}
               </div>
             ) : (
               <div className="text-sm text-gray-600">No hay citas para este día.</div>
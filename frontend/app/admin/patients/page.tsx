@@ -3,6 +3,7 @@
 import Link from 'next/link'
 import { useEffect, useMemo, useState } from 'react'
 import { useRouter } from 'next/navigation'
+import { fetchPage } from '@/lib/pagination'
 
 type Patient = {
   id: number
@@ -22,22 +23,28 @@ export default function AdminPatientsPage() {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const [patients, setPatients] = useState<Patient[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
-  const load = async () => {
+  // Without a cursor: the first page, replacing the list; with one: the next page, appended
+  const load = async (cursor?: string | null) => {
     const token = localStorage.getItem('admin_token')
     if (!token) {
       router.push('/')
       return
     }
 
-    setLoading(true)
+    if (cursor) setLoadingMore(true)
+    else setLoading(true)
     setError(null)
     try {
       const url = new URL(`${apiBase}/admin/patients`)
       if (q.trim()) url.searchParams.set('q', q.trim())
-      const res = await fetch(url.toString(), {
-        headers: { Authorization: `Bearer ${token}` },
-      })
+      const { res, items, nextCursor } = await fetchPage<Patient>(
+        url.toString(),
+        { headers: { Authorization: `Bearer ${token}` } },
+        cursor
+      )
       if (res.status === 401) {
         localStorage.removeItem('admin_token')
         router.push('/')
@@ -47,11 +54,13 @@ export default function AdminPatientsPage() {
         const detail = await res.text()
         throw new Error(detail || 'Error cargando pacientes')
       }
-      setPatients((await res.json()) as Patient[])
+      setPatients((prev) => (cursor ? [...prev, ...items] : items))
+      setNextCursor(nextCursor)
     } catch (e: any) {
       setError(e?.message || 'Error cargando pacientes')
     } finally {
       setLoading(false)
+      setLoadingMore(false)
     }
   }
 
@@ -91,7 +100,7 @@ export default function AdminPatientsPage() {
             <div className="md:pt-6">
               <button
                 type="button"
-                onClick={load}
+                onClick={() => load()}
                 className="px-4 py-2 rounded-md bg-primary text-white hover:bg-opacity-90"
               >
                 Buscar
@@ -130,6 +139,18 @@ export default function AdminPatientsPage() {
                     ))}
                   </tbody>
                 </table>
+                {nextCursor && (
+                  <div className="mt-4 text-center">
+                    <button
+                      type="button"
+                      onClick={() => load(nextCursor)}
+                      disabled={loadingMore}
+                      className="px-4 py-2 rounded-md border text-sm text-gray-700 hover:bg-gray-50 disabled:opacity-50"
+                    >
+                      {loadingMore ? 'Cargando…' : 'Cargar más'}
+                    </button>
+                  </div>
+                )}
               </div>
             ) : (
               <div className="text-sm text-gray-600">Sin resultados.</div>
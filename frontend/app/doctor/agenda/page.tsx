@@ -3,6 +3,7 @@
 import Link from 'next/link'
 import { useEffect, useMemo, useState } from 'react'
 import { useRouter } from 'next/navigation'
+import { fetchPage } from '@/lib/pagination'
 
 type Patient = {
   id: number
@@ -44,6 +45,39 @@ export default function DoctorAgendaPage() {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const [items, setItems] = useState<Consultation[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+
+  // Upcoming consultations, from the start of today, one page at a time
+  const agendaUrl = useMemo(() => {
+    const today = new Date()
+    today.setHours(0, 0, 0, 0)
+    const url = new URL(`${apiBase}/consultations/me`)
+    url.searchParams.set('since', today.toISOString())
+    return url.toString()
+  }, [apiBase])
+
+  const fetchAgendaPage = async (cursor?: string | null) => {
+    const token = localStorage.getItem('doctor_token')
+    if (!token) {
+      router.push('/doctor/login')
+      return null
+    }
+
+    const page = await fetchPage<Consultation>(agendaUrl, { headers: { Authorization: `Bearer ${token}` } }, cursor)
+
+    if (page.res.status === 401) {
+      localStorage.removeItem('doctor_token')
+      router.push('/doctor/login')
+      return null
+    }
+
+    if (!page.res.ok) {
+      const detail = await page.res.text()
+      throw new Error(detail || 'Error cargando agenda')
+    }
+    return page
+  }
 
   useEffect(() => {
     let cancelled = false
@@ -52,33 +86,11 @@ export default function DoctorAgendaPage() {
       setError(null)
       setLoading(true)
 
-      const token = localStorage.getItem('doctor_token')
-      if (!token) {
-        router.push('/doctor/login')
-        return
-      }
-
       try {
-        const res = await fetch(`${apiBase}/consultations/me`, {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        })
-
-        if (res.status === 401) {
-          localStorage.removeItem('doctor_token')
-          router.push('/doctor/login')
-          return
-        }
-
-        if (!res.ok) {
-          const detail = await res.text()
-          throw new Error(detail || 'Error cargando agenda')
-        }
-
-        const data = (await res.json()) as Consultation[]
-        if (cancelled) return
-        setItems(data)
+        const page = await fetchAgendaPage()
+        if (cancelled || !page) return
+        setItems(page.items)
+        setNextCursor(page.nextCursor)
       } catch (e: any) {
         if (cancelled) return
         setError(e?.message || 'Error cargando agenda')
@@ -92,7 +104,24 @@ export default function DoctorAgendaPage() {
     return () => {
       cancelled = true
     }
-  }, [apiBase, router])
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [agendaUrl, router])
+
+  const loadMore = async () => {
+    if (!nextCursor) return
+    setError(null)
+    setLoadingMore(true)
+    try {
+      const page = await fetchAgendaPage(nextCursor)
+      if (!page) return
+      setItems((prev) => [...prev, ...page.items])
+      setNextCursor(page.nextCursor)
+    } catch (e: any) {
+      setError(e?.message || 'Error cargando agenda')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
 
   const logout = () => {
     localStorage.removeItem('doctor_token')
@@ -177,6 +206,18 @@ export default function DoctorAgendaPage() {
                 </div>
               ))}
             </div>
+            {nextCursor && (
+              <div className="px-6 py-4 border-t text-center">
+                <button
+                  type="button"
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="px-4 py-2 rounded-md border text-sm text-gray-700 hover:bg-gray-50 disabled:opacity-50"
+                >
+                  {loadingMore ? 'Cargando…' : 'Cargar más'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </main>
@@ -119,7 +119,7 @@ export default function DoctorConsultationDetailPage() {
     }
 
     try {
-      const res = await fetch(`${apiBase}/doctor/consultations`, {
+      const res = await fetch(`${apiBase}/doctor/consultations/${consultationId}`, {
         headers: { Authorization: `Bearer ${token}` },
       })
 
@@ -129,17 +129,16 @@ export default function DoctorConsultationDetailPage() {
         return
       }
 
+      if (res.status === 404) {
+        throw new Error('Consulta no encontrada')
+      }
+
       if (!res.ok) {
         const detail = await res.text()
         throw new Error(detail || 'Error cargando consulta')
       }
 
-      const consultations = (await res.json()) as Consultation[]
-      const foundConsultation = consultations.find(c => c.id === parseInt(consultationId))
-      
-      if (!foundConsultation) {
-        throw new Error('Consulta no encontrada')
-      }
+      const foundConsultation = (await res.json()) as Consultation
 
       setConsultation(foundConsultation)
       
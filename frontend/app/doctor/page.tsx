@@ -3,6 +3,7 @@
 import Link from 'next/link'
 import { useEffect, useMemo, useState } from 'react'
 import { useRouter } from 'next/navigation'
+import { fetchAllPages } from '@/lib/pagination'
 
 type Consultation = {
   id: number
@@ -147,9 +148,12 @@ export default function DoctorDashboardPage() {
     try {
       // Load today's consultations
       const today = new Date().toISOString().split('T')[0]
-      const consultationsRes = await fetch(`${apiBase}/doctor/consultations`, {
-        headers: { Authorization: `Bearer ${token}` },
-      })
+      const { res: consultationsRes, items: consultationsPage } = await fetchAllPages<Consultation>(
+        `${apiBase}/doctor/consultations?day=${today}`,
+        {
+          headers: { Authorization: `Bearer ${token}` },
+        }
+      )
 
       if (consultationsRes.status === 401) {
         localStorage.removeItem('doctor_token')
@@ -159,7 +163,7 @@ export default function DoctorDashboardPage() {
 
       let consultationsData: Consultation[] = []
       if (consultationsRes.ok) {
-        consultationsData = (await consultationsRes.json()) as Consultation[]
+        consultationsData = consultationsPage
         const todayConsults = consultationsData.filter(c => 
           c.scheduled_at.startsWith(today)
         ).sort((a, b) => new Date(a.scheduled_at).getTime() - new Date(b.scheduled_at).getTime())
@@ -167,53 +171,46 @@ export default function DoctorDashboardPage() {
       }
 
       // Load recent patients
-      const patientsRes = await fetch(`${apiBase}/doctor/patients`, {
+      const patientsRes = await fetch(`${apiBase}/doctor/patients?sort=created_at&order=desc&limit=5`, {
         headers: { Authorization: `Bearer ${token}` },
       })
 
       let patientsData: Patient[] = []
       if (patientsRes.ok) {
         patientsData = (await patientsRes.json()) as Patient[]
-        const recent = patientsData
-          .sort((a, b) => new Date(b.created_at).getTime() - new Date(a.created_at).getTime())
-          .slice(0, 5)
-        setRecentPatients(recent)
+        setRecentPatients(patientsData)
       }
 
       // Load templates
-      const templatesRes = await fetch(`${apiBase}/templates`, {
+      const { res: templatesRes, items: templatesData } = await fetchAllPages<ClinicalTemplate>(`${apiBase}/templates`, {
         headers: { Authorization: `Bearer ${token}` },
       })
 
       if (templatesRes.ok) {
-        const templatesData = (await templatesRes.json()) as ClinicalTemplate[]
         setTemplates(templatesData)
       }
 
-      // Load recent payments
-      const paymentsRes = await fetch(`${apiBase}/payments/doctor/payments`, {
+      // Load recent payments: the API lists newest first
+      const paymentsRes = await fetch(`${apiBase}/payments/doctor/payments?limit=5`, {
         headers: { Authorization: `Bearer ${token}` },
       })
 
       if (paymentsRes.ok) {
-        const payments = (await paymentsRes.json()) as Payment[]
-        const recent = payments
-          .sort((a, b) => new Date(b.created_at).getTime() - new Date(a.created_at).getTime())
-          .slice(0, 5)
-        setRecentPayments(recent)
-        
-        // Calculate stats
-        const totalRevenue = payments
-          .filter(p => p.status === 'completed')
-          .reduce((sum, p) => sum + p.amount, 0)
-        
-        const pendingPayments = payments.filter(p => p.status === 'pending').length
+        setRecentPayments((await paymentsRes.json()) as Payment[])
+      }
+
+      // Revenue and pending counts over every payment, aggregated by the API
+      const summaryRes = await fetch(`${apiBase}/payments/doctor/payments/summary`, {
+        headers: { Authorization: `Bearer ${token}` },
+      })
 
+      if (summaryRes.ok) {
+        const summary = await summaryRes.json()
         setStats({
           totalPatients: patientsData.length,
           totalConsultations: consultationsData.length,
-          totalRevenue,
-          pendingPayments
+          totalRevenue: Number(summary.completed_amount),
+          pendingPayments: summary.pending_count
         })
       }
 
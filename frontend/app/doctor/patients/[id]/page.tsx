@@ -3,6 +3,7 @@
 import Link from 'next/link'
 import { useEffect, useMemo, useState } from 'react'
 import { useRouter, useParams } from 'next/navigation'
+import { fetchAllPages } from '@/lib/pagination'
 
 type ClinicalRecord = {
   id: number
@@ -100,8 +101,7 @@ export default function DoctorPatientDetailPage() {
     }
 
     try {
-      // First fetch all patients and find the one by id (demo, no dedicated endpoint)
-      const res = await fetch(`${apiBase}/doctor/patients`, {
+      const res = await fetch(`${apiBase}/doctor/patients/${patientId}`, {
         headers: { Authorization: `Bearer ${token}` },
       })
       if (res.status === 401) {
@@ -109,15 +109,14 @@ export default function DoctorPatientDetailPage() {
         router.push('/doctor/login')
         return
       }
+      if (res.status === 404) {
+        throw new Error('Paciente no encontrado')
+      }
       if (!res.ok) {
         const detail = await res.text()
         throw new Error(detail || 'Error cargando paciente')
       }
-      const patients = (await res.json()) as Patient[]
-      const found = patients.find((p) => p.id === Number(patientId))
-      if (!found) {
-        throw new Error('Paciente no encontrado')
-      }
+      const found = (await res.json()) as Patient
       setPatient(found)
     } catch (e: any) {
       setError(e?.message || 'Error cargando paciente')
@@ -163,7 +162,7 @@ export default function DoctorPatientDetailPage() {
     }
     setLoadingTemplates(true)
     try {
-      const res = await fetch(`${apiBase}/templates`, {
+      const { res, items } = await fetchAllPages<ClinicalTemplate>(`${apiBase}/templates`, {
         headers: { Authorization: `Bearer ${token}` },
       })
       if (res.status === 401) {
@@ -175,8 +174,7 @@ export default function DoctorPatientDetailPage() {
         const detail = await res.text()
         throw new Error(detail || 'Error cargando plantillas')
       }
-      const data = (await res.json()) as ClinicalTemplate[]
-      setTemplates(data)
+      setTemplates(items)
     } catch (e: any) {
       setError(e?.message || 'Error cargando plantillas')
     } finally {
@@ -105,7 +105,8 @@ export default function DoctorPatientsPage() {
     }
 
     try {
-      const res = await fetch(`${apiBase}/doctor/patients`, {
+      const params = new URLSearchParams({ q: searchQuery.trim() })
+      const res = await fetch(`${apiBase}/doctor/patients?${params}`, {
         headers: { Authorization: `Bearer ${token}` },
       })
 
@@ -120,18 +121,8 @@ export default function DoctorPatientsPage() {
         throw new Error(detail || 'Error cargando pacientes')
       }
 
-      const data = (await res.json()) as Patient[]
-      
-      // Filtrar localmente por el término de búsqueda
-      const filtered = data.filter((p) => {
-        const s = searchQuery.trim().toLowerCase()
-        return (
-          (p.full_name || '').toLowerCase().includes(s) ||
-          p.email.toLowerCase().includes(s)
-        )
-      })
-      
-      setItems(filtered)
+      // El backend filtra por nombre o email
+      setItems((await res.json()) as Patient[])
     } catch (e: any) {
       setError(e?.message || 'Error cargando pacientes')
     } finally {
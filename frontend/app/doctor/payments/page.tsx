@@ -3,6 +3,7 @@
 import Link from 'next/link'
 import { useEffect, useMemo, useState } from 'react'
 import { useRouter } from 'next/navigation'
+import { fetchPage } from '@/lib/pagination'
 
 type Payment = {
   id: number
@@ -28,6 +29,16 @@ type Payment = {
   }
 }
 
+// Totals over every payment, from /payments/doctor/payments/summary
+type PaymentSummary = {
+  total_count: number
+  total_amount: number | string
+  completed_count: number
+  completed_amount: number | string
+  pending_count: number
+  failed_count: number
+}
+
 function formatDateTime(iso: string) {
   const d = new Date(iso)
   if (Number.isNaN(d.getTime())) return iso
@@ -72,12 +83,17 @@ export default function DoctorPaymentsPage() {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const [payments, setPayments] = useState<Payment[]>([])
+  const [summary, setSummary] = useState<PaymentSummary | null>(null)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [filter, setFilter] = useState('all')
   const [search, setSearch] = useState('')
 
-  const loadPayments = async () => {
+  // Without a cursor: the first page and the totals; with one: the next page, appended
+  const loadPayments = async (cursor?: string | null) => {
     setError(null)
-    setLoading(true)
+    if (cursor) setLoadingMore(true)
+    else setLoading(true)
 
     const token = localStorage.getItem('doctor_token')
     if (!token) {
@@ -86,9 +102,12 @@ export default function DoctorPaymentsPage() {
     }
 
     try {
-      const res = await fetch(`${apiBase}/payments/doctor/payments`, {
-        headers: { Authorization: `Bearer ${token}` },
-      })
+      const headers = { Authorization: `Bearer ${token}` }
+      const { res, items, nextCursor } = await fetchPage<Payment>(
+        `${apiBase}/payments/doctor/payments`,
+        { headers },
+        cursor
+      )
 
       if (res.status === 401) {
         localStorage.removeItem('doctor_token')
@@ -101,12 +120,18 @@ export default function DoctorPaymentsPage() {
         throw new Error(detail || 'Error cargando pagos')
       }
 
-      const data = (await res.json()) as Payment[]
-      setPayments(data)
+      setPayments((prev) => (cursor ? [...prev, ...items] : items))
+      setNextCursor(nextCursor)
+
+      if (!cursor) {
+        const summaryRes = await fetch(`${apiBase}/payments/doctor/payments/summary`, { headers })
+        if (summaryRes.ok) setSummary((await summaryRes.json()) as PaymentSummary)
+      }
     } catch (e: any) {
       setError(e?.message || 'Error cargando pagos')
     } finally {
       setLoading(false)
+      setLoadingMore(false)
     }
   }
 
@@ -136,22 +161,15 @@ export default function DoctorPaymentsPage() {
     return filtered.sort((a, b) => new Date(b.created_at).getTime() - new Date(a.created_at).getTime())
   }, [payments, filter, search])
 
-  const stats = useMemo(() => {
-    const total = payments.reduce((sum, p) => sum + p.amount, 0)
-    const completed = payments.filter(p => p.status === 'completed')
-    const completedTotal = completed.reduce((sum, p) => sum + p.amount, 0)
-    const pending = payments.filter(p => p.status === 'pending').length
-    const failed = payments.filter(p => p.status === 'failed').length
-
-    return {
-      total,
-      completedTotal,
-      pending,
-      failed,
-      completedCount: completed.length,
-      totalCount: payments.length
-    }
-  }, [payments])
+  // Server-side totals: the list holds only the pages loaded so far
+  const stats = useMemo(() => ({
+    total: Number(summary?.total_amount ?? 0),
+    completedTotal: Number(summary?.completed_amount ?? 0),
+    pending: summary?.pending_count ?? 0,
+    failed: summary?.failed_count ?? 0,
+    completedCount: summary?.completed_count ?? 0,
+    totalCount: summary?.total_count ?? 0,
+  }), [summary])
 
   const logout = () => {
     localStorage.removeItem('doctor_token')
@@ -270,7 +288,7 @@ export default function DoctorPaymentsPage() {
                     <option value="refunded">Reembolsados</option>
                   </select>
                   <button
-                    onClick={loadPayments}
+                    onClick={() => loadPayments()}
                     className="text-sm px-4 py-2 bg-blue-600 text-white rounded-md hover:bg-blue-700 transition-colors"
                   >
                     🔄 Recargar
@@ -353,6 +371,18 @@ export default function DoctorPaymentsPage() {
                       ))}
                     </tbody>
                   </table>
+                  {nextCursor && (
+                    <div className="mt-4 text-center">
+                      <button
+                        type="button"
+                        onClick={() => loadPayments(nextCursor)}
+                        disabled={loadingMore}
+                        className="px-4 py-2 rounded-md border text-sm text-gray-700 hover:bg-gray-50 disabled:opacity-50"
+                      >
+                        {loadingMore ? 'Cargando…' : 'Cargar más'}
+                      </button>
+                    </div>
+                  )}
                 </div>
               ) : (
                 <div className="text-center py-12">
@@ -3,6 +3,7 @@
 import Link from 'next/link'
 import { useEffect, useMemo, useState } from 'react'
 import { useRouter } from 'next/navigation'
+import { fetchAllPages } from '@/lib/pagination'
 
 type ClinicalTemplate = {
   id: number
@@ -47,7 +48,7 @@ export default function DoctorTemplatesPage() {
     }
     setLoading(true)
     try {
-      const res = await fetch(`${apiBase}/templates`, {
+      const { res, items } = await fetchAllPages<ClinicalTemplate>(`${apiBase}/templates`, {
         headers: { Authorization: `Bearer ${token}` },
       })
       if (res.status === 401) {
@@ -59,8 +60,7 @@ export default function DoctorTemplatesPage() {
         const detail = await res.text()
         throw new Error(detail || 'Error cargando plantillas')
       }
-      const data = (await res.json()) as ClinicalTemplate[]
-      setTemplates(data)
+      setTemplates(items)
     } catch (e: any) {
       setError(e?.message || 'Error cargando plantillas')
     } finally {
@@ -0,0 +1,33 @@
+// List endpoints return one page per call; the next one is advertised in the
+// X-Next-Cursor header (absent on the last page).
+export const NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+export type Page<T> = {
+  // Check status/ok as for a single fetch
+  res: Response
+  items: T[]
+  // Pass back to fetchPage for the following page; null on the last one
+  nextCursor: string | null
+}
+
+export async function fetchPage<T>(url: string, init?: RequestInit, cursor?: string | null): Promise<Page<T>> {
+  const pageUrl = new URL(url)
+  if (cursor) pageUrl.searchParams.set('cursor', cursor)
+  const res = await fetch(pageUrl.toString(), init)
+  if (!res.ok) return { res, items: [], nextCursor: null }
+  return { res, items: (await res.json()) as T[], nextCursor: res.headers.get(NEXT_CURSOR_HEADER) }
+}
+
+// Every page, one request after another: only for lists that are small and
+// bounded (a doctor's templates, one day's consultations). Large lists show
+// a page at a time with fetchPage and a "load more" control.
+export async function fetchAllPages<T>(url: string, init?: RequestInit): Promise<Page<T>> {
+  const items: T[] = []
+  let page = await fetchPage<T>(url, init)
+  items.push(...page.items)
+  while (page.res.ok && page.nextCursor) {
+    page = await fetchPage<T>(url, init, page.nextCursor)
+    items.push(...page.items)
+  }
+  return { ...page, items }
+}